@@ -18,7 +18,6 @@
 
 # Imports
 from numpy import pi, exp, log, sum, real, empty, ndarray, array_split
-from numpy import abs as nabs
 from numpy import sum as nsum
 from scipy.special import wofz
 
@@ -37,7 +36,7 @@ def lorentz(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 3
 	peaks = len(args) // nparams
-	params = array_split(nabs(args), peaks)
+	params = array_split(args, peaks)
 	lo = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w, c = p
@@ -56,7 +55,7 @@ def lorentz_fixed_center(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 2
 	peaks = len(args) // nparams
-	params, c = array_split(nabs(args), peaks), kwargs['Center']
+	params, c = array_split(args, peaks), kwargs['Center']
 	lofc = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w = p
@@ -75,11 +74,10 @@ def lorentz_asymmetric(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 4
 	peaks = len(args) // nparams
-	params, c = array_split(nabs(args), peaks), kwargs['Center']
+	params, c = array_split(args, peaks), kwargs['Center']
 	loa = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w, c, m = p
-		m = m if 0.2 < m < 0.8 else 0.5
 		loa[x <= c, i] = h / (1 + ((x[x <= c] - c) / (0.5 * w * m)) ** 2)
 		loa[x > c, i] = h / (1 + ((x[x > c] - c) / (0.5 * w * (1 - m))) ** 2)
 	return sum(loa, 1)
@@ -96,11 +94,10 @@ def lorentz_asymmetric_fixed_center(x: ndarray, *args: [float], **kwargs: dict)
 	"""
 	nparams = 3
 	peaks = len(args) // nparams
-	params, c = array_split(nabs(args), peaks), kwargs['Center']
+	params, c = array_split(args, peaks), kwargs['Center']
 	loafc = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w, m = p
-		m = m if 0.2 < m < 0.8 else 0.5
 		loafc[x <= c[i], i] = h / (1 + ((x[x <= c[i]] - c[i]) / (0.5 * w * m)) ** 2)
 		loafc[x > c[i], i] = h / (1 + ((x[x > c[i]] - c[i]) / (0.5 * w * (1 - m))) ** 2)
 	return sum(loafc, 1)
@@ -117,7 +114,7 @@ def lorentz_asymmetric_fixed_center_asymmetry(x: ndarray, *args: [float], **kwar
 	"""
 	nparams = 2
 	peaks = len(args) // nparams
-	params, c, mf = array_split(nabs(args), peaks), kwargs['Center'], kwargs['Asymmetry']
+	params, c, mf = array_split(args, peaks), kwargs['Center'], kwargs['Asymmetry']
 	loafca = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w = p
@@ -140,7 +137,7 @@ def gauss(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 3
 	peaks = len(args) // nparams
-	params = array_split(nabs(args), peaks)
+	params = array_split(args, peaks)
 	ga = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w, c = p
@@ -159,7 +156,7 @@ def gauss_fixed_center(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 2
 	peaks = len(args) // nparams
-	params, c = array_split(nabs(args), peaks), kwargs['Center']
+	params, c = array_split(args, peaks), kwargs['Center']
 	gafc = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		h, w = p
@@ -181,7 +178,7 @@ def voigt(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 4
 	peaks = len(args) // nparams
-	params = array_split(nabs(args), peaks)
+	params = array_split(args, peaks)
 	vo = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		a, wl, wg, c = p
@@ -202,7 +199,7 @@ def voigt_fixed_center(x: ndarray, *args: [float], **kwargs: dict) -> ndarray:
 	"""
 	nparams = 3
 	peaks = len(args) // nparams
-	params, c = array_split(nabs(args), peaks), kwargs['Center']
+	params, c = array_split(args, peaks), kwargs['Center']
 	vofc = empty((x.size, peaks))
 	for i, p in enumerate(params):
 		a, wl, wg = p
@@ -18,91 +18,158 @@
 
 # Imports
 from pathlib import Path
-
-from numpy import array, zeros, hstack, linspace
-from pandas import Index, DataFrame, ExcelWriter
+from importlib.util import find_spec
+
+from numpy import (
+	nan,
+	tile,
+	array,
+	savez,
+	where,
+	zeros,
+	arange,
+	hstack,
+	repeat,
+	ndarray,
+	linspace,
+	concatenate,
+	savez_compressed,
+)
+from pandas import Index, DataFrame, isna, concat
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from PySide6.QtCore import Signal
 from openpyxl.utils import get_column_letter as gcl
+from openpyxl.styles import Font
 from PySide6.QtWidgets import QTableWidget
 
 from libssa.env.spectra import Spectra
-
-
-def export_raw(folder_path: Path, spectra: Spectra, spectra_type: str = 'Raw') -> None:
+from libssa.env.pipeline import model_bundle
+from libssa.env.functions import fit_summary
+
+# Columnar binary formats for tidy tables (Parquet and Feather need pyarrow, NPZ is always available)
+COLUMNAR = ('.parquet', '.feather', '.npz')
+PYARROW = find_spec('pyarrow') is not None
+TABLE_FORMATS = {
+	'.xlsx': 'Excel 2007+ Spreadsheet',
+	'.parquet': 'Apache Parquet',
+	'.feather': 'Apache Feather',
+	'.npz': 'NumPy Arrays',
+}
+# Worksheet names are limited by Excel (in length and characters)
+SHEET_LENGTH = 31
+SHEET_FORBIDDEN = str.maketrans(dict.fromkeys('[]:*?/\\', '+'))
+
+
+def export_raw(
+	folder_path: Path, spectra: Spectra, spectra_type: str = 'Raw', suffix: str = '.txt', progress: Signal = None
+) -> None:
 	"""
 	Export RAW function. This function receives a Spectra object and saves all
 	spectrum per sample in a single (.txt) file. The function may also receive a
 	spectra_type parameter, where it is possible to choose the outliers removed
 	version of the Spectra.
+	If suffix is a columnar format, all spectra are saved into a single file (named
+	after the spectra type) as a tidy table (see tidy_spectra).
 
 	:param folder_path: Path object containing the location to save the files
 	:param spectra: LIBSsa 2.0 Spectra object
 	:param spectra_type: Type of data to export. It can be 'Raw' or 'Outliers'
+	:param suffix: format of the saved files (.txt or a columnar format)
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra_type not in ('Raw', 'Outliers'):
 		raise AssertionError('Illegal value for spectra type!')
 	if not spectra.samples['Count']:
 		raise AttributeError('Load data before trying to export it!')
+	elif suffix != '.txt':
+		tidy = tidy_spectra(spectra.wavelength['Raw'], spectra.intensities[spectra_type], spectra.samples['Name'])
+		save_columnar(folder_path.joinpath(f'{spectra_type}_Spectra{suffix}'), {'Spectra': tidy}, progress)
 	else:
 		w = spectra.wavelength['Raw']
-		for c, s in zip(spectra.intensities[spectra_type], spectra.samples['Path']):
+		for i, (c, s) in enumerate(zip(spectra.intensities[spectra_type], spectra.samples['Path'])):
 			df = DataFrame(index=Index(w, name='Wavelength'), data=c, columns=[f'Shoot_{x}' for x in range(c.shape[1])])
 			df.to_csv(folder_path.joinpath(s.name).with_suffix('.txt'), sep=' ')
+			if progress is not None:
+				progress.emit(i + 1)
 
 
-def export_iso_table(file_path: Path, widget: QTableWidget) -> None:
+def export_iso_table(file_path: Path, widget: QTableWidget, progress: Signal = None) -> None:
 	"""
 	Export Iso Table function. This function receives a QTableWidget and saves
 	the values contained in its cells in a single spreadsheet (.xlsx) file.
+	The table may also be passed as a DataFrame (see iso_table), since widgets
+	must not be read outside the GUI thread.
 
 	:param file_path: Path object containing location and name to save the file
-	:param widget: QTableWidget to save data from
+	:param widget: QTableWidget to save data from (or its DataFrame)
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
-	rows = widget.rowCount()
-	cols = widget.columnCount()
-	if rows == 0:
+	df = widget if isinstance(widget, DataFrame) else iso_table(widget)
+	if df.index.size == 0:
 		raise AttributeError('Perform peak isolation before using this feature!')
 	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
-		df = DataFrame(
-			index=range(rows), columns=['Element', 'Lower WL', 'Upper WL', 'Center WL', '#Peaks'], data='', dtype=str
-		)
-		for i in range(rows):
-			for j in range(cols):
-				df.iloc[i, j] = widget.item(i, j).text()
-		df.set_index('Element', drop=True).to_excel(writer, sheet_name='Iso Table')
-		resize_writer_columns(writer)
+		save_sheets(file_path, {'Iso Table': (df.set_index('Element', drop=True), True)}, progress)
+
+
+def iso_table(widget: QTableWidget) -> DataFrame:
+	"""
+	Reads the values contained in the cells of the isolation table.
+
+	:param widget: QTableWidget to read data from
+	:return: DataFrame with the values of the table
+	"""
+	rows = widget.rowCount()
+	cols = widget.columnCount()
+	df = DataFrame(index=range(rows), columns=['Element', 'Lower WL', 'Upper WL', 'Center WL', '#Peaks'], data='', dtype=str)
+	for i in range(rows):
+		for j in range(cols):
+			df.iloc[i, j] = widget.item(i, j).text()
+	return df
 
 
-def export_iso_peaks(file_path: Path, spectra: Spectra) -> None:
+def export_iso_peaks(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export Iso Peaks function. This function receives a Spectra object and then
 	saves all isolated peaks into a single spreadsheet (.xlsx) file.
 	The saved file may have as many worksheets as the number of samples multiplied
 	by the number of isolated peaks. Each worksheet contains in the columns the
 	individual (isolated) spectrum for the peak/region.
+	In columnar formats, all peaks are saved into a single tidy table (see tidy_spectra), with the element of each row.
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	isolated_peaks = spectra.isolated['Count']
 	if isolated_peaks == 0:
 		raise AttributeError('Perform peak isolation before using this feature!')
+	elif file_path.suffix.lower() in COLUMNAR:
+		tables = []
+		for i, e in enumerate(spectra.isolated['Element']):
+			tidy = tidy_spectra(spectra.wavelength['Isolated'][i], spectra.intensities['Isolated'][i], spectra.samples['Name'])
+			tidy.insert(0, 'Element', e)
+			tables.append(tidy)
+		save_columnar(file_path, {'Isolated': concat(tables, ignore_index=True)}, progress)
 	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
-		for i in range(isolated_peaks):
-			w_iso = spectra.wavelength['Isolated'][i]
-			for c_iso, s in zip(spectra.intensities['Isolated'][i], spectra.samples['Name']):
-				cols = c_iso.shape[1]
-				zf = len(str(cols))
-				df = DataFrame(data=c_iso, index=w_iso, columns=[f'S_{str(x).zfill(zf)}' for x in range(cols)])
-				df.to_excel(writer, sheet_name=s)
-		resize_writer_columns(writer)
+
+		def sheets():
+			# Sheets are created one at a time, while the previous ones are already written
+			for i, e in enumerate(spectra.isolated['Element']):
+				w_iso = spectra.wavelength['Isolated'][i]
+				for c_iso, s in zip(spectra.intensities['Isolated'][i], spectra.samples['Name']):
+					cols = c_iso.shape[1]
+					zf = len(str(cols))
+					df = DataFrame(data=c_iso, index=w_iso, columns=[f'S_{str(x).zfill(zf)}' for x in range(cols)])
+					yield f'{e}_{s}', (df, True)
+
+		save_sheets(file_path, sheets(), progress)
 
 
-def export_fit_peaks(file_path: Path, spectra: Spectra) -> None:
+def export_fit_peaks(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export Fit Peaks function. This function receives a Spectra object and then
 	saves all data of the averaged isolated peak, plus the adjusted curves into a
@@ -111,46 +178,91 @@ def export_fit_peaks(file_path: Path, spectra: Spectra) -> None:
 		* Observed: the averaged observed data/points
 		* Residuals: the subtraction of observed and adjusted points
 		* Peak-Fitting: the curves obtained with the parameters in the fit equation
+	In columnar formats, data of all elements is saved into 2 tidy tables:
+		* Observed: element, sample, wavelength, observed data and residuals
+		* Fit: element, sample, curve (each peak and their sum), wavelength and fitted counts
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.fit['Area'] is spectra.base:
 		raise AttributeError('Perform peak fitting before using this feature!')
-	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
+	elif file_path.suffix.lower() in COLUMNAR:
+		samples = array(spectra.samples['Name'])
+		observed, fitted = [], []
 		for i, e in enumerate(spectra.isolated['Element']):
-			w = spectra.wavelength['Isolated'][i]
-			# Creating DFs, each to save a specific variable
-			# df1 -> Original (averaged) signal
-			# df2 -> Residuals for each fit
-			# df3 -> Each peak (and sum) after curve fitting
-			columns1 = [f'{s}_Data' for s in spectra.samples['Name']]
-			df1 = DataFrame(data=spectra.fit['Data'][i][:, :, 0].T, index=Index(w, name='Wavelength'), columns=columns1)
-			columns2 = [f'{s}_Residuals' for s in spectra.samples['Name']]
-			df2 = DataFrame(data=spectra.fit['Data'][i][:, :, 1].T, index=Index(w, name='Wavelength'), columns=columns2)
-			# To save peak fitting data, another loop is needed
-			parameters = spectra.fit['Total'][i].shape
-			zero_peaks_matrix = zeros((parameters[1], parameters[0] * parameters[2]))
-			columns3 = [''] * parameters[0] * parameters[2]
-			for j, t in enumerate(spectra.fit['Total'][i].T):
-				columns3[j :: parameters[2]] = [f'Sample_{s}_Fit_{j + 1}' for s in spectra.samples['Name']]
-				zero_peaks_matrix[:, j :: parameters[2]] = t
-			try:
-				df3 = DataFrame(
-					data=zero_peaks_matrix, index=Index(linspace(w[0], w[-1], 1000), name='Wavelength'), columns=columns3
-				)
-			except ValueError:
-				df3 = DataFrame(data=zero_peaks_matrix, index=Index(w, name='Wavelength'), columns=columns3)
-			# Saves DFs to writer
-			df1.to_excel(writer, sheet_name=f'{e}_Observed')
-			df2.to_excel(writer, sheet_name=f'{e}_Residuals')
-			df3.to_excel(writer, sheet_name=f'{e}_Peak-Fitting')
-		resize_writer_columns(writer)
-
-
-def export_fit_areas(file_path: Path, spectra: Spectra) -> None:
+			w, data, total = spectra.wavelength['Isolated'][i], spectra.fit['Data'][i], spectra.fit['Total'][i]
+			observed.append(
+				DataFrame({
+					'Element': e,
+					'Sample': repeat(samples, w.size),
+					'Wavelength': tile(w, samples.size),
+					'Data': data[:, :, 0].ravel(),
+					'Residuals': data[:, :, 1].ravel(),
+				})
+			)
+			# Fitted curves of each sample have shape (wavelengths, curves)
+			n_samples, points, curves = total.shape
+			w_fit = linspace(w[0], w[-1], points) if points != w.size else w
+			fitted.append(
+				DataFrame({
+					'Element': e,
+					'Sample': repeat(samples, points * curves),
+					'Curve': tile(arange(1, curves + 1), n_samples * points),
+					'Wavelength': tile(repeat(w_fit, curves), n_samples),
+					'Fit': total.ravel(),
+				})
+			)
+		save_columnar(
+			file_path, {'Observed': concat(observed, ignore_index=True), 'Fit': concat(fitted, ignore_index=True)}, progress
+		)
+	else:
+
+		def sheets():
+			for i, e in enumerate(spectra.isolated['Element']):
+				yield from fit_peaks_sheets(spectra, i, e)
+
+		save_sheets(file_path, sheets(), progress)
+
+
+def fit_peaks_sheets(spectra: Spectra, i: int, e: str):
+	"""
+	Creates the worksheets of export_fit_peaks for a single isolated region/element.
+
+	:param spectra: LIBSsa 2.0 Spectra object
+	:param i: index of the isolated region/element
+	:param e: name of the element
+	:return: generator of sheet name -> (DataFrame, save index)
+	"""
+	w = spectra.wavelength['Isolated'][i]
+	# Creating DFs, each to save a specific variable
+	# df1 -> Original (averaged) signal
+	# df2 -> Residuals for each fit
+	# df3 -> Each peak (and sum) after curve fitting
+	columns1 = [f'{s}_Data' for s in spectra.samples['Name']]
+	df1 = DataFrame(data=spectra.fit['Data'][i][:, :, 0].T, index=Index(w, name='Wavelength'), columns=columns1)
+	columns2 = [f'{s}_Residuals' for s in spectra.samples['Name']]
+	df2 = DataFrame(data=spectra.fit['Data'][i][:, :, 1].T, index=Index(w, name='Wavelength'), columns=columns2)
+	# To save peak fitting data, another loop is needed
+	parameters = spectra.fit['Total'][i].shape
+	zero_peaks_matrix = zeros((parameters[1], parameters[0] * parameters[2]))
+	columns3 = [''] * parameters[0] * parameters[2]
+	for j, t in enumerate(spectra.fit['Total'][i].T):
+		columns3[j :: parameters[2]] = [f'Sample_{s}_Fit_{j + 1}' for s in spectra.samples['Name']]
+		zero_peaks_matrix[:, j :: parameters[2]] = t
+	try:
+		df3 = DataFrame(data=zero_peaks_matrix, index=Index(linspace(w[0], w[-1], 1000), name='Wavelength'), columns=columns3)
+	except ValueError:
+		df3 = DataFrame(data=zero_peaks_matrix, index=Index(w, name='Wavelength'), columns=columns3)
+	# Yields DFs to be saved
+	yield f'{e}_Observed', (df1, True)
+	yield f'{e}_Residuals', (df2, True)
+	yield f'{e}_Peak-Fitting', (df3, True)
+
+
+def export_fit_areas(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export Fit Areas function. This function receives a Spectra object and then
 	saves all report data of the peak fittings into a single spreadsheet (.xlsx) file.
@@ -164,15 +276,21 @@ def export_fit_areas(file_path: Path, spectra: Spectra) -> None:
 		* Height of the i-th Peak
 		* Area of the i-th Peak
 		* Standard Deviation of the Area of the i-th Peak
+	If statistics of the fits are available, the file also has the worksheets:
+		* Fit_Stats: time, evaluations, cost, optimality and status of every fit
+		* Fit_Slowest: elements sorted by total fitting time
+		* Fit_Failures: fits that did not converge
+		* Fit_NFev: histogram of the number of evaluations
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.fit['Area'] is spectra.base:
 		raise AttributeError('Perform peak fitting before using this feature!')
 	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
+		sheets = {}
 		for i, e in enumerate(spectra.isolated['Element']):
 			# Creates empty DF to save report for the specific element
 			df = DataFrame(index=Index(spectra.samples['Name'], name='Samples'))
@@ -189,21 +307,31 @@ def export_fit_areas(file_path: Path, spectra: Spectra) -> None:
 				df[f'AreaSTD_Peak_{j + 1}'] = spectra.fit['AreaSTD'][i][:, j]
 			# Now, saves the DF
 			shape = spectra.fit['Shape'][i].replace('[', '').replace(']', '')
-			df.to_excel(writer, sheet_name=f'{e}_{shape.replace("/", "+")}')
-		resize_writer_columns(writer)
-
-
-def export_linear(file_path: Path, spectra: Spectra) -> None:
+			sheets[f'{e}_{shape.replace("/", "+")}'] = (df, True)
+		# Statistics of the fits (environments saved before they were introduced do not have it)
+		stats = spectra.fit.get('Stats', spectra.base)
+		if stats is not spectra.base:
+			stats = stats.assign(Sample=array(spectra.samples['Name'])[stats['Sample']])
+			sheets['Fit_Stats'] = (stats, False)
+			for name, summary in fit_summary(stats).items():
+				sheets[f'Fit_{name}'] = (summary, name == 'Slowest')
+		save_sheets(file_path, sheets, progress)
+
+
+def export_linear(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export Linear model function. This function receives a Spectra object and then
 	saves all parameters and curves of the adjusted Linear Model into a single
 	spreadsheet (.xlsx) file.
 	The saved file have 2 worksheets, containing:
 		* Model: reference, prediction and residual curves
-		* Metrics: slope, intercept, RMSE, R2, LoD/Q and the parameter (heights or areas).
+		* Metrics: slope, intercept, RMSE (calibration and cross-validation), R2, LoD/Q and the parameter (heights or areas).
+		  If bootstrap was used, the percentiles of slope, intercept and LoD/Q are also saved.
+	If the calibration explorer was used, its ranked models are saved into an extra Explorer worksheet.
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.linear['Predict'] is spectra.base:
@@ -223,18 +351,23 @@ def export_linear(file_path: Path, spectra: Spectra) -> None:
 		df['Metrics'].loc[element, 'Model_Parameter'] = parameter
 		df['Metrics'].loc[element, 'Model_R2'] = spectra.linear['R2']
 		df['Metrics'].loc[element, 'Model_RMSEC'] = spectra.linear['RMSE']
+		df['Metrics'].loc[element, 'Model_RMSECV'] = spectra.linear.get('RMSECV', spectra.base)
 		df['Metrics'].loc[element, 'Model_Slope'] = spectra.linear['Slope']
 		df['Metrics'].loc[element, 'Model_Intercept'] = spectra.linear['Intercept']
 		df['Metrics'].loc[element, 'Model_LoD'] = spectra.linear['LoD']
 		df['Metrics'].loc[element, 'Model_LoQ'] = spectra.linear['LoQ']
+		bootstrap = spectra.linear.get('Bootstrap', spectra.base)
+		if isinstance(bootstrap, DataFrame) and not bootstrap.empty:
+			for column in bootstrap.columns:
+				df['Metrics'].loc[element, f'Model_{column}'] = bootstrap[column].iloc[0]
 		# Properly saves
-		writer = ExcelWriter(file_path, engine='openpyxl')
-		for d in df.keys():
-			df[d].to_excel(writer, sheet_name=f'{element}_{d}')
-		resize_writer_columns(writer)
+		sheets = {f'{element}_{d}': (df[d], True) for d in df.keys()}
+		if spectra.linear.get('Explorer', spectra.base) is not spectra.base:
+			sheets['Explorer'] = (spectra.linear['Explorer'], False)
+		save_sheets(file_path, sheets, progress)
 
 
-def export_pls(file_path: Path, spectra: Spectra) -> None:
+def export_pls(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export PLS model function. This function receives a Spectra object and then
 	saves all parameters and curves of the adjusted PLS Model into a single
@@ -243,9 +376,13 @@ def export_pls(file_path: Path, spectra: Spectra) -> None:
 		* Model: reference, prediction, cross validation prediction and residual curves
 		* Metrics: RMSE, R2, and attributes of the model
 		* Blind: predictions for blind samples using the model
+	The R2 and RMSE of each cross validation fold are saved into an extra CV_Folds worksheet, and
+	the RMSECV of each number of latent variables (if swept) into a LV_Sweep worksheet. If attributes were
+	selected by iPLS, the evaluated intervals are saved into an iPLS worksheet.
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.pls['Model'] is spectra.base:
@@ -265,21 +402,43 @@ def export_pls(file_path: Path, spectra: Spectra) -> None:
 		df['Metrics'].loc[spectra.pls['Element'], 'CV_R2'] = spectra.pls['CrossValR2']
 		df['Metrics'].loc[spectra.pls['Element'], 'CV_RMSE'] = spectra.pls['CrossValRMSE']
 		df['Metrics'].loc[spectra.pls['Element'], 'Attributes'] = spectra.pls['Att']
+		df['Metrics'].loc[spectra.pls['Element'], 'Latent_Variables'] = spectra.pls['Model'].n_components
 		# For Blind Prediction
 		df['Blind'].index = Index(spectra.samples['Name'], name='Samples')
 		if spectra.pls['BlindPredict'] is spectra.base:
-			blind = [None] * df['Blind'].index.size
+			blind = [nan] * df['Blind'].index.size
 		else:
 			blind = spectra.pls['BlindPredict']
 		df['Blind']['BlindPrediction'] = blind
 		# Properly saves
-		writer = ExcelWriter(file_path, engine='openpyxl')
-		for d in df.keys():
-			df[d].to_excel(writer, sheet_name=d)
-		resize_writer_columns(writer)
+		sheets = {d: (df[d], True) for d in df.keys()}
+		if spectra.pls.get('CrossValFolds', spectra.base) is not spectra.base:
+			sheets['CV_Folds'] = (spectra.pls['CrossValFolds'], False)
+		if spectra.pls.get('Sweep', spectra.base) is not spectra.base:
+			sheets['LV_Sweep'] = (spectra.pls['Sweep'], True)
+		if spectra.pls.get('Intervals', spectra.base) is not spectra.base:
+			sheets['iPLS'] = (spectra.pls['Intervals'], True)
+		save_sheets(file_path, sheets, progress)
+
+
+def export_bundle(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
+	"""
+	Export PLS model bundle function. This function receives a Spectra object and saves
+	the PLS model, with all settings needed to build its attributes from new spectra, into
+	a single compressed numpy (.npz) file (see model_bundle). Only plain arrays are saved, so the
+	bundle is small, loads fast (see load_bundle) and does not need the environment for blind predictions.
 
+	:param file_path: Path object containing location and name to save the file
+	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
+	:return: None
+	"""
+	savez_compressed(file_path, **model_bundle(spectra))
+	if progress is not None:
+		progress.emit(1)
 
-def export_pca(file_path: Path, spectra: Spectra) -> None:
+
+def export_pca(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export PCA function. This function receives a Spectra object and then saves all
 	generated data of a Principal Components Analysis (PCA) into a single spreadsheet (.xlsx) file.
@@ -290,6 +449,7 @@ def export_pca(file_path: Path, spectra: Spectra) -> None:
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.pca['Loadings'] is spectra.base:
@@ -319,31 +479,37 @@ def export_pca(file_path: Path, spectra: Spectra) -> None:
 		df3 = DataFrame(
 			data=loadings, index=Index(att[sort], name=mode), columns=[f'Loading_{x + 1}' for x in range(loadings.shape[1])]
 		)
-		# Creates Writer and saves each DF into the writer
-		writer = ExcelWriter(file_path, engine='openpyxl')
-		df1.to_excel(writer, sheet_name='Explained Variance')
-		df2.to_excel(writer, sheet_name='Scores')
-		df3.to_excel(writer, sheet_name='Loadings')
-		resize_writer_columns(writer)
+		# Saves each DF as a worksheet
+		save_sheets(file_path, {'Explained Variance': (df1, True), 'Scores': (df2, True), 'Loadings': (df3, True)}, progress)
 
 
-def export_tne(file_path: Path, spectra: Spectra) -> None:
+def export_tne(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export T/Ne function. This function receives a Spectra object and then saves all
 	generated data of a Saha-Boltzmann plot (in the case, plasma temperature and electrons density)
 	into a single spreadsheet (.xlsx) file.
 	The saved file have 2 worksheets:
-		* Report: a table containing values of T, Ne, R2, R and deviations for each sample
+		* Report: a table containing values of T, Ne, R2, R and deviations for each sample (plus Monte Carlo percentiles, if calculated)
 		* Saha-Boltzmann Plot: the plot for all samples. Contains the Ln's, Energies and adjusted curve
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.plasma['Report'] is spectra.base:
 		raise AttributeError('Run Saha-Boltzmann plot before trying to export dada!')
+	elif file_path.suffix.lower() in COLUMNAR:
+		report = spectra.plasma['Report']
+		en, ln, fit = spectra.plasma['En'], spectra.plasma['Ln'], spectra.plasma['Fit']
+		plot = DataFrame({
+			'Sample': repeat(report.index.to_numpy(), en.shape[1]),
+			'En': en.ravel(),
+			'Ln': ln.ravel(),
+			'Fit': fit.ravel(),
+		})
+		save_columnar(file_path, {'Report': report.reset_index(), 'Saha-Boltzmann Plot': plot}, progress)
 	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
 		# We will save 2 worksheets: one for report, and another for the curves
 		df1 = spectra.plasma['Report']
 		# Although the 1st one was easy, the second is a bit more tricky
@@ -363,12 +529,10 @@ def export_tne(file_path: Path, spectra: Spectra) -> None:
 			j += 1
 		df2 = DataFrame(data=zero_t_matrix, columns=column_names)
 		# Saves DFs
-		df1.to_excel(writer, sheet_name='Report')
-		df2.to_excel(writer, index=False, sheet_name='Saha-Boltzmann Plot')
-		resize_writer_columns(writer)
+		save_sheets(file_path, {'Report': (df1, True), 'Saha-Boltzmann Plot': (df2, False)}, progress)
 
 
-def export_correl(file_path: Path, spectra: Spectra) -> None:
+def export_correl(file_path: Path, spectra: Spectra, progress: Signal = None) -> None:
 	"""
 	Export Correl function. This function receives a Spectra object and then saves all
 	generated data of a Pearson Correlation Spectrum for all elements/parameters entered
@@ -376,38 +540,163 @@ def export_correl(file_path: Path, spectra: Spectra) -> None:
 
 	:param file_path: Path object containing location and name to save the file
 	:param spectra: LIBSsa 2.0 Spectra object
+	:param progress: PySide Signal object (for multithreading)
 	:return: None
 	"""
 	if spectra.pearson['Data'] is spectra.base:
 		raise AttributeError('Perform Correlation Spectrum routine before trying to export dada!')
 	else:
-		writer = ExcelWriter(file_path, engine='openpyxl')
 		exdf = DataFrame(
 			index=Index(spectra.wavelength['Raw'], name='Wavelength'),
 			columns=[f'{chr(961)}_{x}' for x in spectra.ref.columns],
 			data=spectra.pearson['Data'],
 		)
 		exdf.insert(0, 'Full Mean', spectra.pearson['Full-Mean'])
-		exdf.to_excel(writer, sheet_name='Correlation')
-		resize_writer_columns(writer)
+		save_sheets(file_path, {'Correlation': (exdf, True)}, progress)
+
+
+def tidy_spectra(wavelength: ndarray, counts: ndarray, samples: list) -> DataFrame:
+	"""
+	Creates a tidy (long layout) table of spectra, with one row for each sample, wavelength and shoot.
+
+	:param wavelength: array with the wavelength (common to all samples)
+	:param counts: array with the counts of each sample (wavelength x shoots)
+	:param samples: names of the samples
+	:return: DataFrame with Sample, Wavelength, Shoot and Counts columns
+	"""
+	shoots = [c.shape[1] for c in counts]
+	return DataFrame({
+		'Sample': repeat(samples, [wavelength.size * s for s in shoots]),
+		'Wavelength': concatenate([repeat(wavelength, s) for s in shoots]),
+		'Shoot': concatenate([tile(arange(s), wavelength.size) for s in shoots]),
+		'Counts': concatenate([c.ravel() for c in counts]),
+	})
+
+
+def save_sheets(file_path: Path, sheets: dict, progress: Signal = None) -> None:
+	"""
+	Save Sheets function. This is a helper function, which saves the tables of an exporter as
+	worksheets of a single spreadsheet (.xlsx) file. If the suffix of the file is a columnar
+	format, tables are saved with save_columnar instead (index saved as the first columns).
+	Spreadsheets are streamed by a write-only workbook: rows are written as they are produced and
+	sheets may come from a generator, so memory is bounded by the current sheet. Names of the
+	worksheets are made valid for Excel (see sheet_title).
+
+	:param file_path: Path object containing location and name to save the file
+	:param sheets: dict (or generator of items) with sheet name -> (DataFrame, whether its index is saved)
+	:param progress: PySide Signal object (for multithreading), emitted with the number of saved sheets
+	:return: None
+	"""
+	items = sheets.items() if isinstance(sheets, dict) else sheets
+	if file_path.suffix.lower() in COLUMNAR:
+		save_columnar(file_path, {name: df.reset_index() if index else df for name, (df, index) in items}, progress)
+	else:
+		workbook, bold, titles = Workbook(write_only=True), Font(bold=True), set()
+		for i, (name, (df, index)) in enumerate(items):
+			worksheet = workbook.create_sheet(sheet_title(name, titles))
+			header = [*df.index.names, *df.columns] if index else list(df.columns)
+			resize_writer_columns(worksheet, header)
+			cells = [WriteOnlyCell(worksheet, value=h) for h in header]
+			for cell in cells:
+				cell.font = bold
+			worksheet.append(cells)
+			# Missing (NaN, None or NA) values are saved as empty cells
+			for row in (df.reset_index() if index else df).itertuples(index=False, name=None):
+				worksheet.append([None if isna(v) else v for v in row])
+			if progress is not None:
+				progress.emit(i + 1)
+		workbook.save(file_path)
+
+
+def save_columnar(file_path: Path, tables: dict, progress: Signal = None) -> None:
+	"""
+	Save Columnar function. This is a helper function, which saves tables into a columnar binary
+	format, much faster (and without the columns limit) than spreadsheets:
+		* NPZ: a single uncompressed numpy file, with one array for each column (named as table/column)
+		* Parquet or Feather (needs pyarrow): one file for each table (named as file_table), or the file itself for a single table
+	Columns of strings are saved as unicode arrays in NPZ files (missing values as empty strings), so they are
+	loaded without pickle (see load_tables).
+
+	:param file_path: Path object containing location and name to save the file
+	:param tables: dict with table name -> DataFrame (with columns, index is not saved)
+	:param progress: PySide Signal object (for multithreading), emitted with the number of saved tables
+	:return: None
+	"""
+	suffix = file_path.suffix.lower()
+	if suffix not in COLUMNAR:
+		raise ValueError(f'Illegal columnar format: {suffix}')
+	elif suffix != '.npz' and not PYARROW:
+		raise ValueError(f'Saving {suffix} files needs pyarrow. Install it or choose .npz instead!')
+	if suffix == '.npz':
+		arrays = {}
+		for i, (name, df) in enumerate(tables.items()):
+			for column in df.columns:
+				values = df[column].to_numpy()
+				if values.dtype == object:
+					try:
+						values = values.astype(float)
+					except (TypeError, ValueError):
+						# Missing values of strings are saved as empty strings
+						values = where(isna(values), '', values).astype(str)
+				arrays[f'{name}/{column}'] = values
+			if progress is not None:
+				progress.emit(i + 1)
+		savez(file_path, **arrays)
+	else:
+		for i, (name, df) in enumerate(tables.items()):
+			path = file_path if len(tables) == 1 else file_path.with_name(f'{file_path.stem}_{name}{suffix}')
+			df = df.rename(columns=str).reset_index(drop=True)
+			if suffix == '.parquet':
+				df.to_parquet(path, index=False)
+			else:
+				df.to_feather(path)
+			if progress is not None:
+				progress.emit(i + 1)
+
+
+def saved_files(file_path: Path) -> list:
+	"""
+	Saved Files function. This is a helper function, which returns the files written by an exporter
+	for the chosen file: the file itself or, for Parquet/Feather with many tables, one file for each
+	table (see save_columnar).
+
+	:param file_path: Path object containing location and name of the chosen file
+	:return: list of Paths of the saved files
+	"""
+	if file_path.exists() or file_path.suffix.lower() not in COLUMNAR:
+		return [file_path]
+	return sorted(file_path.parent.glob(f'{file_path.stem}_*{file_path.suffix}'))
+
+
+def sheet_title(name: str, titles: set) -> str:
+	"""
+	Sheet Title function. This is a helper function, which creates a valid worksheet name: forbidden
+	characters are replaced, long names are truncated to SHEET_LENGTH characters, and names already
+	used (in any case, as Excel does) receive a numeric suffix.
+
+	:param name: desired name of the worksheet
+	:param titles: lower case names of the worksheets already created (updated with the new one)
+	:return: worksheet name
+	"""
+	name = str(name).translate(SHEET_FORBIDDEN)
+	title, n = name[:SHEET_LENGTH], 1
+	while title.lower() in titles:
+		n += 1
+		title = name[: SHEET_LENGTH - len(str(n)) - 1] + f'_{n}'
+	titles.add(title.lower())
+	return title
 
 
-def resize_writer_columns(writer: ExcelWriter, close: bool = True) -> None:
+def resize_writer_columns(worksheet: object, header: list) -> None:
 	"""
-	Resize Writer Columns function. This is a helper function, which receives a pandas
-	ExcelWriter, walks into each column of all worksheets and resizes the columns based on
-	header name.
-	The function also may avoid closing the writer.
+	Resize Writer Columns function. This is a helper function, which resizes the columns
+	of a worksheet based on header names (so written cells are not walked again). For
+	write-only worksheets, it must be called before the first row is written.
 
-	:param writer: ExcelWriter to have the columns resized before saving the .xlsx file
-	:param close: boolean to decide whether close the writer or not
+	:param worksheet: openpyxl (write-only) Worksheet to have the columns resized
+	:param header: names of the columns (index names first, if saved)
 	:return: None
 	"""
-	for w in writer.sheets:
-		worksheet = writer.sheets[w]
-		for col in worksheet.iter_cols():
-			name = col[0].value
-			if type(name) is str:
-				worksheet.column_dimensions[gcl(col[0].column)].width = max(10, int(len(name) * 1.8))
-	if close:
-		writer.close()
+	for i, name in enumerate(header, 1):
+		if type(name) is str:
+			worksheet.column_dimensions[gcl(i)].width = max(10, int(len(name) * 1.8))
@@ -17,38 +17,92 @@
 
 
 # Imports
+from time import time, perf_counter
+from pathlib import Path
+from tempfile import TemporaryFile
+from threading import Event
+from contextlib import nullcontext
+from multiprocessing import get_context
+from concurrent.futures import Executor, ProcessPoolExecutor
+
 from numpy import (
 	exp,
+	inf,
 	log,
+	nan,
 	std,
+	clip,
+	isin,
 	mean,
 	ones,
+	sqrt,
+	tile,
 	array,
+	isinf,
+	savez,
+	stack,
 	trapz,
 	where,
 	zeros,
+	arange,
 	cumsum,
 	hstack,
+	memmap,
 	vstack,
+	maximum,
 	polyfit,
+	errstate,
+	isfinite,
 	linspace,
+	histogram,
 	zeros_like,
+	array_split,
+	concatenate,
+	broadcast_to,
 	column_stack,
+	nanpercentile,
 )
 from numpy import min as mini
-from pandas import Series, DataFrame
-from scipy.stats import linregress
+from numpy import load as loadz
+from pandas import Index, Series, DataFrame, concat
+from numpy.linalg import norm as matrix_norm
+from numpy.random import SeedSequence, default_rng
+from scipy.sparse import lil_matrix
 from PySide6.QtCore import Signal
 from scipy.optimize import OptimizeResult, least_squares
-from sklearn.metrics import mean_squared_error
-from sklearn.linear_model import LinearRegression
-from sklearn.decomposition import PCA
+from scipy.stats.qmc import LatinHypercube
+from sklearn.decomposition import PCA, IncrementalPCA
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_val_score, cross_val_predict
+from sklearn.model_selection import KFold, RepeatedKFold, cross_validate
 from sklearn.cross_decomposition import PLSRegression
 
+from libssa.env.spectra import FitCache
 from libssa.env.equations import *
 
+# Candidate shapes evaluated by the Auto option
+AUTO_SHAPES = ('Lorentzian', 'Asymmetric Lorentzian', 'Gaussian', 'Voigt Profile')
+# Columns of the statistics recorded for each fit (see fit_stats)
+STATS_COLUMNS = ('Time', 'NFev', 'NJev', 'Cost', 'Optimality', 'Status')
+# Kinds of parameters shared across samples by the global fit (asymmetry may also be shared, see fit_global)
+TIE_KINDS = {'Centers': ('Center',), 'Centers and widths': ('Center', 'Width')}
+# Age (in seconds) after which checkpoints of unfinished fits are removed
+CHECKPOINT_AGE = 7 * 24 * 3600
+# Constants of the Saha-Boltzmann plot: Boltzmann (eV/K) and Saha equation (cm-3) constants
+KB = 0.000086173303
+KE = 2.07e16
+# Maximum number of values of y (samples x draws x pairs) in each Monte Carlo batch
+MC_BATCH = 2**22
+# Modes of linear model evaluated by the calibration explorer (All Norm covers every Peak Norm pair)
+EXPLORER_MODES = ('No Norm', 'All Norm', 'Equivalent Peak')
+# Leading components computed by truncated (randomized) PCA, used when both sides of the matrix are larger than twice it
+PCA_COMPONENTS = 50
+# Cumulative explained variance of the optimum number of components (truncated scans are extended until reaching it)
+PCA_VARIANCE = 0.96
+# Samples per batch of incremental PCA (also used to project scores of memory-mapped matrices)
+PCA_BATCH = 100
+# Maximum number of latent variables of PLS models built from iPLS selections
+PLS_COMPONENTS = 10
+
 
 # Peak isolation functions
 def isopeaks(
@@ -148,6 +202,243 @@ def fit_guess(x: ndarray, y: ndarray, peaks: int, center: list, shape_id: str, a
 	return guess
 
 
+def fit_bounds(x: ndarray, peaks: int, lower: float, upper: float, shape_id: str) -> tuple:
+	"""
+	Creates the bounds for peak fitting, following the same parameter layout used by fit_guess.
+	Heights/areas are kept positive, widths strictly positive, centers inside the isolated
+	region and asymmetry in the interval where the asymmetric Lorentzian keeps its shape.
+
+	:param x: values of the wavelength
+	:param peaks: number of peaks
+	:param lower: lower wavelength of the isolated region
+	:param upper: upper wavelength of the isolated region
+	:param shape_id: string containing the shape of the signal
+	:return: tuple with lower and upper bounds (both as lists)
+	"""
+	lb, ub, w_min = [], [], (x[-1] - x[0]) * 1e-4
+	for _ in range(peaks):
+		# Height/Area, Width, Center, Asymmetry
+		lb.append(0.0)
+		ub.append(inf)
+		lb.append(w_min)
+		ub.append(inf)
+		if 'voigt' in shape_id.lower():
+			lb.append(w_min)
+			ub.append(inf)
+		if 'fixed' not in shape_id.lower():
+			lb.append(lower)
+			ub.append(upper)
+		if ('asymmetric' in shape_id.lower()) or ('asym' in shape_id.lower() and 'center fixed' in shape_id.lower()):
+			lb.append(0.2)
+			ub.append(0.8)
+	return lb, ub
+
+
+def fit_kinds(peaks: int, shape_id: str) -> list:
+	"""
+	Names the kind of each parameter of the fit, following the same layout used by fit_guess.
+
+	:param peaks: number of peaks
+	:param shape_id: string containing the shape of the signal
+	:return: list with the kind of each parameter (Height, Width, Center or Asymmetry)
+	"""
+	kinds = []
+	for _ in range(peaks):
+		kinds += ['Height', 'Width']
+		if 'voigt' in shape_id.lower():
+			kinds.append('Width')
+		if 'fixed' not in shape_id.lower():
+			kinds.append('Center')
+		if ('asymmetric' in shape_id.lower()) or ('asym' in shape_id.lower() and 'center fixed' in shape_id.lower()):
+			kinds.append('Asymmetry')
+	return kinds
+
+
+def fit_starts(guess: ndarray, bounds: tuple, starts: int, seed: int = 0) -> list:
+	"""
+	Creates the initial guesses for multi-start fitting. The first one is always the heuristic guess,
+	and the remaining are Latin hypercube samples inside the bounds (infinite upper bounds are
+	replaced by twice the size of the heuristic guess, or 1 if it is zero).
+
+	:param guess: heuristic guess (already inside bounds)
+	:param bounds: lower and upper bounds (as returned by fit_bounds)
+	:param starts: total number of initial guesses
+	:param seed: seed for the Latin hypercube sampler (for reproducible results)
+	:return: list of initial guesses
+	"""
+	guess = array(guess, dtype=float)
+	if starts <= 1:
+		return [guess]
+	lb, ub = array(bounds[0], dtype=float), array(bounds[1], dtype=float)
+	# Width of unbounded parameters is based on the guess itself (a guess clipped at lb has no distance to it)
+	width = maximum(2 * (guess - lb), 2 * abs(guess))
+	hi = where(isinf(ub), lb + where(width > 0, width, 1), ub)
+	samples = lb + LatinHypercube(d=guess.size, seed=seed).random(starts - 1) * (hi - lb)
+	return [guess] + list(samples)
+
+
+def fit_optimize(guess: ndarray, x: ndarray, y: ndarray, shape: str, sdict: dict, bounds: tuple, tols: list) -> OptimizeResult:
+	"""
+	Performs a single (bounded) least squares optimization of the fit guess.
+
+	:param guess: initial guess (== the parameters to be minimized)
+	:param x: wavelength array
+	:param y: intensities array (observed values)
+	:param shape: the shape of the signal
+	:param sdict: special dict created by the equation_translator
+	:param bounds: lower and upper bounds (as returned by fit_bounds)
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:return: optimized result
+	"""
+	return least_squares(
+		residuals,
+		guess,
+		args=(x, y, shape),
+		kwargs=sdict,
+		bounds=bounds,
+		method='trf',
+		x_scale='jac',
+		ftol=tols[0],
+		gtol=tols[1],
+		xtol=tols[2],
+		max_nfev=tols[3],
+	)
+
+
+def fit_multistart(
+	x: ndarray, y: ndarray, guess: ndarray, shape: str, sdict: dict, bounds: tuple, tols: list, starts: int = 1, seed: int = 0
+) -> OptimizeResult:
+	"""
+	Optimizes the fit from many initial guesses (see fit_starts) and keeps the one with the lowest
+	cost (the heuristic guess wins ties). The returned number of evaluations is the sum of all starts.
+
+	:param x: wavelength array
+	:param y: intensities array (observed values)
+	:param guess: heuristic guess (already inside bounds)
+	:param shape: the shape of the signal
+	:param sdict: special dict created by the equation_translator
+	:param bounds: lower and upper bounds (as returned by fit_bounds)
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:param starts: number of initial guesses
+	:param seed: seed for the Latin hypercube sampler of the initial guesses
+	:return: optimized result with the lowest cost (nfev and njev are summed over all starts)
+	"""
+	optimized = [fit_optimize(g, x, y, shape, sdict, bounds, tols) for g in fit_starts(guess, bounds, starts, seed)]
+	# Other starts must improve the cost by more than ftol, so equivalent solutions (e.g. with
+	# swapped peaks) never replace the heuristic one
+	best = optimized[0]
+	for opt in optimized[1:]:
+		if opt.cost < (1 - tols[0]) * best.cost:
+			best = opt
+	best.nfev = int(array([opt.nfev for opt in optimized]).sum())
+	best.njev = int(array([opt.njev or 0 for opt in optimized]).sum())
+	return best
+
+
+def fit_spectrum(
+	w: ndarray,
+	y: ndarray,
+	shape: str,
+	sdict: dict,
+	bounds: tuple,
+	center: list,
+	asymmetry: float,
+	tols: list,
+	starts: int = 1,
+	seed: int = 0,
+) -> tuple:
+	"""
+	Fits a single spectrum (with all of its starts, see fit_multistart). This is the unit of work
+	sent to the pool of processes, so every start of a spectrum is evaluated by the same process.
+
+	:param w: isolated wavelength of the element
+	:param y: intensities array (observed values, also used to create the heuristic guess)
+	:param shape: shape of the element
+	:param sdict: special dict created by the equation_translator
+	:param bounds: lower and upper bounds (as returned by fit_bounds)
+	:param center: list containing the center wavelength(s) of the element
+	:param asymmetry: asymmetry of the element (only !=0 for Asym. Lorentzian [center/as. fixed])
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:param starts: number of initial guesses
+	:param seed: seed for the Latin hypercube sampler of the initial guesses
+	:return: optimized result and statistics of the fit
+	"""
+	guess = clip(fit_guess(x=w, y=y, peaks=len(center), center=center, shape_id=shape, asymmetry=asymmetry), *bounds)
+	timer = perf_counter()
+	optimized = fit_multistart(w, y, guess, shape, sdict, bounds, tols, starts, seed)
+	return optimized, fit_stats(optimized, perf_counter() - timer)
+
+
+def fit_stats(optimized: OptimizeResult, elapsed: float) -> list:
+	"""
+	Statistics of a fit, in the same order of STATS_COLUMNS.
+
+	:param optimized: result of least squares
+	:param elapsed: wall time (in seconds) spent on the fit
+	:return: list with time, nfev, njev, final cost, optimality and status of the fit
+	"""
+	return [elapsed, optimized.nfev, optimized.njev or 0, optimized.cost, optimized.optimality, optimized.status]
+
+
+def fit_criterion(optimized: OptimizeResult, n: int, criterion: str = 'BIC') -> float:
+	"""
+	Information criterion of a least squares fit (lower is better). Both penalize the number of
+	parameters, but BIC does it harder than AIC for larger number of points.
+
+	:param optimized: result of least squares
+	:param n: number of points used in the fit
+	:param criterion: AIC or BIC
+	:return: value of the criterion
+	"""
+	k, rss = optimized.x.size, max(2 * optimized.cost, 1e-300)
+	if criterion == 'AIC':
+		return n * log(rss / n) + 2 * k
+	elif criterion == 'BIC':
+		return n * log(rss / n) + k * log(n)
+	raise ValueError(f'Unknown information criterion: {criterion}')
+
+
+def fit_select(
+	w: ndarray,
+	counts: ndarray,
+	asymmetry: float,
+	center: list,
+	lower: float,
+	upper: float,
+	tols: list,
+	criterion: str = 'BIC',
+	executor: Executor = None,
+) -> tuple:
+	"""
+	Selects the shape of an element (for the Auto option). Every candidate in AUTO_SHAPES is fitted
+	to the mean spectrum of all samples, and the one with the lowest information criterion is chosen.
+
+	:param w: isolated wavelength of the element
+	:param counts: array of matrices with the isolated intensities for each sample [samples...[counts[wavelengths, shoots]]]
+	:param asymmetry: asymmetry of the element
+	:param center: list containing the center wavelength(s) of the element
+	:param lower: lower wavelength of the isolated region
+	:param upper: upper wavelength of the isolated region
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:param criterion: AIC or BIC
+	:param executor: pool used to fit the candidates in parallel (optional)
+	:return: selected shape and dict with the criterion of each candidate
+	"""
+	npeaks = len(center)
+	average_spectrum = mean([mean(ci, axis=1) for ci in counts], axis=0)
+	scd = equations_translator(center=center, asymmetry=asymmetry)
+	bounds = [fit_bounds(w, npeaks, lower, upper, candidate) for candidate in AUTO_SHAPES]
+	guesses = [
+		clip(fit_guess(w, average_spectrum, npeaks, center, candidate, asymmetry), *bound)
+		for candidate, bound in zip(AUTO_SHAPES, bounds)
+	]
+	n = len(AUTO_SHAPES)
+	args = (guesses, [w] * n, [average_spectrum] * n, AUTO_SHAPES, [scd] * n, bounds, [tols] * n)
+	optimized = list(executor.map(fit_optimize, *args)) if executor is not None else list(map(fit_optimize, *args))
+	scores = {candidate: fit_criterion(opt, w.size, criterion) for candidate, opt in zip(AUTO_SHAPES, optimized)}
+	return min(scores, key=scores.get), scores
+
+
 def residuals(guess: list, x: ndarray, y: ndarray, shape_id: str, **kwargs) -> ndarray:
 	"""
 	Special function to be used side-by-side with least_squares, allowing the minimization of guess.
@@ -205,7 +496,7 @@ def fit_results(x: ndarray, y: ndarray, optimized: OptimizeResult, shape: str, n
 	"""
 	# Organizes variables
 	solution, residual = optimized.x, optimized.fun
-	individuals_solution = array_split(nabs(solution), npeaks)
+	individuals_solution = array_split(solution, npeaks)
 	[heights, widths, areas] = [zeros(npeaks) for val in range(3)]
 	# With optimized, we can have the new  linspace x-axis
 	if shape != 'Trapezoidal rule':
@@ -223,20 +514,380 @@ def fit_results(x: ndarray, y: ndarray, optimized: OptimizeResult, shape: str, n
 	return column_stack((y, residual)), total_fit, heights, widths, areas
 
 
+def fit_expand(params: ndarray, shared: ndarray, rows: int) -> ndarray:
+	"""
+	Expands the parameters of a global fit into the individual parameters of each spectrum.
+	The global vector is made by the shared parameters, followed by the local ones of each spectrum.
+
+	:param params: parameters of the global fit
+	:param shared: boolean mask (individual layout) of the parameters shared by all spectra
+	:param rows: number of spectra
+	:return: 2D array with the individual parameters (rows = spectra)
+	"""
+	nshared = shared.sum()
+	individuals = zeros((rows, shared.size))
+	individuals[:, shared] = params[:nshared]
+	individuals[:, ~shared] = params[nshared:].reshape(rows, -1)
+	return individuals
+
+
+def residuals_global(
+	params: ndarray, x: ndarray, ys: list, shape_id: str, shared: ndarray, cancel: Event = None, **kwargs
+) -> ndarray:
+	"""
+	Residuals of the global fit: the residuals of every spectrum (see residuals) stacked together.
+
+	:param params: parameters of the global fit
+	:param x: wavelength array
+	:param ys: list of intensities arrays (observed values)
+	:param shape_id: the shape of the signal
+	:param shared: boolean mask of the parameters shared by all spectra
+	:param cancel: threading Event used to cancel the fitting (checked at every evaluation)
+	:param kwargs: extra arguments to be passed away
+	:return: stacked differences between the observed and the fitted values
+	"""
+	if cancel is not None and cancel.is_set():
+		raise InterruptedError('Peak fitting was cancelled by the user')
+	individuals = fit_expand(params, shared, len(ys))
+	return concatenate([residuals(p, x, y, shape_id, **kwargs) for p, y in zip(individuals, ys)])
+
+
+def fit_spectra(counts: ndarray, mean1st: bool) -> list:
+	"""
+	Spectra fitted for each sample: the mean spectrum for mean first, or every shoot for area first.
+
+	:param counts: array of matrices with the isolated intensities for each sample [samples...[counts[wavelengths, shoots]]]
+	:param mean1st: boolean that says of fit method is mean first or area first
+	:return: list (one item per sample) of lists of spectra
+	"""
+	return [[mean(ci, axis=1)] if mean1st else [ci[:, k] for k in range(ci.shape[1])] for ci in counts]
+
+
+def fit_global(
+	w: ndarray,
+	counts: ndarray,
+	shape: str,
+	asymmetry: float,
+	center: list,
+	lower: float,
+	upper: float,
+	mean1st: bool,
+	tols: list,
+	tie: str,
+	tie_asymmetry: bool = True,
+	cancel: Event = None,
+) -> tuple:
+	"""
+	Solves the multi peak fitting of a single element with parameters tied across all passed samples.
+	Centers are shared by all spectra, as well as the widths if tie is 'Centers and widths' (and the
+	asymmetry, if tie_asymmetry), while the remaining parameters are fitted for each spectrum. Everything
+	is solved as one least squares problem with a sparse jacobian (each spectrum only depends on its own
+	and on the shared parameters). Results of each sample are then created by fit_tied.
+
+	:param w: isolated wavelength of the element
+	:param counts: array of matrices with the isolated intensities for each sample [samples...[counts[wavelengths, shoots]]]
+	:param shape: shape of the element
+	:param asymmetry: asymmetry of the element (only !=0 for Asym. Lorentzian [center/as. fixed])
+	:param center: list containing the center wavelength(s) of the element
+	:param lower: lower wavelength of the isolated region
+	:param upper: upper wavelength of the isolated region
+	:param mean1st: boolean that says of fit method is mean first (one spectrum per sample) or area first (every shoot)
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:param tie: which parameters are shared (Centers or Centers and widths)
+	:param tie_asymmetry: boolean to also share the asymmetry (for asymmetric shapes)
+	:param cancel: threading Event used to cancel the fitting (optional)
+	:return: tuple with the parameters of each spectrum (rows) and the statistics of the global fit
+	"""
+	if tie not in TIE_KINDS:
+		raise ValueError(f'Unknown tie for global fit: {tie}')
+	npeaks = len(center)
+	spectra = [y for sample in fit_spectra(counts, mean1st) for y in sample]
+	rows = len(spectra)
+	scd = equations_translator(center=center, asymmetry=asymmetry)
+	shared = isin(fit_kinds(npeaks, shape), TIE_KINDS[tie] + (('Asymmetry',) if tie_asymmetry else ()))
+	nshared, nlocal = shared.sum(), (~shared).sum()
+	# Guess and bounds, where shared values start from the average of the individual guesses
+	lb, ub = (array(bound, dtype=float) for bound in fit_bounds(w, npeaks, lower, upper, shape))
+	guesses = array([clip(fit_guess(w, y, npeaks, center, shape, asymmetry), lb, ub) for y in spectra], dtype=float)
+	guess = concatenate((guesses[:, shared].mean(axis=0), guesses[:, ~shared].ravel()))
+	bounds = (concatenate((lb[shared], tile(lb[~shared], rows))), concatenate((ub[shared], tile(ub[~shared], rows))))
+	# Sparsity of the jacobian: every spectrum depends on shared and on its own local parameters
+	sparsity = lil_matrix((rows * w.size, guess.size), dtype=int)
+	sparsity[:, :nshared] = 1
+	for r in range(rows):
+		sparsity[r * w.size : (r + 1) * w.size, nshared + r * nlocal : nshared + (r + 1) * nlocal] = 1
+	timer = perf_counter()
+	optimized = least_squares(
+		residuals_global,
+		guess,
+		args=(w, spectra, shape, shared, cancel),
+		kwargs=scd,
+		bounds=bounds,
+		jac_sparsity=sparsity,
+		method='trf',
+		tr_solver='lsmr',
+		x_scale='jac',
+		ftol=tols[0],
+		gtol=tols[1],
+		xtol=tols[2],
+		max_nfev=tols[3],
+	)
+	return fit_expand(optimized.x, shared, rows), array(fit_stats(optimized, perf_counter() - timer), dtype=float)
+
+
+def fit_tied(
+	w: ndarray,
+	counts: ndarray,
+	shape: str,
+	asymmetry: float,
+	center: list,
+	mean1st: bool,
+	individuals: ndarray,
+	solution: ndarray,
+	nsamples: int,
+	progress: Signal,
+	offset: int = 0,
+) -> tuple:
+	"""
+	Creates the results of the passed samples from the solution of a global fit (see fit_global), so
+	the results of the samples of a tied element can be created (and saved) in chunks.
+
+	:param w: isolated wavelength of the element
+	:param counts: array of matrices with the isolated intensities for each sample [samples...[counts[wavelengths, shoots]]]
+	:param shape: shape of the element
+	:param asymmetry: asymmetry of the element (only !=0 for Asym. Lorentzian [center/as. fixed])
+	:param center: list containing the center wavelength(s) of the element
+	:param mean1st: boolean that says of fit method is mean first (one spectrum per sample) or area first (every shoot)
+	:param individuals: parameters of each spectrum of the passed samples (as returned by fit_global)
+	:param solution: statistics of the global fit (as returned by fit_global)
+	:param nsamples: total number of samples of the global fit (time is split by them)
+	:param progress: PySide Signal object (for multithreading)
+	:param offset: index of the first passed sample (when fitting is done in chunks)
+	:return: tuple of results for the element (nfevs, convegences, data, total, heights, widths, areas, areas_std, stats)
+	"""
+	npeaks = len(center)
+	scd = equations_translator(center=center, asymmetry=asymmetry)
+	nfevs = zeros(len(counts), dtype=int) + int(solution[1])
+	convegences = zeros(len(counts), dtype=bool) + (solution[5] > 0)
+	data, total, heights, widths, areas = ([] for val in range(5))
+	areas_std = zeros((len(counts), npeaks), dtype=float)
+	# Statistics are from the global fit, but time and cost are split by sample
+	stats = array([solution] * len(counts), dtype=float)
+	stats[:, 0] /= nsamples
+	params = iter(individuals)
+	for j, sample in enumerate(fit_spectra(counts, mean1st)):
+		# Results of each spectrum, then grouped by sample (averaged for area 1st)
+		results, cost = [], 0
+		for y in sample:
+			p = next(params)
+			f = residuals(p, w, y, shape, **scd)
+			results.append(fit_results(w, y, OptimizeResult(x=p, fun=f), shape, npeaks, scd))
+			cost += 0.5 * (f**2).sum()
+		stats[j, 3] = cost
+		data.append(mean([result[0] for result in results], axis=0))
+		total.append(mean([result[1] for result in results], axis=0))
+		heights.append(mean([result[2] for result in results], axis=0))
+		widths.append(mean([result[3] for result in results], axis=0))
+		areas.append(mean([result[4] for result in results], axis=0))
+		areas_std[j] = std([result[4] for result in results], axis=0)
+		progress.emit(offset + j)
+	return nfevs, convegences, array(data), array(total), array(heights), array(widths), array(areas), areas_std, stats
+
+
+def fit_element(
+	w: ndarray,
+	counts: ndarray,
+	shape: str,
+	asymmetry: float,
+	center: list,
+	lower: float,
+	upper: float,
+	mean1st: bool,
+	tols: list,
+	progress: Signal,
+	offset: int = 0,
+	starts: int = 1,
+	executor: Executor = None,
+	jobs: int = 1,
+	seed: int = 0,
+) -> tuple:
+	"""
+	Performs the multi peak fitting of a single element (isolated region) for all passed samples.
+	If an executor is passed, the spectra (samples for mean first, or shoots for area first) are
+	split in batches between its processes, and each process evaluates all starts of its spectra.
+	For area first, every shoot is fitted with its own guess, and the results are averaged peak by
+	peak (areas_std is the deviation between shoots), just as in tied fits (see fit_tied).
+
+	:param w: isolated wavelength of the element
+	:param counts: array of matrices with the isolated intensities for each sample [samples...[counts[wavelengths, shoots]]]
+	:param shape: shape of the element
+	:param asymmetry: asymmetry of the element (only !=0 for Asym. Lorentzian [center/as. fixed])
+	:param center: list containing the center wavelength(s) of the element
+	:param lower: lower wavelength of the isolated region
+	:param upper: upper wavelength of the isolated region
+	:param mean1st: boolean that says of fit method is mean first or area first
+	:param tols: tolerances for least_squares (ftol, gtol, xtol and max_nfev)
+	:param progress: PySide Signal object (for multithreading)
+	:param offset: index of the first passed sample (when fitting is done in chunks)
+	:param starts: number of initial guesses for each fit (multi-start)
+	:param executor: pool used to fit the spectra in parallel (optional)
+	:param jobs: number of processes of the pool (spectra are sent to it in jobs batches)
+	:param seed: seed for the Latin hypercube sampler of the initial guesses
+	:return: tuple of results for the element (nfevs, convegences, data, total, heights, widths, areas, areas_std, stats)
+	"""
+	# Creates empty arrays for the element (same structure described in fitpeaks)
+	nsamples, npeaks = len(counts), len(center)
+	nfevs = zeros(nsamples, dtype=int)
+	convegences = zeros(nsamples, dtype=bool)
+	data = zeros((nsamples, w.size, 2), dtype=float)
+	total = zeros((nsamples, 1000, npeaks + 1), dtype=float) if shape != 'Trapezoidal rule' else zeros((nsamples, w.size, 2))
+	[areas, areas_std, widths, heights] = [zeros((nsamples, npeaks), dtype=float) for val in range(4)]
+	stats = zeros((nsamples, len(STATS_COLUMNS)), dtype=float)
+	# Gets a dict for shapes and fit equations
+	scd = equations_translator(center=center, asymmetry=asymmetry)
+	# Bounds are the same for all samples of the element (guess must be kept inside them)
+	bounds = fit_bounds(w, npeaks, lower, upper, shape)
+	# Spectra to be fitted: the mean of each sample (mean 1st) or every shoot (area 1st), the same used by tied fits
+	spectra = fit_spectra(counts, mean1st)
+	ys = [y for sample in spectra for y in sample]
+	n = len(ys)
+	args = (
+		[w] * n,
+		ys,
+		[shape] * n,
+		[scd] * n,
+		[bounds] * n,
+		[center] * n,
+		[asymmetry] * n,
+		[tols] * n,
+		[starts] * n,
+		[seed] * n,
+	)
+	if executor is None:
+		fitted = map(fit_spectrum, *args)
+	else:
+		fitted = executor.map(fit_spectrum, *args, chunksize=max(1, -(-n // jobs)))
+	# Now goes into sample level (results come in the same order of the spectra)
+	for j, sample in enumerate(spectra):
+		k_optimized = [next(fitted) for _ in sample]
+		# Gets the result based on optimized solution of each spectrum
+		# The function returns:
+		#   [0] data -> original_intensities and residuals (columns)
+		#   [1] total_fit -> each column is a fit based on peak number (which is based on center size) and the last one is the sum
+		#   [2] heights, [3] widths, [4] areas -> size depends on number of peaks
+		results = [fit_results(w, y, optimized, shape, npeaks, scd) for y, (optimized, _) in zip(sample, k_optimized)]
+		# Results are grouped by sample (for area 1st, shoots are averaged peak by peak)
+		nfevs[j] = mean([optimized.nfev for optimized, _ in k_optimized])
+		convegences[j] = any(optimized.success for optimized, _ in k_optimized)
+		data[j] = mean([result[0] for result in results], axis=0)
+		total[j] = mean([result[1] for result in results], axis=0)
+		heights[j] = mean([result[2] for result in results], axis=0)
+		widths[j] = mean([result[3] for result in results], axis=0)
+		areas[j] = mean([result[4] for result in results], axis=0)
+		areas_std[j] = std([result[4] for result in results], axis=0)
+		# Time is the sum of all spectra, status is the worst one and the others are averaged
+		k_stats = array([k_stats for _, k_stats in k_optimized])
+		stats[j] = k_stats.mean(axis=0)
+		stats[j, 0], stats[j, 5] = k_stats[:, 0].sum(), k_stats[:, 5].min()
+		progress.emit(offset + j)
+	return nfevs, convegences, data, total, heights, widths, areas, areas_std, stats
+
+
+def checkpoint_save(saved: Path, chunk: tuple) -> None:
+	"""
+	Saves the results of a chunk of samples (tuple of numeric arrays) as a npz file. It is
+	written to a temporary file first, so a cancelled/killed job never leaves a broken chunk.
+
+	:param saved: path of the checkpoint file
+	:param chunk: results of the chunk (as returned by fit_element)
+	:return: None
+	"""
+	temporary = saved.with_suffix('.tmp')
+	with temporary.open('wb') as f:
+		savez(f, *chunk)
+	temporary.replace(saved)
+
+
+def checkpoint_load(saved: Path) -> tuple:
+	"""
+	Loads the results of a chunk of samples saved by checkpoint_save (objects are never unpickled).
+
+	:param saved: path of the checkpoint file
+	:return: results of the chunk
+	"""
+	with loadz(saved, allow_pickle=False) as f:
+		return tuple(f[f'arr_{n}'] for n in range(len(f.files)))
+
+
+def checkpoint_prune(checkpoint: Path, keys: list, age: float = CHECKPOINT_AGE) -> None:
+	"""
+	Removes the checkpoints of the finished elements, and every checkpoint older than age.
+
+	:param checkpoint: folder of checkpoints
+	:param keys: keys of the finished elements
+	:param age: maximum age (in seconds) of checkpoints from other jobs
+	:return: None
+	"""
+	oldest = time() - age
+	for saved in checkpoint.glob('*_*.*'):
+		if saved.name.split('_')[0] in keys or saved.stat().st_mtime < oldest:
+			saved.unlink(missing_ok=True)
+
+
 def fitpeaks(
-	iso_wavelengths: ndarray, iso_counts: ndarray, shape: list, asymmetry: list, isolated: dict, mean1st: bool, progress: Signal
+	iso_wavelengths: ndarray,
+	iso_counts: ndarray,
+	shape: list,
+	asymmetry: list,
+	isolated: dict,
+	mean1st: bool,
+	progress: Signal,
+	cache: FitCache = None,
+	checkpoint: Path = None,
+	cancel: Event = None,
+	chunk: int = 25,
+	starts: int = 1,
+	jobs: int = 1,
+	criterion: str = 'BIC',
+	tie: str = None,
+	tie_asymmetry: bool = True,
+	seed: int = 0,
 ) -> tuple:
 	"""
 	Main function to create multi element and multi peak fitting for a large sample set.
+	If a FitCache is passed, elements whose inputs did not change since a previous fit are
+	not fitted again (their results are reused from the cache).
+	Samples are fitted in chunks. If a checkpoint folder is passed, each finished chunk is saved
+	into it, and a restarted job with the same inputs continues from the saved chunks. Between
+	chunks, the cancel event is checked, and if set the fitting is interrupted.
+	For overlapped peaks, each fit may be started from many initial guesses (keeping the best one),
+	and the spectra (with all of their starts) are fitted in parallel by a pool of processes.
+	Statistics of every fit (time, nfev, njev, cost, optimality and status) are returned in a single table.
+	Elements with the Auto shape have their shape selected first (see fit_select), and then only
+	the selected shape is fitted for all samples.
+	If tie is passed, a global fit (see fit_global) with parameters shared by all samples is
+	performed for each element, instead of fitting every sample individually. The global fit is
+	saved as a checkpoint of its own (and may be cancelled while it is solved), and the results
+	of its samples are then created in chunks (see fit_tied).
 
 	:param iso_wavelengths: array of arrays, where each individual one is the isolated wavelength
 	:param iso_counts: array of array of matrices, where each individual one are the intensities for each sample and element: [element...[samples...[counts[wavelengths, shoots]]]]
-	:param shape: list of shapes for each element
+	:param shape: list of shapes for each element (Auto selects it by the information criterion)
 	:param asymmetry: list of asymmetries (only !=0 for Asym. Lorentzian [center/as. fixed])
 	:param isolated: Spectra.isolated structure/dict that carries values of count, nsamples, element, center, upper and lower for all peaks
 	:param mean1st: boolean that says of fit method is mean first or area first
 	:param progress: PySide Signal object (for multithreading)
-	:return: tuple of results to be added to the Spectra.fit dict of results (nfevs, convegences, data, total, heights, widths, areas, areas_std, shape)
+	:param cache: FitCache object used to memoize results of each element (optional)
+	:param checkpoint: folder to save (and resume from) finished chunks (optional)
+	:param cancel: threading Event used to cancel the fitting between chunks (optional)
+	:param chunk: number of samples fitted in each chunk
+	:param starts: number of initial guesses for each fit (1 means only the heuristic guess)
+	:param jobs: number of processes used to fit the spectra (and Auto candidates) in parallel
+	:param criterion: information criterion used by the Auto shape (AIC or BIC)
+	:param tie: parameters shared across samples in a global fit (None, Centers or Centers and widths)
+	:param tie_asymmetry: boolean to also share the asymmetry in a global fit
+	:param seed: seed for the Latin hypercube sampler of the initial guesses (multi-start)
+	:return: tuple of results to be added to the Spectra.fit dict of results (nfevs, convegences, data, total, heights, widths, areas, areas_std, shape, stats)
 	"""
 	# Creates empty arrays to save all needed elements while fitting is being performed
 	# Sizes and types will be different, depending the properties we are going to save:
@@ -247,100 +898,182 @@ def fitpeaks(
 	#   areas (+std), widths, heights: 2D array (rows = number of samples, columns = number of peaks) inside a 1D tuple (size of elements)
 	nfevs = zeros((isolated['Count'], isolated['NSamples']), dtype=int)
 	convegences = zeros((isolated['Count'], isolated['NSamples']), dtype=bool)
-	data = [zeros((isolated['NSamples'], iw.size, 2), dtype=float) for iw in iso_wavelengths]
-	total = [
-		zeros((isolated['NSamples'], 1000, len(c) + 1), dtype=float)
-		if s != 'Trapezoidal rule'
-		else zeros((isolated['NSamples'], iw.size, 2), dtype=float)
-		for c, s, iw in zip(isolated['Center'], shape, iso_wavelengths)
-	]
-	[areas, areas_std, widths, heights] = [
-		[zeros((isolated['NSamples'], len(c)), dtype=float) for c in isolated['Center']] for val in range(4)
-	]
-	shape = array(shape)
+	[data, total, heights, widths, areas, areas_std, stats] = [[None] * isolated['Count'] for val in range(7)]
+	shape = list(shape)
 	# Defines values for tolerances
 	tols = [1e-7, 1e-7, 1e-7, 1000]
-	# Goes in element level: same size as iso_wavelengths
-	for i, w in enumerate(iso_wavelengths):
-		# Gets a dict for shapes and fit equations
-		center = isolated['Center'][i]
-		scd = equations_translator(center=center, asymmetry=asymmetry[i])
-		# Now goes into sample level: size of each i-th iso_wavelengths
-		for j, ci in enumerate(iso_counts[i]):
-			# Regarding modes, we have mean 1st or area 1st, which defines how results are exported
-			if mean1st:
-				# If mean1st is True, take the mean of iso_counts[i][j] and pass it to perform fit
-				average_spectrum = mean(ci, axis=1)
-				guess = fit_guess(
-					x=w, y=average_spectrum, peaks=len(center), center=center, shape_id=shape[i], asymmetry=asymmetry[i]
-				)
-				optimized = least_squares(
-					residuals,
-					guess,
-					args=(w, average_spectrum, shape[i]),
-					kwargs=scd,
-					ftol=tols[0],
-					gtol=tols[1],
-					xtol=tols[2],
-					max_nfev=tols[3],
+	keys = []
+	# Creates the pool for multi-start and Auto (spawned processes are safe to create from Qt threads)
+	parallel = (starts > 1 or 'Auto' in shape) and jobs > 1
+	executor = ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) if parallel else None
+	try:
+		# Goes in element level: same size as iso_wavelengths
+		for i, w in enumerate(iso_wavelengths):
+			center, lower, upper = isolated['Center'][i], isolated['Lower'][i], isolated['Upper'][i]
+			# Selects the shape of the element (selection is also cached)
+			if shape[i] == 'Auto':
+				auto_key = FitCache.key('Auto', w, iso_counts[i], center, asymmetry[i], lower, upper, tols, criterion)
+				selected = cache.get(auto_key) if cache is not None else None
+				if selected is None:
+					selected = fit_select(w, iso_counts[i], asymmetry[i], center, lower, upper, tols, criterion, executor)
+					if cache is not None:
+						cache.put(auto_key, selected)
+				shape[i] = selected[0]
+			# Checks if this element was already fitted with the very same inputs
+			keys.append(
+				FitCache.key(
+					w,
+					iso_counts[i],
+					shape[i],
+					center,
+					asymmetry[i],
+					lower,
+					upper,
+					tols,
+					mean1st,
+					starts,
+					seed,
+					tie,
+					tie_asymmetry,
 				)
-				# Gets the result based on optimized solution
-				# The function returns:
-				#   [0] data -> original_intensities and residuals (columns)
-				#   [1] total_fit -> each column is a fit based on peak number (which is based on center size) and the last one is the sum
-				#   [2] heights, [3] widths, [4] areas -> size depends on number of peaks
-				results = fit_results(w, average_spectrum, optimized, shape[i], len(center), scd)
-				# Finally, appends results into the return variables
-				nfevs[i, j] = optimized.nfev
-				convegences[i, j] = optimized.success
-				data[i][j] = results[0]
-				total[i][j] = results[1]
-				heights[i][j] = results[2]
-				widths[i][j] = results[3]
-				areas[i][j] = results[4]
-			else:
-				# If mean1st is False, area1st is select, and so we will need to iterates over each individual spectrum
-				average_spectrum, shoots, npeaks = mean(ci, axis=1), ci.shape[1], len(center)
-				k_data, k_total, k_heights, k_widths, k_areas = None, None, [], [], []
-				for k in range(shoots):
-					guess = fit_guess(x=w, y=ci[:, k], peaks=npeaks, center=center, shape_id=shape[i], asymmetry=asymmetry[i])
-					k_optimized = least_squares(
-						residuals,
-						guess,
-						args=(w, average_spectrum, shape[i]),
-						kwargs=scd,
-						ftol=tols[0],
-						gtol=tols[1],
-						xtol=tols[2],
-						max_nfev=tols[3],
+			)
+			element = cache.get(keys[i]) if cache is not None else None
+			# There is nothing to tie for Trapezoidal rule
+			tied = tie is not None and shape[i] != 'Trapezoidal rule'
+			if element is None and tied:
+				# Global fits need all samples at once, so the solution is saved apart from the chunks
+				saved = checkpoint.joinpath(f'{keys[i]}_global.npz') if checkpoint is not None else None
+				if saved is not None and saved.is_file():
+					individuals, solution = checkpoint_load(saved)
+				else:
+					individuals, solution = fit_global(
+						w,
+						iso_counts[i],
+						shape[i],
+						asymmetry[i],
+						center,
+						lower,
+						upper,
+						mean1st,
+						tols,
+						tie,
+						tie_asymmetry,
+						cancel,
 					)
-					# Gets the result based on optimized solution
-					results = fit_results(w, average_spectrum, k_optimized, shape[i], len(center), scd)
-					# Saves some values
-					nfevs[i, j] += k_optimized.nfev
-					convegences[i, j] += k_optimized.success
-					k_heights.append(results[2])
-					k_widths.append(results[3])
-					k_areas.append(results[4])
-					if k == 0:
-						# 1st loop
-						k_data = results[0]
-						k_total = results[1]
+					if saved is not None:
+						checkpoint_save(saved, (individuals, solution))
+				# Rows of the solution where each sample starts (area 1st has one row per shoot)
+				rows = cumsum([0] + [1 if mean1st else ci.shape[1] for ci in iso_counts[i]])
+			if element is None:
+				# Fits the element in chunks of samples (each one may be loaded from or saved to checkpoint)
+				chunks = []
+				for start in range(0, isolated['NSamples'], chunk):
+					stop = min(start + chunk, isolated['NSamples'])
+					saved = checkpoint.joinpath(f'{keys[i]}_{start}-{stop}.npz') if checkpoint is not None else None
+					if saved is not None and saved.is_file():
+						chunks.append(checkpoint_load(saved))
+						progress.emit(stop - 1)
+						continue
+					if cancel is not None and cancel.is_set():
+						raise InterruptedError('Peak fitting was cancelled by the user')
+					counts = iso_counts[i][start:stop]
+					if tied:
+						chunks.append(
+							fit_tied(
+								w,
+								counts,
+								shape[i],
+								asymmetry[i],
+								center,
+								mean1st,
+								individuals[rows[start] : rows[stop]],
+								solution,
+								isolated['NSamples'],
+								progress,
+								start,
+							)
+						)
 					else:
-						# other loops
-						k_data += results[0]
-						k_total += results[1]
-				# Outside the k-loop, we need to reorganize data for saving
-				nfevs[i, j] /= shoots
-				convegences[i, j] /= shoots
-				data[i][j] = k_data / shoots
-				total[i][j] = k_total / shoots
-				heights[i][j] = array(k_heights).mean()
-				widths[i][j] = array(k_widths).mean()
-				areas[i][j] = array(k_areas).mean()
-				areas_std[i][j] = array(k_areas).std()
-			progress.emit(j)
-	return nfevs, convegences, tuple(data), tuple(total), tuple(heights), tuple(widths), tuple(areas), tuple(areas_std), shape
+						chunks.append(
+							fit_element(
+								w,
+								counts,
+								shape[i],
+								asymmetry[i],
+								center,
+								lower,
+								upper,
+								mean1st,
+								tols,
+								progress,
+								start,
+								starts,
+								executor,
+								jobs,
+								seed,
+							)
+						)
+					if saved is not None:
+						checkpoint_save(saved, chunks[-1])
+				element = tuple(concatenate(result) for result in zip(*chunks))
+				if cache is not None:
+					cache.put(keys[i], element)
+			else:
+				progress.emit(isolated['NSamples'] - 1)
+			# Saves results of the element
+			nfevs[i], convegences[i], data[i], total[i], heights[i], widths[i], areas[i], areas_std[i], stats[i] = element
+			# Statistics of each fit (one row per sample) are organized in a single table
+			stats[i] = DataFrame(stats[i], columns=STATS_COLUMNS).astype({'NFev': int, 'NJev': int, 'Status': int})
+			stats[i].insert(0, 'Element', isolated['Element'][i])
+			stats[i].insert(1, 'Sample', arange(isolated['NSamples']))
+			stats[i].insert(2, 'Shape', shape[i])
+			stats[i]['Convergence'] = convegences[i]
+	finally:
+		# Pool is always released (also when the job is cancelled or fails)
+		if executor is not None:
+			executor.shutdown(cancel_futures=True)
+	# With the job finished, its checkpoints (and old ones from unfinished jobs) are no longer needed
+	if checkpoint is not None:
+		checkpoint_prune(checkpoint, keys)
+	return (
+		nfevs,
+		convegences,
+		tuple(data),
+		tuple(total),
+		tuple(heights),
+		tuple(widths),
+		tuple(areas),
+		tuple(areas_std),
+		array(shape),
+		concat(stats, ignore_index=True),
+	)
+
+
+def fit_summary(stats: DataFrame, bins: int = 10) -> dict:
+	"""
+	Summarizes the statistics of the fits (as returned by fitpeaks), to find where the fitting time is spent.
+
+	:param stats: table with the statistics of every fit
+	:param bins: number of bins for the histogram of function evaluations
+	:return: dict of tables: Slowest (elements sorted by total time), Failures (non-converged fits) and NFev (histogram)
+	"""
+	slowest = (
+		stats
+		.groupby(['Element', 'Shape'], sort=False)
+		.agg(
+			Fits=('Time', 'size'),
+			Time_Total=('Time', 'sum'),
+			Time_Mean=('Time', 'mean'),
+			NFev_Total=('NFev', 'sum'),
+			NFev_Mean=('NFev', 'mean'),
+			Non_Converged=('Convergence', lambda c: int((~c.astype(bool)).sum())),
+		)
+		.sort_values('Time_Total', ascending=False)
+	)
+	failures = stats[~stats['Convergence'].astype(bool) | (stats['Status'] <= 0)]
+	counts, edges = histogram(stats['NFev'], bins=bins)
+	nfev = DataFrame({'NFev_From': edges[:-1], 'NFev_To': edges[1:], 'Fits': counts})
+	return {'Slowest': slowest, 'Failures': failures, 'NFev': nfev}
 
 
 def equations_translator(center: list, asymmetry: float) -> dict:
@@ -368,6 +1101,65 @@ def equations_translator(center: list, asymmetry: float) -> dict:
 	return shapes_and_curves_dict
 
 
+def linear_parameters(
+	mode: str,
+	reference: Series,
+	values: tuple,
+	base: str,
+	base_peak: int,
+	selected: str,
+	selected_peak: int,
+	elements: ndarray,
+	noise: ndarray,
+	param: str,
+) -> tuple:
+	"""
+	Builds the attributes of the linear models of a base peak (one column for each candidate model of the
+	mode), with their names and the noise used for LoD and LoQ. See linear_model for the parameters.
+
+	:return: tuple with names, attributes, noise (sigma) of each model and noise pools of blank samples (base and normalization)
+	"""
+	# Defines base variables
+	idx_b = where(elements == base)[0][0]
+	val_b = values[idx_b][:, base_peak]
+	blank = reference == min(reference)
+	sigma = noise[idx_b][blank].min()
+	pool_n = None
+	# Builds the attributes (one column for each candidate model), with their names and noise for LoD/LoQ
+	if mode == 'No Norm':
+		title = '<b>{0}<sub>{1}</sub></b> (No Normalization) [Ref: <u>{2}</u>] (Param: <i>{3}</i>)'
+		pred_name = [title.format(base, base_peak + 1, reference.name, param)]
+		parameters, sigmas = val_b.reshape(-1, 1), array([sigma])
+	elif mode == 'Peak Norm':
+		title_norm = '<b>{0}<sub>{1}</sub></b> / <b>{2}<sub>{3}</sub></b> [Ref: <u>{4}</u>] (Param: <i>{5}</i>)'
+		idx_s = where(elements == selected)[0][0]
+		sigma_n = noise[idx_s][blank].min()
+		pool_n = noise[idx_s][blank].reshape(1, -1)
+		pred_name = [title_norm.format(base, base_peak + 1, selected, selected_peak + 1, reference.name, param)]
+		parameters, sigmas = (val_b / values[idx_s][:, selected_peak]).reshape(-1, 1), array([sigma / sigma_n])
+	else:
+		if mode == 'All Norm':
+			title_norm = '<b>{0}<sub>{1}</sub></b> / <b>{2}<sub>{3}</sub></b> [Ref: <u>{4}</u>] (Param: <i>{5}</i>)'
+		else:
+			title_norm = '<b>{0}<sub>{1}</sub>*{2}<sub>{3}</sub></b> / <b>{0}<sub>{1}</sub>+{2}<sub>{3}</sub></b> [Ref: <u>{4}</u>] (Param: <i>{5}</i>)'
+		# All peaks of all elements but base are used for normalization (each peak is a column)
+		others = [idx for idx, e in enumerate(elements) if idx != idx_b]
+		val_e = hstack([values[idx] for idx in others])
+		pool_n = array([noise[idx][blank].ravel() for idx in others for _ in range(values[idx].shape[1])])
+		sigma_n = pool_n.min(axis=1)
+		pred_name = [
+			title_norm.format(base, base_peak + 1, elements[idx], c + 1, reference.name, param)
+			for idx in others
+			for c in range(values[idx].shape[1])
+		]
+		if mode == 'All Norm':
+			parameters, sigmas = val_b[:, None] / val_e, sigma / sigma_n
+		else:
+			parameters = (val_b[:, None] * val_e) / (val_b[:, None] + val_e)
+			sigmas = (sigma * sigma_n) / (sigma + sigma_n)
+	return pred_name, parameters, sigmas, noise[idx_b][blank].ravel(), pool_n
+
+
 def linear_model(
 	mode: str,
 	reference: Series,
@@ -379,10 +1171,15 @@ def linear_model(
 	elements: ndarray,
 	noise: ndarray,
 	param: str,
+	cv: int = 0,
+	boots: int = 0,
+	jobs: int = 1,
+	progress: Signal = None,
 ) -> tuple:
 	"""
 	Performs linear model of two dependant variables: reference (true value) and the values (dependant).
 	Values can be areas or heights. The function fits a curve of type: Predict = INTERCEPT + SLOPE * Reference
+	Every model is also cross-validated (see linear_cv) and, optionally, bootstrapped (see linear_bootstrap).
 
 	:param mode: mode of operation. Will defines if normalization is or isn't needed
 	:param reference: vaules of reference
@@ -394,81 +1191,321 @@ def linear_model(
 	:param elements: full elements isolated (for all normalization)
 	:param noise: array containing values of the standard deviation of noise for each sample (for LoD and LoQ)
 	:param param: which parameter is being used (area or height)
-	:return: tuple of results to be stored in Spectra.linear (ref, predict, r2, rmse, slope, intercept, lod, loq)
+	:param cv: number of folds for cross-validation (0 means leave-one-out)
+	:param boots: number of bootstrap resamples for confidence intervals (0 means no bootstrap)
+	:param jobs: number of processes used by bootstrap
+	:param progress: PySide Signal object (for multithreading)
+	:return: tuple of results to be stored in Spectra.linear (ref, predict, r2, rmse, slope, intercept, lod, loq, rmsecv, bootstrap)
 	"""
-	# Defines base variables
-	idx_b = where(elements == base)[0][0]
-	val_b = values[idx_b][:, base_peak]
-	sigma = noise[idx_b][reference == min(reference)].min()
-	pred_name, pred_val, r2, rmse, slope, intercept, lod, loq = [], [], [], [], [], [], [], []
-	# Does the calculations depending on the mode
-	if mode == 'No Norm':
-		title = '<b>{0}<sub>{1}</sub></b> (No Normalization) [Ref: <u>{2}</u>] (Param: <i>{3}</i>)'
-		parameter = val_b.reshape(-1, 1)
-		model = LinearRegression().fit(parameter, reference)
-		pred_name.append(title.format(base, base_peak + 1, reference.name, param))
-		pred_val.append(model.predict(parameter))
-		r2.append(model.score(parameter, reference))
-		rmse.append(mean_squared_error(reference, pred_val[-1]) ** 0.5)
-		slope.append(model.coef_[0])
-		intercept.append(model.intercept_)
-		# Calculates Limit of detection (LoD) and Limit of quantification (LoQ)
-		s = polyfit(reference, parameter, 1)[0][0]
-		lod.append(3.3 * sigma / s)
-		loq.append(10 * sigma / s)
-	else:
-		title_norm = '<b>{0}<sub>{1}</sub></b> / <b>{2}<sub>{3}</sub></b> [Ref: <u>{4}</u>] (Param: <i>{5}</i>)'
-		if mode == 'Peak Norm':
-			idx_s = where(elements == selected)[0][0]
-			val_s = values[idx_s][:, selected_peak]
-			parameter = (val_b / val_s).reshape(-1, 1)
-			model = LinearRegression().fit(parameter, reference)
-			pred_name.append(title_norm.format(base, base_peak + 1, selected, selected_peak + 1, reference.name, param))
-			pred_val.append(model.predict(parameter))
-			r2.append(model.score(parameter, reference))
-			rmse.append(mean_squared_error(reference, pred_val[-1]) ** 0.5)
-			slope.append(model.coef_[0])
-			intercept.append(model.intercept_)
-			# Calculates Limit of detection (LoD) and Limit of quantification (LoQ)
-			sigma_n = noise[idx_s][reference == min(reference)].min()
-			s = polyfit(reference, parameter, 1)[0][0]
-			lod.append((3.3 * (sigma / sigma_n)) / s)
-			loq.append((10 * (sigma / sigma_n)) / s)
-		else:
-			# Gets list for all but base
-			n_elements = list(elements)
-			for i, p in enumerate(n_elements):
-				if p == base:
-					n_elements.pop(i)
-					break
-			# Perform normalized/equivalent model for each peak
-			for e in n_elements:
-				idx_e = where(elements == e)[0][0]
-				val_e = values[idx_e]
-				sigma_n = noise[idx_e][reference == min(reference)].min()
-				sigma_e = sigma / sigma_n
-				for c in range(val_e.shape[1]):
-					if mode == 'All Norm':
-						parameter = (val_b / val_e[:, c]).reshape(-1, 1)
-					else:
-						title_norm = '<b>{0}<sub>{1}</sub>*{2}<sub>{3}</sub></b> / <b>{0}<sub>{1}</sub>+{2}<sub>{3}</sub></b> [Ref: <u>{4}</u>] (Param: <i>{5}</i>)'
-						parameter = ((val_b * val_e[:, c]) / (val_b + val_e[:, c])).reshape(-1, 1)
-						sigma_e = (sigma * sigma_n) / (sigma + sigma_n)
-					model = LinearRegression().fit(parameter, reference)
-					pred_name.append(title_norm.format(base, base_peak + 1, e, c + 1, reference.name, param))
-					pred_val.append(model.predict(parameter))
-					r2.append(model.score(parameter, reference))
-					rmse.append(mean_squared_error(reference, pred_val[-1]) ** 0.5)
-					slope.append(model.coef_[0])
-					intercept.append(model.intercept_)
-					# Calculates Limit of detection (LoD) and Limit of quantification (LoQ)
-					s = polyfit(reference, parameter, 1)[0][0]
-					lod.append(3.3 * sigma_e / s)
-					loq.append(10 * sigma_e / s)
+	pred_name, parameters, sigmas, pool_b, pool_n = linear_parameters(
+		mode, reference, values, base, base_peak, selected, selected_peak, elements, noise, param
+	)
+	# Closed-form least squares for all columns at once: Predict = INTERCEPT + SLOPE * Parameter
+	y = reference.to_numpy(dtype=float)
+	slope, intercept, r = linregress_rows(parameters.T, broadcast_to(y, parameters.T.shape))[:3]
+	pred_val = intercept + slope * parameters
+	r2, rmse = r**2, sqrt(((y[:, None] - pred_val) ** 2).mean(axis=0))
+	# Calculates Limit of detection (LoD) and Limit of quantification (LoQ), using the inverse regression
+	s = linregress_rows(y, parameters.T)[0]
+	lod, loq = 3.3 * sigmas / s, 10 * sigmas / s
 	# Organizes variables to return
 	ref = array((reference.name, reference.to_numpy(), param), dtype=object)
-	predict = array((list(zip(pred_name, pred_val))), dtype=object)
-	return ref, predict, array(r2), array(rmse), array(slope), array(intercept), array(lod), array(loq)
+	predict = array((list(zip(pred_name, pred_val.T))), dtype=object)
+	# Bootstrap resamples samples (for the regressions) and the noise of blank samples (for LoD/LoQ)
+	bootstrap = DataFrame()
+	if boots:
+		bootstrap = linear_bootstrap(parameters, y, pool_b, pool_n, mode, boots, jobs=jobs, progress=progress)
+	return ref, predict, r2, rmse, slope, intercept, lod, loq, linear_cv(parameters, y, cv), bootstrap
+
+
+def linear_draws(
+	parameters: ndarray, y: ndarray, pool_b: ndarray, pool_n: ndarray, mode: str, draws: int, seed: SeedSequence
+) -> ndarray:
+	"""
+	Bootstrap of a batch of draws for all univariate models (columns of parameters) at once.
+
+	:param parameters: attribute matrix (one column for each model)
+	:param y: values of reference
+	:param pool_b: noise values of blank samples for the base peak
+	:param pool_n: noise values of blank samples for the normalization peak of each model (or None)
+	:param mode: mode of operation (defines how noise of base and normalization peaks are combined)
+	:param draws: number of resamples
+	:param seed: seed for the random generator of the batch
+	:return: array of resampled values [(slope, intercept, lod, loq), draws, models]
+	"""
+	rng = default_rng(seed)
+	(n, m), k = parameters.shape, pool_b.size
+	# Resamples samples: each draw is a regression for every column
+	idx = rng.integers(n, size=(draws, n))
+	x = parameters[idx].transpose(0, 2, 1).reshape(draws * m, n)
+	yb = broadcast_to(y[idx][:, None, :], (draws, m, n)).reshape(draws * m, n)
+	with errstate(divide='ignore', invalid='ignore'):
+		slope, intercept = linregress_rows(x, yb)[:2]
+		s = linregress_rows(yb, x)[0].reshape(draws, m)
+		# Resamples noise of blank samples (sigma is the minimum, as in linear_model)
+		sigma = pool_b[rng.integers(k, size=(draws, k))].min(axis=1)[:, None]
+		if pool_n is not None:
+			sigma_n = pool_n[arange(m)[:, None], rng.integers(k, size=(draws, m, k))].min(axis=2)
+			sigma = sigma * sigma_n / (sigma + sigma_n) if mode == 'Equivalent Peak' else sigma / sigma_n
+		values = stack((slope.reshape(draws, m), intercept.reshape(draws, m), 3.3 * sigma / s, 10 * sigma / s))
+	# Degenerated resamples (e.g. a single repeated sample) are ignored
+	values[~isfinite(values)] = nan
+	return values
+
+
+def linear_bootstrap(
+	parameters: ndarray,
+	y: ndarray,
+	pool_b: ndarray,
+	pool_n: ndarray,
+	mode: str,
+	boots: int = 2000,
+	percentiles: tuple = (2.5, 97.5),
+	jobs: int = 1,
+	seed: int = 0,
+	progress: Signal = None,
+) -> DataFrame:
+	"""
+	Bootstrap confidence intervals for slope, intercept, LoD and LoQ of univariate models. Samples are
+	resampled for the regressions, and noise of blank samples (lowest reference) for LoD and LoQ.
+	Draws are split into batches, which may be solved by a process pool.
+
+	:param parameters: attribute matrix (one column for each model)
+	:param y: values of reference
+	:param pool_b: noise values of blank samples for the base peak
+	:param pool_n: noise values of blank samples for the normalization peak of each model (or None)
+	:param mode: mode of operation (defines how noise of base and normalization peaks are combined)
+	:param boots: number of resamples
+	:param percentiles: percentiles to be reported
+	:param jobs: number of processes used to solve the batches
+	:param seed: seed for the random generator (for reproducible results)
+	:param progress: PySide Signal object (for multithreading), emitted with the last draw of each batch
+	:return: DataFrame with the percentiles of each parameter for each model
+	"""
+	# Draws are split into batches limited in memory, each one with an independent seed
+	size = max(1, MC_BATCH // parameters.size)
+	batches = [min(size, boots - i) for i in range(0, boots, size)]
+	seeds = SeedSequence(seed).spawn(len(batches))
+	args = [(parameters, y, pool_b, pool_n, mode, b, s) for b, s in zip(batches, seeds)]
+	values, parallel = [], jobs > 1 and len(batches) > 1
+	with ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) if parallel else nullcontext() as executor:
+		mapper = executor.map if parallel else map
+		for done, batch in zip(cumsum(batches), mapper(linear_draws, *zip(*args))):
+			values.append(batch)
+			if progress is not None:
+				progress.emit(int(done) - 1)
+	intervals = nanpercentile(concatenate(values, axis=1), percentiles, axis=1).transpose(2, 1, 0)
+	columns = [f'{q}_P{p:g}' for q in ('Slope', 'Intercept', 'LoD', 'LoQ') for p in percentiles]
+	return DataFrame(data=intervals.reshape(parameters.shape[1], -1), columns=columns)
+
+
+def linear_cv(parameters: ndarray, y: ndarray, cv: int = 0) -> ndarray:
+	"""
+	Cross-validation (RMSECV) of the univariate linear models of every column of parameters.
+	Leave-one-out is obtained analytically with the PRESS statistic (residuals divided by 1 - leverage),
+	and k-fold fits all columns of each fold at once.
+
+	:param parameters: attribute matrix (one column for each model)
+	:param y: values of reference
+	:param cv: number of folds (0 or 1 means leave-one-out, as well as any value above the number of samples)
+	:return: array with the RMSECV of each model
+	"""
+	n = y.size
+	if cv in (0, 1) or cv >= n:
+		# Leverage of simple linear regression: h = 1/n + (x - mean(x))^2 / sum((x - mean(x))^2)
+		slope, intercept = linregress_rows(parameters.T, broadcast_to(y, parameters.T.shape))[:2]
+		deviations = parameters - parameters.mean(axis=0)
+		leverage = 1 / n + deviations**2 / (deviations**2).sum(axis=0)
+		press = (((y[:, None] - intercept - slope * parameters) / (1 - leverage)) ** 2).sum(axis=0)
+	elif cv > 1:
+		press = zeros(parameters.shape[1])
+		for train, test in KFold(n_splits=cv, shuffle=True, random_state=0).split(parameters):
+			p_train = parameters[train].T
+			slope, intercept = linregress_rows(p_train, broadcast_to(y[train], p_train.shape))[:2]
+			press += ((y[test, None] - intercept - slope * parameters[test]) ** 2).sum(axis=0)
+	else:
+		raise ValueError(f'Invalid number of folds for cross-validation: {cv}')
+	return sqrt(press / n)
+
+
+def linear_norms(values: tuple, elements: ndarray, idx_b: int) -> list:
+	"""
+	Names of the normalization peaks of a base peak, in the same order of the columns of linear_model.
+
+	:param values: values to be used for predictions (areas or heights)
+	:param elements: full elements isolated
+	:param idx_b: index of the element of the base peak
+	:return: list of peaks names (element_peak)
+	"""
+	return [f'{e}_{c + 1}' for idx, e in enumerate(elements) if idx != idx_b for c in range(values[idx].shape[1])]
+
+
+def linear_explore_reference(
+	reference: Series, values: tuple, elements: ndarray, noise: ndarray, param: str, cv: int = 0, modes: tuple = EXPLORER_MODES
+) -> DataFrame:
+	"""
+	Evaluates linear models of every base peak (and every mode) for a single reference.
+
+	:param reference: values of reference
+	:param values: values to be used for predictions (areas or heights)
+	:param elements: full elements isolated
+	:param noise: array containing values of the standard deviation of noise for each sample (for LoD and LoQ)
+	:param param: which parameter is being used (area or height)
+	:param cv: number of folds for cross-validation (0 means leave-one-out)
+	:param modes: modes of linear model to be evaluated
+	:return: DataFrame with one row for each model (and its metrics)
+	"""
+	tables = []
+	for idx_b, base in enumerate(elements):
+		norms = linear_norms(values, elements, idx_b)
+		for base_peak in range(values[idx_b].shape[1]):
+			for mode in modes:
+				if mode != 'No Norm' and not norms:
+					continue
+				linear = linear_model(mode, reference, values, base, base_peak, '', 0, elements, noise, param, cv)
+				table = DataFrame({
+					'R2': linear[2],
+					'RMSE': linear[3],
+					'RMSECV': linear[8],
+					'Slope': linear[4],
+					'Intercept': linear[5],
+					'LoD': linear[6],
+					'LoQ': linear[7],
+				})
+				table.insert(0, 'Reference', reference.name)
+				table.insert(1, 'Base', f'{base}_{base_peak + 1}')
+				table.insert(2, 'Mode', mode)
+				table.insert(3, 'Normalization', [''] if mode == 'No Norm' else norms)
+				tables.append(table)
+	return concat(tables, ignore_index=True)
+
+
+def linear_explorer(
+	references: DataFrame,
+	values: tuple,
+	elements: ndarray,
+	noise: ndarray,
+	param: str,
+	progress: Signal,
+	top: int = 20,
+	jobs: int = 1,
+	cv: int = 0,
+) -> DataFrame:
+	"""
+	Calibration explorer: evaluates linear models of every base peak, normalization peak and mode
+	for every reference (see linear_explore_reference), and ranks them. The score is the mean of the
+	percentile ranks of R2 (among all models), RMSE and LoD (among models of the same reference, since
+	both have its units). Negative LoDs (negative slopes) are ranked last.
+
+	:param references: DataFrame with references (one column for each)
+	:param values: values to be used for predictions (areas or heights)
+	:param elements: full elements isolated
+	:param noise: array containing values of the standard deviation of noise for each sample (for LoD and LoQ)
+	:param param: which parameter is being used (area or height)
+	:param progress: PySide Signal object (for multithreading)
+	:param top: number of best models to be returned
+	:param jobs: number of processes used to evaluate the references in parallel
+	:param cv: number of folds for cross-validation (0 means leave-one-out)
+	:return: DataFrame with the best models, sorted by score
+	"""
+	n = len(references.columns)
+	args = ([references[r] for r in references.columns], [values] * n, [elements] * n, [noise] * n, [param] * n, [cv] * n)
+	tables = []
+	if jobs > 1 and n > 1:
+		with ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) as executor:
+			for i, table in enumerate(executor.map(linear_explore_reference, *args)):
+				tables.append(table)
+				progress.emit(i)
+	else:
+		for i, table in enumerate(map(linear_explore_reference, *args)):
+			tables.append(table)
+			progress.emit(i)
+	table = concat(tables, ignore_index=True)
+	# Ranks models by their metrics
+	lod = table['LoD'].where(table['LoD'] > 0)
+	ranks = (
+		table['R2'].rank(ascending=False, pct=True),
+		table.groupby('Reference')['RMSE'].rank(pct=True),
+		lod.groupby(table['Reference']).rank(pct=True).fillna(1.0),
+	)
+	table['Score'] = concat(ranks, axis=1).mean(axis=1)
+	return table.sort_values('Score', kind='stable').head(top).reset_index(drop=True)
+
+
+def linear_best(
+	explorer: DataFrame, references: DataFrame, values: tuple, elements: ndarray, noise: ndarray, param: str, rank: int = 0
+) -> tuple:
+	"""
+	Loads a model ranked by the calibration explorer (see linear_explorer) as a linear model. Its metrics
+	are reused (the model is not fitted again), and only its attributes are built to create the predictions.
+	Bootstrap is not performed by the explorer, so it is empty.
+
+	:param explorer: DataFrame with the ranked models
+	:param references: DataFrame with references (one column for each)
+	:param values: values to be used for predictions (areas or heights)
+	:param elements: full elements isolated
+	:param noise: array containing values of the standard deviation of noise for each sample (for LoD and LoQ)
+	:param param: which parameter is being used (area or height)
+	:param rank: position of the model in the explorer
+	:return: tuple of results to be stored in Spectra.linear (same as linear_model)
+	"""
+	model = explorer.iloc[rank]
+	base, base_peak = model['Base'].rsplit('_', 1)
+	reference = references[model['Reference']]
+	names, parameters = linear_parameters(
+		model['Mode'], reference, values, base, int(base_peak) - 1, '', 0, elements, noise, param
+	)[:2]
+	norms = linear_norms(values, elements, where(elements == base)[0][0])
+	column = norms.index(model['Normalization']) if model['Mode'] != 'No Norm' else 0
+	metrics = {k: array([model[k]], dtype=float) for k in ('R2', 'RMSE', 'Slope', 'Intercept', 'LoD', 'LoQ', 'RMSECV')}
+	ref = array((reference.name, reference.to_numpy(), param), dtype=object)
+	predict = array([(names[column], metrics['Intercept'][0] + metrics['Slope'][0] * parameters[:, column])], dtype=object)
+	return (
+		ref,
+		predict,
+		metrics['R2'],
+		metrics['RMSE'],
+		metrics['Slope'],
+		metrics['Intercept'],
+		metrics['LoD'],
+		metrics['LoQ'],
+		metrics['RMSECV'],
+		DataFrame(),
+	)
+
+
+def attribute_matrix(mode: str, data: object) -> ndarray:
+	"""
+	Builds the attribute matrix (samples in rows, attributes in columns) of a PCA/PLS mode. The
+	matrix is allocated once, and each block is filled in place at its column offset:
+		* Raw: mean spectrum of each sample (data is the counts array of all samples)
+		* Isolated: mean isolated peaks of all elements, side by side (data is the isolated counts [element][sample])
+		* Areas/Heights: values of all peaks of all elements (data is a tuple of [samples, peaks] matrices, one per element)
+
+	:param mode: attributes mode (Raw, Isolated, Areas or Heights)
+	:param data: data the attributes are built from (see above)
+	:return: attribute matrix
+	"""
+	if mode == 'Raw':
+		blocks = [data]
+	elif mode == 'Isolated':
+		blocks = list(data)
+	elif mode in ('Areas', 'Heights'):
+		blocks = [array(values, dtype=float).reshape(len(values), -1) for values in data]
+	else:
+		raise ValueError(f'Unknown attributes mode: {mode}')
+	# Block widths: wavelengths for counts (Raw and Isolated), or peaks for fitted values
+	widths = [b[0].shape[0] if b.dtype == object else b.shape[1] for b in blocks]
+	offsets = cumsum([0] + widths)
+	attributes = zeros((len(blocks[0]), offsets[-1]))
+	for block, start, stop in zip(blocks, offsets, offsets[1:]):
+		if block.dtype == object:
+			# Counts of each sample may have a different number of shoots (after outliers removal)
+			for j, sample in enumerate(block):
+				sample.mean(axis=1, out=attributes[j, start:stop])
+		else:
+			attributes[:, start:stop] = block
+	return attributes
 
 
 def pca_scan(attributes: ndarray, norm: bool = False) -> tuple:
@@ -476,57 +1513,227 @@ def pca_scan(attributes: ndarray, norm: bool = False) -> tuple:
 	PCA_Scan function. Receives the attributes matrix and returns the cumulative
 	explained variance and optimum number of components (where var > 0.95). If the
 	user requested to normalise the matrix, returns the transformed one.
+	The decomposition is also returned, so models with any number of components
+	are obtained by slicing it (see pca_do). For large matrices (e.g. Raw spectra of
+	many samples) only the leading PCA_COMPONENTS are computed, by randomized SVD. If
+	they do not reach PCA_VARIANCE, the scan is repeated with twice the components
+	(and the full decomposition is used once they are no longer a small part of it).
 
 	:param attributes: attributes matrix. Each row is a sample, and column an attribute
 	:param norm: boolean to choose if attribute matrix will be normalised or not
-	:return: tuple of results
+	:return: tuple of results (attributes, explained variance, optimum components, components, singular values, mean, scaler)
 	"""
 	# organize attributes matrix
-	f_attributes = StandardScaler().fit_transform(attributes) if norm else attributes
-	# perform full PCA
-	pca = PCA().fit(f_attributes)
-	# checks and corrects explained variance
-	explained_variance = cumsum(pca.explained_variance_ratio_)
-	difference = f_attributes.shape[0] - explained_variance.shape[0]
-	if difference != 0:
-		explained_variance = hstack((explained_variance, ones(difference)))
+	scaler = StandardScaler().fit(attributes) if norm else None
+	f_attributes = scaler.transform(attributes) if norm else attributes
+	n_comp = PCA_COMPONENTS
+	while min(f_attributes.shape) > 2 * n_comp:
+		# perform truncated PCA: total variance comes from the Frobenius norm of the centered matrix
+		pca = PCA(n_comp, svd_solver='randomized', random_state=0).fit(f_attributes)
+		total = matrix_norm(f_attributes - pca.mean_) ** 2 / (f_attributes.shape[0] - 1)
+		explained_variance = cumsum(pca.explained_variance_) / total
+		if explained_variance[-1] >= PCA_VARIANCE:
+			break
+		n_comp *= 2
+	else:
+		# perform full PCA
+		pca = PCA().fit(f_attributes)
+		# checks and corrects explained variance
+		explained_variance = cumsum(pca.explained_variance_ratio_)
+		difference = f_attributes.shape[0] - explained_variance.shape[0]
+		if difference != 0:
+			explained_variance = hstack((explained_variance, ones(difference)))
 	# defines minimum components for +95% variance
-	optimum_ncomp = len(explained_variance[explained_variance < 0.96])
-	return f_attributes, explained_variance, optimum_ncomp
+	optimum_ncomp = min(len(explained_variance[explained_variance < PCA_VARIANCE]), len(explained_variance) - 1)
+	return f_attributes, explained_variance, optimum_ncomp, pca.components_, pca.singular_values_, pca.mean_, scaler
 
 
-def pca_do(attributes: ndarray, n_comp: int) -> tuple:
+def pca_do(attributes: ndarray, n_comp: int, components: ndarray, mean: ndarray) -> tuple:
 	"""
-	PCA_Do function. Uses the attributes to perform the PCA model, obtaining the
-	loadings and transformed date (scores) for each PC.
+	PCA_Do function. Uses the decomposition obtained by pca_scan to build the PCA model
+	with n_comp components, obtaining the loadings and transformed date (scores) for each PC.
 
 	:param attributes: attribute matrix (might be normalized)
 	:param n_comp: number of components to do the PCA
+	:param components: principal axes of the full decomposition (one component per row)
+	:param mean: mean of each attribute (used to center the matrix)
 	:return: tuple of results (scores and loadings)
 	"""
-	pca = PCA(n_comp).fit(attributes)
-	loadings = pca.components_.T
-	transformed = pca.transform(attributes)
+	loadings = components[:n_comp].T
+	# Projection is made in batches, so memory-mapped attributes are never fully loaded
+	transformed = concatenate([
+		(attributes[i : i + PCA_BATCH] - mean) @ loadings for i in range(0, attributes.shape[0], PCA_BATCH)
+	])
 	return transformed, loadings
 
 
-def pls_do(attributes: ndarray, reference: DataFrame, n_comp: int, scale: bool, cv_split: int = 5) -> tuple:
+def pca_batches(n: int, batch: int, n_comp: int) -> list:
+	"""
+	Splits n samples into batches for incremental PCA. Every batch must have at least n_comp
+	samples, so a small last batch is merged with the previous one.
+
+	:param n: number of samples
+	:param batch: number of samples in each batch
+	:param n_comp: number of components of the decomposition
+	:return: list of slices (one per batch)
+	"""
+	batch = max(batch, n_comp)
+	starts = list(range(0, n, batch))
+	if len(starts) > 1 and n - starts[-1] < n_comp:
+		starts.pop()
+	return [slice(i, j) for i, j in zip(starts, starts[1:] + [n])]
+
+
+def pca_incremental(counts: ndarray, norm: bool = False, batch: int = PCA_BATCH, cache: Path = None) -> tuple:
+	"""
+	Out-of-core alternative to pca_scan for Raw spectra. Mean spectra of the samples are written,
+	in batches, into a memory-mapped file, and the leading PCA_COMPONENTS are obtained by incremental
+	PCA, updated batch by batch. Only a batch of samples is held in memory at a time (when counts
+	is a SampleReader, each batch is read from the source files). If the components do not reach
+	PCA_VARIANCE, the decomposition is repeated (from the mapped file) with twice the components.
+
+	:param counts: count array for all samples (each element is a matrix), or a SampleReader
+	:param norm: boolean to choose if attribute matrix will be normalised or not
+	:param batch: number of samples in each batch
+	:param cache: file used to map the attribute matrix (if None, a temporary file is used)
+	:return: tuple of results (attributes, explained variance, optimum components, components, singular values, mean, scaler)
+	"""
+	n, p = len(counts), counts[0].shape[0]
+	n_comp = min(PCA_COMPONENTS, n, p)
+	attributes = memmap(TemporaryFile() if cache is None else cache, dtype=float, mode='w+', shape=(n, p))
+	# 1st pass: mean spectra are saved (and statistics for feature scaling are updated)
+	scaler = StandardScaler()
+	for b in pca_batches(n, batch, n_comp):
+		attributes[b] = stack([c.mean(1) for c in counts[b]])
+		scaler.partial_fit(attributes[b])
+	# 2nd pass: decomposition is updated with each (scaled) batch, and repeated with more components if needed
+	scaled = not norm
+	while True:
+		pca = IncrementalPCA(n_comp)
+		for b in pca_batches(n, batch, n_comp):
+			if not scaled:
+				attributes[b] = scaler.transform(attributes[b])
+			pca.partial_fit(attributes[b])
+		scaled = True
+		explained_variance = cumsum(pca.explained_variance_ratio_)
+		if explained_variance[-1] >= PCA_VARIANCE or n_comp == min(n, p):
+			break
+		n_comp = min(2 * n_comp, n, p)
+	attributes.flush()
+	if n_comp == p < n:
+		explained_variance = hstack((explained_variance, ones(n - p)))
+	optimum_ncomp = min(len(explained_variance[explained_variance < PCA_VARIANCE]), len(explained_variance) - 1)
+	return (
+		attributes,
+		explained_variance,
+		optimum_ncomp,
+		pca.components_,
+		pca.singular_values_,
+		pca.mean_,
+		scaler if norm else None,
+	)
+
+
+def pls_folds(cv_split: int, repeats: int) -> object:
+	"""
+	Folds used by PLS cross validation: shuffled k-fold, or shuffled repeated k-fold if repeats > 1. Samples
+	are shuffled (with a fixed seed) since they are usually ordered by their references.
+
+	:param cv_split: number of folds
+	:param repeats: number of repetitions
+	:return: cross validation splitter
+	"""
+	return (
+		KFold(cv_split, shuffle=True, random_state=0)
+		if repeats == 1
+		else RepeatedKFold(n_splits=cv_split, n_repeats=repeats, random_state=0)
+	)
+
+
+def pls_sweep(
+	attributes: ndarray,
+	reference: DataFrame,
+	max_comp: int,
+	scale: bool,
+	cv_split: int = 5,
+	repeats: int = 1,
+	jobs: int = 1,
+	progress: Signal = None,
+) -> DataFrame:
+	"""
+	Cross validation of PLS models from 1 to max_comp latent variables in a single pass. Each fold
+	fits a single model with max_comp components, and predictions of smaller models are read from
+	its first components (NIPALS components do not depend on the number of components asked).
+
+	:param attributes: attribute matrix (samples in rows, attributes in columns)
+	:param reference: reference/true value DF for a single element (for modelling)
+	:param max_comp: maximum number of components/latent variables
+	:param scale: boolean to turn on/off the normalization of the input data
+	:param cv_split: determines how many groups will be used to perform cross validation (default: 5-fold)
+	:param repeats: number of repetitions of the cross validation (samples are shuffled when above 1)
+	:param jobs: number of parallel jobs used to train the folds
+	:param progress: PySide Signal object (for multithreading), emitted for each fold
+	:return: DataFrame with RMSE and R2 of cross validation for each number of components
+	"""
+	reference = array(reference, dtype=float).reshape(-1)
+	max_comp = min(max_comp, attributes.shape[1])
+	# Folds are split beforehand, so each estimator is matched to its train/test indices
+	folds = list(pls_folds(cv_split, repeats).split(attributes))
+	cv = cross_validate(
+		PLSRegression(max_comp, scale=scale), attributes, reference, cv=folds, n_jobs=jobs, return_estimator=True
+	)
+	cv_pred = zeros((reference.size, max_comp))
+	for i, (estimator, (train, test)) in enumerate(zip(cv['estimator'], folds)):
+		# Same centering and scaling of PLSRegression (constant columns are not scaled)
+		x_mean, y_mean = attributes[train].mean(axis=0), reference[train].mean()
+		x_std, y_std = ones(attributes.shape[1]), 1.0
+		if scale:
+			x_std, y_std = attributes[train].std(axis=0, ddof=1), reference[train].std(ddof=1)
+			x_std[x_std == 0] = 1.0
+		scores = ((attributes[test] - x_mean) / x_std) @ estimator.x_rotations_
+		cv_pred[test] += (y_mean + y_std * cumsum(scores * estimator.y_loadings_[0], axis=1)) / repeats
+		if progress is not None:
+			progress.emit(i)
+	residual = reference[:, None] - cv_pred
+	r2 = 1 - (residual**2).sum(axis=0) / ((reference - reference.mean()) ** 2).sum()
+	return DataFrame({'RMSECV': std(residual, axis=0), 'R2CV': r2}, index=Index(arange(1, max_comp + 1), name='Components'))
+
+
+def pls_do(
+	attributes: ndarray, reference: DataFrame, n_comp: int, scale: bool, cv_split: int = 5, repeats: int = 1, jobs: int = 1
+) -> tuple:
 	"""
 	Perform the PLS Regression in the attributes and returns the model and results of the regression.
+	Cross validation trains the model of each fold only once (folds may run in parallel), and the
+	predictions, R2 and RMSE of every fold are obtained from it.
 
 	:param attributes: attribute matrix (samples in rows, attributes in columns)
 	:param reference: reference/true value DF for a single element (for modelling)
 	:param n_comp: number of components/latent variables of the model
 	:param scale: boolean to turn on/off the normalization of the input data
 	:param cv_split: determines how many groups will be used to perform cross validation (default: 5-fold)
+	:param repeats: number of repetitions of the cross validation (samples are shuffled when above 1)
+	:param jobs: number of parallel jobs used to train the folds
 	:return: tuple of results
 	"""
 	# Organizes variables before applying model
 	pls = PLSRegression(n_comp, scale=scale)
 	reference = array(reference).reshape(-1, 1)
-	# Now, we get cross validation data
-	cv_pred = cross_val_predict(pls, attributes, reference, cv=cv_split)
-	cv_r2 = cross_val_score(pls, attributes, reference, scoring='r2', cv=cv_split).max()
+	# Now, we get cross validation data (predictions of repeated folds are averaged)
+	folds = list(pls_folds(cv_split, repeats).split(attributes))
+	cv = cross_validate(pls, attributes, reference, scoring='r2', cv=folds, n_jobs=jobs, return_estimator=True)
+	cv_pred, fold_rmse = zeros_like(reference, dtype=float), []
+	for estimator, (_, test) in zip(cv['estimator'], folds):
+		fold_pred = estimator.predict(attributes[test]).reshape(-1, 1)
+		cv_pred[test] += fold_pred / repeats
+		fold_rmse.append(sqrt(((reference[test] - fold_pred) ** 2).mean()))
+	cv_r2 = cv['test_score'].max()
+	cv_folds = DataFrame({
+		'Repeat': arange(len(fold_rmse)) // cv_split + 1,
+		'Fold': arange(len(fold_rmse)) % cv_split + 1,
+		'R2': cv['test_score'],
+		'RMSE': fold_rmse,
+	})
 	# For pure prediction
 	pls.fit(attributes, reference)
 	predicted = pls.predict(attributes)
@@ -535,10 +1742,321 @@ def pls_do(attributes: ndarray, reference: DataFrame, n_comp: int, scale: bool,
 	residual = reference - predicted
 	predict_rmse = std(residual)
 	cv_rmse = std(reference - cv_pred)
-	return pls, reference, predicted, residual, predict_r2, predict_rmse, cv_pred, cv_r2, cv_rmse
+	return pls, reference, predicted, residual, predict_r2, predict_rmse, cv_pred, cv_r2, cv_rmse, cv_folds
+
+
+def pls_vip(pls: PLSRegression) -> ndarray:
+	"""
+	Variable importance in projection (VIP) of each attribute of a fitted PLS model. Attributes
+	with VIP above 1 have above average importance.
+
+	:param pls: fitted PLSRegression object
+	:return: array with VIP scores of the attributes
+	"""
+	explained = pls.y_loadings_[0] ** 2 * (pls.x_scores_**2).sum(axis=0)
+	weights = pls.x_weights_ / matrix_norm(pls.x_weights_, axis=0)
+	return sqrt(weights.shape[0] * (weights**2 @ explained) / explained.sum())
+
+
+def pls_coefficients(pls: PLSRegression, attributes: ndarray, reference: ndarray) -> tuple:
+	"""
+	Coefficients of a fitted PLS model as a plain linear predictor (y = X @ coefficients + intercept).
+	Centering and scaling of the attributes are folded into the coefficients, as in pls_sweep.
+
+	:param pls: fitted PLSRegression object
+	:param attributes: attribute matrix used to fit the model
+	:param reference: reference values used to fit the model
+	:return: tuple with coefficients (one per attribute) and intercept
+	"""
+	reference = array(reference, dtype=float).reshape(-1)
+	x_mean, y_mean = attributes.mean(axis=0), reference.mean()
+	x_std, y_std = ones(attributes.shape[1]), 1.0
+	if pls.scale:
+		x_std, y_std = attributes.std(axis=0, ddof=1), reference.std(ddof=1)
+		x_std[x_std == 0] = 1.0
+	coefficients = y_std * (pls.x_rotations_ @ pls.y_loadings_[0]) / x_std
+	return coefficients, y_mean - x_mean @ coefficients
 
 
-def tne_do(samples: tuple, param_array: ndarray, tne_df: DataFrame, ei_str: str) -> tuple:
+def bundle_predict(bundle: dict, attributes: ndarray) -> ndarray:
+	"""
+	Blind prediction with a PLS model bundle (see export_bundle). The attribute matrix must be built from
+	the new spectra in the mode of the bundle, and the stored preprocessing (interval selection, feature
+	scaling and PCA projection) is applied before the linear predictor of the PLS model.
+
+	:param bundle: dict with the model bundle (see load_bundle)
+	:param attributes: attribute matrix of the new samples (samples in rows, attributes in columns)
+	:return: array with predicted values
+	"""
+	if attributes.shape[1] != bundle['NAttributes']:
+		raise ValueError(f'Model bundle expects {bundle["NAttributes"]} attributes, but {attributes.shape[1]} were given')
+	if bundle['Selection'].size:
+		attributes = attributes[:, bundle['Selection']]
+	if bundle['ScalerMean'].size:
+		attributes = (attributes - bundle['ScalerMean']) / bundle['ScalerScale']
+	if bundle['Components'].size:
+		attributes = (attributes - bundle['Mean']) @ bundle['Components'].T
+	return attributes @ bundle['Coefficients'] + bundle['Intercept']
+
+
+def ipls_evaluate(attributes: ndarray, reference: ndarray, n_comp: int, scale: bool, cv_split: int) -> tuple:
+	"""
+	Evaluates a set of attributes by the lowest RMSECV of PLS models up to n_comp latent variables.
+
+	:param attributes: attribute matrix (only columns being evaluated)
+	:param reference: reference/true values
+	:param n_comp: maximum number of latent variables
+	:param scale: boolean to turn on/off the normalization of the input data
+	:param cv_split: number of folds of cross validation
+	:return: tuple with lowest RMSECV and its number of latent variables
+	"""
+	sweep = pls_sweep(attributes, reference, n_comp, scale, cv_split)
+	return sweep['RMSECV'].min(), int(sweep['RMSECV'].idxmin())
+
+
+def ipls(
+	attributes: ndarray,
+	reference: DataFrame,
+	wavelength: ndarray,
+	progress: Signal,
+	intervals: int = 20,
+	n_comp: int = PLS_COMPONENTS,
+	scale: bool = False,
+	cv_split: int = 5,
+	vip: float = 0.0,
+	jobs: int = 1,
+) -> tuple:
+	"""
+	Interval PLS (iPLS) wavelength selection. The wavelength range is split into intervals, and each one is
+	evaluated by cross validated PLS (see ipls_evaluate). Starting from the best interval, intervals are added
+	greedily (forward selection) while RMSECV decreases. Optionally, wavelengths of the selected intervals with
+	VIP scores below a threshold are pruned. Candidates of each step are evaluated by a process pool.
+
+	:param attributes: attribute matrix (samples in rows, wavelengths in columns)
+	:param reference: reference/true value DF for a single element (for modelling)
+	:param wavelength: wavelengths of the columns of attributes
+	:param progress: PySide Signal object (for multithreading)
+	:param intervals: number of intervals
+	:param n_comp: maximum number of latent variables of each model
+	:param scale: boolean to turn on/off the normalization of the input data
+	:param cv_split: number of folds of cross validation
+	:param vip: VIP threshold for pruning (0 means no pruning)
+	:param jobs: number of processes used to evaluate the candidates
+	:return: tuple of results (intervals DF, selected wavelengths mask, RMSECV and latent variables of the selection)
+	"""
+	reference = array(reference, dtype=float)
+	groups = array_split(arange(attributes.shape[1]), intervals)
+	executor = ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) if jobs > 1 else None
+	mapper = executor.map if executor is not None else map
+
+	def evaluate(candidates: list) -> list:
+		n = len(candidates)
+		subsets = [attributes[:, concatenate([groups[g] for g in c])] for c in candidates]
+		return list(mapper(ipls_evaluate, subsets, [reference] * n, [n_comp] * n, [scale] * n, [cv_split] * n))
+
+	try:
+		# Each interval alone
+		results = []
+		for i, result in enumerate(evaluate([[g] for g in range(len(groups))])):
+			results.append(result)
+			progress.emit(i)
+		table = DataFrame(
+			{
+				'Lower': [wavelength[g[0]] for g in groups],
+				'Upper': [wavelength[g[-1]] for g in groups],
+				'RMSECV': [r[0] for r in results],
+				'LVs': [r[1] for r in results],
+				'Step': 0,
+			},
+			index=Index(arange(1, len(groups) + 1), name='Interval'),
+		)
+		# Forward selection of intervals
+		selected = [int(table['RMSECV'].argmin())]
+		best = results[selected[0]]
+		while len(selected) < len(groups):
+			remaining = [g for g in range(len(groups)) if g not in selected]
+			results = evaluate([sorted(selected + [g]) for g in remaining])
+			k = min(range(len(results)), key=lambda r: results[r][0])
+			if results[k][0] >= best[0]:
+				break
+			selected.append(remaining[k])
+			best = results[k]
+		table.iloc[selected, table.columns.get_loc('Step')] = arange(1, len(selected) + 1)
+		mask = zeros(attributes.shape[1], dtype=bool)
+		mask[concatenate([groups[g] for g in selected])] = True
+		# Pruning of selected wavelengths by VIP (kept only if it does not increase RMSECV)
+		if vip > 0:
+			pls = PLSRegression(best[1], scale=scale).fit(attributes[:, mask], reference)
+			important = pls_vip(pls) >= vip
+			if 0 < important.sum() < mask.sum():
+				pruned = ipls_evaluate(attributes[:, mask][:, important], reference, n_comp, scale, cv_split)
+				if pruned[0] <= best[0]:
+					mask[mask] = important
+					best = pruned
+	finally:
+		if executor is not None:
+			executor.shutdown()
+	return table, mask, best[0], best[1]
+
+
+def linregress_rows(x: ndarray, y: ndarray) -> tuple:
+	"""
+	Least squares linear regression of every row of y against x, solved in closed form with
+	the same formulas (and standard errors) of scipy.stats.linregress.
+
+	:param x: 1D array of x values (shared by all rows) or 2D array with one row per regression
+	:param y: 2D array of y values (one row per regression)
+	:return: tuple of 1D arrays (slope, intercept, r, slope standard error and intercept standard error)
+	"""
+	x = broadcast_to(x, y.shape)
+	n = y.shape[1]
+	xm, ym = x.mean(axis=1), y.mean(axis=1)
+	ssxm = ((x - xm[:, None]) ** 2).mean(axis=1)
+	ssym = ((y - ym[:, None]) ** 2).mean(axis=1)
+	ssxym = ((x - xm[:, None]) * (y - ym[:, None])).mean(axis=1)
+	with errstate(divide='ignore', invalid='ignore'):
+		# As in linregress, r is zero if x or y is constant (and kept between -1 and 1)
+		r = where((ssxm == 0) | (ssym == 0), 0.0, clip(ssxym / sqrt(ssxm * ssym), -1.0, 1.0))
+		slope = ssxym / ssxm
+		sslope = sqrt((1 - r**2) * ssym / ssxm / (n - 2)) if n > 2 else zeros_like(slope)
+	intercept = ym - slope * xm
+	sintercept = sslope * sqrt(ssxm + xm**2)
+	return slope, intercept, r, sslope, sintercept
+
+
+def tne_draws(
+	ln_param_atomic: ndarray,
+	ln_param_ionic: ndarray,
+	sd_param_atomic: ndarray,
+	sd_param_ionic: ndarray,
+	ln_gak_atomic: ndarray,
+	ln_gak_ionic: ndarray,
+	gak_unc: float,
+	x: ndarray,
+	draws: int,
+	percentiles: tuple,
+	seed: SeedSequence,
+) -> ndarray:
+	"""
+	Monte Carlo propagation of the uncertainties of a batch of samples into T and Ne. Each draw perturbs
+	(in log scale) the parameters and gAk values of all lines, and all Saha-Boltzmann plots of the batch
+	are solved at once.
+
+	:param ln_param_atomic: log of the parameters of the atomic lines [samples, lines]
+	:param ln_param_ionic: log of the parameters of the ionic lines [samples, lines]
+	:param sd_param_atomic: relative deviations of the parameters of the atomic lines [samples, lines]
+	:param sd_param_ionic: relative deviations of the parameters of the ionic lines [samples, lines]
+	:param ln_gak_atomic: log of gAk of the atomic lines
+	:param ln_gak_ionic: log of gAk of the ionic lines
+	:param gak_unc: relative uncertainty of gAk values
+	:param x: x-axis of the plot (same for all samples)
+	:param draws: number of draws for each sample
+	:param percentiles: percentiles to be reported
+	:param seed: seed for the random generator of the batch
+	:return: array of percentiles [samples, (T, Ne), percentiles]
+	"""
+	rng = default_rng(seed)
+	n, atm_tot, ion_tot = ln_param_atomic.shape[0], ln_param_atomic.shape[1], ln_param_ionic.shape[1]
+	atomic = ln_param_atomic[:, None, :] + sd_param_atomic[:, None, :] * rng.standard_normal((n, draws, atm_tot))
+	ionic = ln_param_ionic[:, None, :] + sd_param_ionic[:, None, :] * rng.standard_normal((n, draws, ion_tot))
+	gak_atomic = ln_gak_atomic + gak_unc * rng.standard_normal((n, draws, atm_tot))
+	gak_ionic = ln_gak_ionic + gak_unc * rng.standard_normal((n, draws, ion_tot))
+	y = (atomic[..., :, None] + gak_ionic[..., None, :] - ionic[..., None, :] - gak_atomic[..., :, None]).reshape(
+		n * draws, atm_tot * ion_tot
+	)
+	slope, intercept = linregress_rows(x, y)[:2]
+	with errstate(divide='ignore', invalid='ignore', over='ignore'):
+		temp = -1 / (KB * slope)
+		Ne = exp(intercept) * (temp**1.5) * KE
+	values = stack((temp, Ne)).reshape(2, n, draws)
+	return nanpercentile(values, percentiles, axis=2).transpose(2, 1, 0)
+
+
+def tne_mc(
+	samples: tuple,
+	param_array: ndarray,
+	param_std: ndarray,
+	tne_df: DataFrame,
+	ei_str: str,
+	draws: int = 2000,
+	gak_unc: float = 0.1,
+	percentiles: tuple = (2.5, 97.5),
+	jobs: int = 1,
+	seed: int = 0,
+	progress: Signal = None,
+) -> DataFrame:
+	"""
+	Monte Carlo intervals for plasma temperature and electrons density. Parameters (areas or heights)
+	and gAk of each line are perturbed following their uncertainties, and the Saha-Boltzmann plot
+	is solved for all draws. Samples are split into batches, which may be solved by a process pool.
+
+	:param samples: tuple containing the names of the samples
+	:param param_array: array with all calculated areas (or heights) for all peaks and samples
+	:param param_std: array with the standard deviations of param_array (or None)
+	:param tne_df: DataFrame containing lines information (ionization, Ek and gAk)
+	:param ei_str: string containing the ionization energy of the element
+	:param draws: number of draws for each sample
+	:param gak_unc: relative uncertainty of gAk values (e.g. 0.1 for 10%)
+	:param percentiles: percentiles to be reported
+	:param jobs: number of processes used to solve the batches
+	:param seed: seed for the random generator (for reproducible results)
+	:param progress: PySide Signal object (for multithreading), emitted with the last sample of each batch
+	:return: DataFrame with the percentiles of T and Ne for each sample
+	"""
+	ei = float(ei_str.split()[0])
+	atm_idx = (tne_df['Ionization'] == '1').to_numpy()
+	ion_idx = (tne_df['Ionization'] == '2').to_numpy()
+	ek_atomic = tne_df['Ek'][atm_idx].astype(float).to_numpy()
+	ek_ionic = tne_df['Ek'][ion_idx].astype(float).to_numpy()
+	x = (ek_atomic[:, None] - ek_ionic[None, :] - ei).ravel()
+	# Deviations are propagated into the log scale (relative deviations)
+	param_array = param_array.reshape(len(samples), -1)
+	param_std = zeros_like(param_array) if param_std is None else param_std.reshape(param_array.shape)
+	ln_param, sd_param = log(param_array), param_std / param_array
+	ln_gak = log(tne_df['gAk'].astype(float)).to_numpy()
+	# Splits samples into batches (limited in memory), each one with an independent seed
+	size = max(1, MC_BATCH // (draws * x.size))
+	batches = [slice(i, i + size) for i in range(0, len(samples), size)]
+	seeds = SeedSequence(seed).spawn(len(batches))
+	args = [
+		(
+			ln_param[b][:, atm_idx],
+			ln_param[b][:, ion_idx],
+			sd_param[b][:, atm_idx],
+			sd_param[b][:, ion_idx],
+			ln_gak[atm_idx],
+			ln_gak[ion_idx],
+			gak_unc,
+			x,
+			draws,
+			percentiles,
+			s,
+		)
+		for b, s in zip(batches, seeds)
+	]
+	intervals, parallel = [], jobs > 1 and len(batches) > 1
+	with ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) if parallel else nullcontext() as executor:
+		mapper = executor.map if parallel else map
+		for b, batch in zip(batches, mapper(tne_draws, *zip(*args))):
+			intervals.append(batch)
+			if progress is not None:
+				progress.emit(min(b.stop, len(samples)) - 1)
+	intervals = concatenate(intervals).reshape(len(samples), -1)
+	columns = [f'{q}_P{p:g}' for q in ('T', 'Ne') for p in percentiles]
+	return DataFrame(index=samples, columns=columns, data=intervals)
+
+
+def tne_do(
+	samples: tuple,
+	param_array: ndarray,
+	tne_df: DataFrame,
+	ei_str: str,
+	param_std: ndarray = None,
+	draws: int = 0,
+	gak_unc: float = 0.1,
+	jobs: int = 1,
+	progress: Signal = None,
+) -> tuple:
 	"""
 	Does a Saha-Boltzmann plot to obtain plasma temperature and electrons density for
 	many samples. As input this functions needs values of energies of higher level (Ek),
@@ -552,12 +2070,15 @@ def tne_do(samples: tuple, param_array: ndarray, tne_df: DataFrame, ei_str: str)
 	:param param_array: array with all calculated areas (or heights) for all peaks and samples
 	:param tne_df: DataFrame containing lines information (ionization, Ek and gAk)
 	:param ei_str: string containing the ionization energy of the element
+	:param param_std: array with the standard deviations of param_array (used by Monte Carlo)
+	:param draws: number of Monte Carlo draws for each sample (0 means no Monte Carlo, see tne_mc)
+	:param gak_unc: relative uncertainty of gAk values (used by Monte Carlo)
+	:param jobs: number of processes used by Monte Carlo
+	:param progress: PySide Signal object (for multithreading)
 	:return: tuple of results (x, y, fit and parameters obtained from the plot)
 	"""
 	# Organizes useful variables
 	ei = float(ei_str.split()[0])
-	kb = 0.000086173303
-	ke = 2.07e16
 	# Gets index for atomic and ionic species
 	atm_idx = tne_df['Ionization'] == '1'
 	ion_idx = tne_df['Ionization'] == '2'
@@ -571,40 +2092,27 @@ def tne_do(samples: tuple, param_array: ndarray, tne_df: DataFrame, ei_str: str)
 	ln_param_ionic = log(param_array[:, ion_idx])
 	ln_gak_ionic = log(tne_df['gAk'][ion_idx].astype(float)).to_numpy()
 	ek_ionic = tne_df['Ek'][ion_idx].astype(float).to_numpy()
-	# Now, we must walk into 3 levels: samples, atomic and ionic
-	x_ = zeros((len(samples), atm_tot * ion_tot))
-	y_ = zeros_like(x_)
-	fit_ = zeros_like(x_)
-	result_df = DataFrame(index=samples, columns=['T', 'ΔT', 'Ne', 'ΔNe', 'R2', 'R'], data=0.0)
-	for i in range(len(samples)):
-		x, y = [], []
-		for at in range(atm_tot):
-			for io in range(ion_tot):
-				x.append(ek_atomic[at] - ek_ionic[io] - ei)
-				y.append(ln_param_atomic[i, at] + ln_gak_ionic[io] - ln_param_ionic[i, io] - ln_gak_atomic[at])
-		# Created main lists, we transform them into arrays
-		x, y = array(x), array(y)
-		# And then, we perform linear regression to obtain curve fitting
-		reg = linregress(x, y)
-		# Based on regression values, we can start calculating the parameters
-		slope, intercept, r, r2, sslope, sintercept = (
-			reg.slope,
-			reg.intercept,
-			reg.rvalue,
-			reg.rvalue**2,
-			reg.stderr,
-			reg.intercept_stderr,
+	# The x-axis only depends on the lines, so it is the same for all samples (pairs are atomic-major)
+	x = (ek_atomic[:, None] - ek_ionic[None, :] - ei).ravel()
+	# And y is obtained for all samples at once: [samples, atomic, ionic] -> [samples, pairs]
+	y_ = (
+		ln_param_atomic[:, :, None] + ln_gak_ionic[None, None, :] - ln_param_ionic[:, None, :] - ln_gak_atomic[None, :, None]
+	).reshape(len(samples), atm_tot * ion_tot)
+	# Linear regression of all samples
+	slope, intercept, r, sslope, sintercept = linregress_rows(x, y_)
+	x_ = tile(x, (len(samples), 1))
+	fit_ = slope[:, None] * x + intercept[:, None]
+	# Based on regression values, we can calculate the parameters (and deviations)
+	temp = -1 / (KB * slope)
+	Ne = exp(intercept) * (temp**1.5) * KE
+	stemp = -1 * temp * (sslope / slope)
+	sNe = -1 * Ne * (sintercept / intercept)
+	result_df = DataFrame(
+		index=samples, columns=['T', 'ΔT', 'Ne', 'ΔNe', 'R2', 'R'], data=column_stack((temp, stemp, Ne, sNe, r**2, r))
+	)
+	# Monte Carlo intervals are added to the report
+	if draws > 0:
+		result_df = result_df.join(
+			tne_mc(samples, param_array, param_std, tne_df, ei_str, draws, gak_unc, jobs=jobs, progress=progress)
 		)
-		fit = slope * x + intercept
-		temp = -1 / (kb * slope)
-		Ne = exp(intercept) * (temp**1.5) * ke
-		# Get deviations
-		stemp = -1 * temp * (sslope / slope)
-		sNe = -1 * Ne * (sintercept / intercept)
-		# Saves plot data
-		x_[i] = x
-		y_[i] = y
-		fit_[i] = fit
-		# And finally, saves report data
-		result_df.loc[samples[i]] = (temp, stemp, Ne, sNe, r2, r)
 	return x_, y_, fit_, result_df
@@ -16,6 +16,7 @@
 
 
 # Imports
+from os import cpu_count
 from string import punctuation
 from pathlib import Path
 from colorsys import hls_to_rgb, hsv_to_rgb
@@ -70,12 +71,14 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			self.about = QtWidgets.QWidget()
 			# Menubar
 			self.menu_file_load = self.menu_file_save = self.menu_file_sample = self.menu_file_quit = QtGui.QAction()
-			self.menu_import_ref = self.menu_import_peaks = self.menu_import_tne = QtGui.QAction()
+			self.menu_import_ref = self.menu_import_peaks = self.menu_import_tne = self.menu_import_bundle = QtGui.QAction()
 			self.menu_export_fullspectra_raw = self.menu_export_fullspectra_out = QtGui.QAction()
 			self.menu_export_peaks_table = self.menu_export_peaks_isolated = self.menu_export_peaks_fitted = (
 				self.menu_export_peaks_areas
 			) = QtGui.QAction()
-			self.menu_export_predictions_linear = self.menu_export_predictions_pls = QtGui.QAction()
+			self.menu_export_predictions_linear = self.menu_export_predictions_pls = self.menu_export_predictions_bundle = (
+				QtGui.QAction()
+			)
 			self.menu_export_other_pca = self.menu_export_other_tne = self.menu_export_other_correl = QtGui.QAction()
 			self.menu_help_about = QtGui.QAction()
 			# Graph elements
@@ -105,21 +108,24 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			# Page 3 == Peaks
 			self.p3_isotb = self.p3_fittb = QtWidgets.QTableWidget()
 			self.p3_isoadd = self.p3_isorem = self.p3_isoapply = self.p3_fitapply = QtWidgets.QToolButton()
-			self.p3_linear = self.p3_norm = QtWidgets.QCheckBox()
+			self.p3_linear = self.p3_norm = self.p3_tie_asymmetry = QtWidgets.QCheckBox()
 			self.p3_mean1st = QtWidgets.QRadioButton()
-			self.p3_default_shape = QtWidgets.QSpinBox()
+			self.p3_default_shape = self.p3_starts = self.p3_cores = QtWidgets.QSpinBox()
+			self.p3_tie = self.p3_criterion = QtWidgets.QComboBox()
 			# Page 4 == Calibration curve
 			self.p4_peak = self.p4_ref = self.p4_pnorm_combo = QtWidgets.QComboBox()
 			self.p4_areas = self.p4_heights = self.p4_wnorm = self.p4_pnorm = self.p4_anorm = self.p4_epeak = (
 				QtWidgets.QRadioButton()
 			)
-			self.p4_apply = QtWidgets.QPushButton()
-			self.p4_npeak = self.p4_npeak_norm = QtWidgets.QSpinBox()
+			self.p4_apply = self.p4_explore = QtWidgets.QPushButton()
+			self.p4_npeak = self.p4_npeak_norm = self.p4_cv = self.p4_boots = QtWidgets.QSpinBox()
 			# Page 5 == PCA and PLSR
 			self.p5_pca_raw = self.p5_pca_iso = self.p5_pca_areas = self.p5_pca_heights = QtWidgets.QRadioButton()
-			self.p5_pca_fs = QtWidgets.QCheckBox()
-			self.p5_pca_ncomps = QtWidgets.QSpinBox()
-			self.p5_pca_cscan = self.p5_pca_do = self.p5_pls_cal_start = self.p5_pls_pred_start = QtWidgets.QPushButton()
+			self.p5_pca_fs = self.p5_pca_inc = QtWidgets.QCheckBox()
+			self.p5_pca_ncomps = self.p5_pls_repeats = self.p5_pls_lvs = self.p5_pls_intervals = QtWidgets.QSpinBox()
+			self.p5_pls_vip = QtWidgets.QDoubleSpinBox()
+			self.p5_pca_cscan = self.p5_pca_do = self.p5_pls_ipls = self.p5_pls_sweep = QtWidgets.QPushButton()
+			self.p5_pls_cal_start = self.p5_pls_pred_start = QtWidgets.QPushButton()
 			self.p5_pls_cal_att = self.p5_pls_pred_model = self.p5_pls_pred_att = QtWidgets.QLabel()
 			self.p5_pls_cal_ref = QtWidgets.QComboBox()
 			# Page 6 == Boltzmann and Saha-Boltzmann (for Plasma Temperature and Electron Density)
@@ -127,6 +133,8 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			self.p6_ion = QtWidgets.QLabel()
 			self.p6_table = QtWidgets.QTableWidget()
 			self.p6_start = QtWidgets.QPushButton()
+			self.p6_draws = QtWidgets.QSpinBox()
+			self.p6_gak_unc = QtWidgets.QDoubleSpinBox()
 			# Loads all elements
 			self.loadmain()
 			self.loadp1()
@@ -239,6 +247,7 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.menu_import_ref = self.mw.findChild(QtGui.QAction, 'actionI01')
 		self.menu_import_peaks = self.mw.findChild(QtGui.QAction, 'actionI02')
 		self.menu_import_tne = self.mw.findChild(QtGui.QAction, 'actionI03')
+		self.menu_import_bundle = self.mw.findChild(QtGui.QAction, 'actionI04')
 		self.menu_export_fullspectra_raw = self.mw.findChild(QtGui.QAction, 'actionE01')
 		self.menu_export_fullspectra_out = self.mw.findChild(QtGui.QAction, 'actionE02')
 		self.menu_export_peaks_table = self.mw.findChild(QtGui.QAction, 'actionE03')
@@ -247,6 +256,7 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.menu_export_peaks_areas = self.mw.findChild(QtGui.QAction, 'actionE06')
 		self.menu_export_predictions_linear = self.mw.findChild(QtGui.QAction, 'actionE07')
 		self.menu_export_predictions_pls = self.mw.findChild(QtGui.QAction, 'actionE08')
+		self.menu_export_predictions_bundle = self.mw.findChild(QtGui.QAction, 'actionE12')
 		self.menu_export_other_pca = self.mw.findChild(QtGui.QAction, 'actionE09')
 		self.menu_export_other_tne = self.mw.findChild(QtGui.QAction, 'actionE10')
 		self.menu_export_other_correl = self.mw.findChild(QtGui.QAction, 'actionE11')
@@ -305,6 +315,11 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.p3_norm = self.mw.findChild(QtWidgets.QCheckBox, 'p3cBox2')
 		self.p3_mean1st = self.mw.findChild(QtWidgets.QRadioButton, 'p3rB1')
 		self.p3_default_shape = self.mw.findChild(QtWidgets.QSpinBox, 'p3sB1')
+		self.p3_starts = self.mw.findChild(QtWidgets.QSpinBox, 'p3sB2')
+		self.p3_cores = self.mw.findChild(QtWidgets.QSpinBox, 'p3sB3')
+		self.p3_tie = self.mw.findChild(QtWidgets.QComboBox, 'p3cB1')
+		self.p3_tie_asymmetry = self.mw.findChild(QtWidgets.QCheckBox, 'p3cBox3')
+		self.p3_criterion = self.mw.findChild(QtWidgets.QComboBox, 'p3cB2')
 
 	def loadp4(self):
 		"""
@@ -324,6 +339,9 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.p4_anorm = self.mw.findChild(QtWidgets.QRadioButton, 'p4rB5')
 		self.p4_epeak = self.mw.findChild(QtWidgets.QRadioButton, 'p4rB6')
 		self.p4_apply = self.mw.findChild(QtWidgets.QPushButton, 'p4pB1')
+		self.p4_explore = self.mw.findChild(QtWidgets.QPushButton, 'p4pB2')
+		self.p4_cv = self.mw.findChild(QtWidgets.QSpinBox, 'p4sB3')
+		self.p4_boots = self.mw.findChild(QtWidgets.QSpinBox, 'p4sB4')
 
 	def loadp5(self):
 		"""
@@ -336,11 +354,18 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.p5_pca_areas = self.mw.findChild(QtWidgets.QRadioButton, 'p5rB3')
 		self.p5_pca_heights = self.mw.findChild(QtWidgets.QRadioButton, 'p5rB4')
 		self.p5_pca_fs = self.mw.findChild(QtWidgets.QCheckBox, 'p5cBox1')
+		self.p5_pca_inc = self.mw.findChild(QtWidgets.QCheckBox, 'p5cBox2')
 		self.p5_pca_cscan = self.mw.findChild(QtWidgets.QPushButton, 'p5pB1')
 		self.p5_pca_ncomps = self.mw.findChild(QtWidgets.QSpinBox, 'p5sB1')
 		self.p5_pca_do = self.mw.findChild(QtWidgets.QPushButton, 'p5pB2')
 		self.p5_pls_cal_att = self.mw.findChild(QtWidgets.QLabel, 'p5lB7')
 		self.p5_pls_cal_ref = self.mw.findChild(QtWidgets.QComboBox, 'p5cB1')
+		self.p5_pls_repeats = self.mw.findChild(QtWidgets.QSpinBox, 'p5sB2')
+		self.p5_pls_lvs = self.mw.findChild(QtWidgets.QSpinBox, 'p5sB3')
+		self.p5_pls_intervals = self.mw.findChild(QtWidgets.QSpinBox, 'p5sB4')
+		self.p5_pls_vip = self.mw.findChild(QtWidgets.QDoubleSpinBox, 'p5dsB1')
+		self.p5_pls_ipls = self.mw.findChild(QtWidgets.QPushButton, 'p5pB6')
+		self.p5_pls_sweep = self.mw.findChild(QtWidgets.QPushButton, 'p5pB5')
 		self.p5_pls_cal_start = self.mw.findChild(QtWidgets.QPushButton, 'p5pB3')
 		self.p5_pls_pred_model = self.mw.findChild(QtWidgets.QLabel, 'p5lB11')
 		self.p5_pls_pred_att = self.mw.findChild(QtWidgets.QLabel, 'p5lB13')
@@ -357,6 +382,8 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.p6_ion = self.mw.findChild(QtWidgets.QLabel, 'p6lB2')
 		self.p6_table = self.mw.findChild(QtWidgets.QTableWidget, 'p6tW1')
 		self.p6_start = self.mw.findChild(QtWidgets.QPushButton, 'p6pB1')
+		self.p6_draws = self.mw.findChild(QtWidgets.QSpinBox, 'p6sB1')
+		self.p6_gak_unc = self.mw.findChild(QtWidgets.QDoubleSpinBox, 'p6dsB1')
 
 	# Connects helper
 	def connects(self):
@@ -401,6 +428,8 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		self.p2_mad_c.setKeyboardTracking(False)
 		self.p3_isotb.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
 		self.p3_fittb.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+		self.p3_cores.setRange(1, max(1, cpu_count() - 1))
+		self.p3_cores.setValue(self.p3_cores.maximum())
 
 	def modechanger(self):
 		"""
@@ -635,14 +664,21 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		x, y = linear['Reference'][1], linear['Predict'][index, 1]
 		self.splot(x, x, clear=True, symbol='', name='Ideal', width=2)
 		self.splot(x, y, clear=False, symbol='o', name='Model')
+		# Bootstrap intervals (if available) are shown after each value
+		ci = dict.fromkeys(('Slope', 'Intercept', 'LoD', 'LoQ'), '')
+		if isinstance(linear['Bootstrap'], DataFrame) and not linear['Bootstrap'].empty:
+			row = linear['Bootstrap'].iloc[index]
+			for key in ci:
+				ci[key] = f" [{row[f'{key}_P2.5']:.3f}, {row[f'{key}_P97.5']:.3f}]"
 		linbox_str = (
 			f'<span style="color:#330066">'
-			f"Slope: <b>{linear['Slope'][index]:.3f}</b><br>"
-			f"Intercept: <b>{linear['Intercept'][index]:.3f}</b><br>"
+			f"Slope: <b>{linear['Slope'][index]:.3f}</b>{ci['Slope']}<br>"
+			f"Intercept: <b>{linear['Intercept'][index]:.3f}</b>{ci['Intercept']}<br>"
 			f"R2: <b>{linear['R2'][index]:.3f}</b><br>"
 			f"RMSE: <b>{linear['RMSE'][index]:.3f}</b><br>"
-			f"LoD: <b>{linear['LoD'][index]:.3f}</b><br>"
-			f"LoQ: <b>{linear['LoQ'][index]:.3f}</b><br>"
+			f"RMSECV: <b>{linear['RMSECV'][index]:.3f}</b><br>"
+			f"LoD: <b>{linear['LoD'][index]:.3f}</b>{ci['LoD']}<br>"
+			f"LoQ: <b>{linear['LoQ'][index]:.3f}</b>{ci['LoQ']}<br>"
 			f"Correlation: <b>{linear['R2'][index] ** 0.5:.0%}</b></span>"
 		)
 		linbox = TextItem(html=linbox_str, anchor=(0, 1), angle=0, border='#004de6', fill='#ccddff77')
@@ -692,7 +728,7 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		plsplot method. Does PLSR plot for calibration and or predictions.
 
 		:param pls_data: sclice of Spectra containing all PLSR data
-		:param mode: CV for calibration (cross validation) or Blind for prediction
+		:param mode: CV for calibration (cross validation), Blind for prediction or Sweep for RMSECV of each latent variable
 		:return: None
 		"""
 		if mode == 'CV':
@@ -717,10 +753,13 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			ypos = max(y1[y1.argsort()][-1], y2[y2.argsort()][-1])
 			plsbox.setPos(xpos, ypos)
 		elif mode == 'Blind':
-			prediction = pls_data['BlindPredict']
+			prediction = pls_data['BlindPredict'].reshape(-1)
 			x_pred = range(1, prediction.shape[0] + 1)
 			colors = randint(10, 220, size=(len(prediction), 3), dtype=int)
 			self.g.addItem(BarGraphItem(x=x_pred, height=prediction, width=0.9, brushes=colors))
+		elif mode == 'Sweep':
+			sweep = pls_data['Sweep']
+			self.splot(sweep.index.to_numpy(), sweep['RMSECV'].to_numpy(), clear=True, symbol='o', name='RMSECV')
 		else:
 			raise AssertionError('Illegal operation mode for PLS plot!')
 		# Finally, performs auto-range
@@ -738,7 +777,8 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 		x = plasma_params['En'][idx]
 		y = plasma_params['Ln'][idx]
 		fit = plasma_params['Fit'][idx]
-		t, st, ne, sne, r2, r = plasma_params['Report'].loc[plasma_params['Report'].index[idx]]
+		report = plasma_params['Report'].iloc[idx]
+		t, st, ne, sne, r2, r = report[['T', 'ΔT', 'Ne', 'ΔNe', 'R2', 'R']]
 		pbox_str = (
 			f'<span style="color:#330066">'
 			f'T: <b>{t:.0f} K</b><br>'
@@ -748,6 +788,13 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			f'R2: <b>{r2:.3f}</b><br>'
 			f'Correlation: <b>{r:.0%}</b></span>'
 		)
+		# Monte Carlo intervals (if calculated)
+		if 'T_P2.5' in report.index:
+			pbox_str = pbox_str.replace(
+				'</span>',
+				f'<br>T (95%): <b>{report["T_P2.5"]:.0f}-{report["T_P97.5"]:.0f} K</b><br>'
+				f'N<sub>e</sub> (95%): <b>{report["Ne_P2.5"]:.1e}-{report["Ne_P97.5"]:.1e} cm<sup>-3</sup></b></span>',
+			)
 		pbox = TextItem(html=pbox_str, anchor=(0, 1), angle=0, border='#004de6', fill='#ccddff')
 		self.g.addItem(pbox)
 		pbox.setPos(x.max(), y.max())
@@ -808,18 +855,24 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			QtWidgets.QMessageBox.critical(self.mw, 'Erro', 'Wrong FD ID!')
 			raise ValueError('Wrong FD ID!')
 
-	def dynamicbox(self, top: str, msg: str, maxi: int):
+	def dynamicbox(self, top: str, msg: str, maxi: int, cancel=None):
 		"""
 		dynamicbox method. Helper method to create a dynamic box with QProgressBar.
 
 		:param top: top message
 		:param msg: main message of the box
 		:param maxi: max value for progressbar
+		:param cancel: function called when the Cancel button is clicked (if None, box has no buttons)
 		:return: None
 		"""
-		self.mbox = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, top, msg, QtWidgets.QMessageBox.NoButton)
-		mbox_layout = self.mbox.layout()
-		mbox_layout.itemAtPosition(mbox_layout.rowCount() - 1, 0).widget().hide()
+		if cancel is None:
+			self.mbox = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, top, msg, QtWidgets.QMessageBox.NoButton)
+			mbox_layout = self.mbox.layout()
+			mbox_layout.itemAtPosition(mbox_layout.rowCount() - 1, 0).widget().hide()
+		else:
+			self.mbox = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, top, msg, QtWidgets.QMessageBox.Cancel)
+			self.mbox.buttonClicked.connect(lambda _: cancel())
+			mbox_layout = self.mbox.layout()
 		self.mbox_pbar = QtWidgets.QProgressBar()
 		self.mbox_pbar.setValue(0)
 		self.mbox_pbar.setRange(0, maxi)
@@ -1122,6 +1175,7 @@ class LIBSsaGUI(QtWidgets.QMainWindow):
 			'8) Voigt Profile',
 			'9) Voigt Profile [center fixed]',
 			'10) Trapezoidal rule',
+			'11) Auto',
 		]
 		# Iterates over iso table
 		rows = self.p3_isotb.rowCount()
@@ -22,7 +22,8 @@ from pathlib import Path
 
 from numpy import abs as nabs
 from numpy import dot, mean, array, trapz, zeros, median, ndarray, subtract, array_equal, column_stack
-from pandas import Series, DataFrame, read_csv, read_excel
+from numpy import load as npload
+from pandas import Series, DataFrame, read_csv, read_excel, read_feather, read_parquet
 from scipy.stats import pearsonr
 from numpy.linalg import norm
 from PySide6.QtCore import Signal
@@ -149,6 +150,39 @@ def load(
 		raise ValueError('Wrong reading mode.')
 
 
+# Progress mock for loading functions that do not report progress
+class SilentSignal:
+	def emit(self, value: int): ...
+
+
+class SampleReader:
+	"""
+	LIBSsa: SampleReader
+
+	Read-only sequence of sample counts, loaded from the source files (with the same reading
+	parameters and FSN used by load) only when indexed. Slicing the reader loads just the
+	sliced samples, so the whole set never needs to be held in memory.
+	"""
+
+	def __init__(self, folder: tuple, reading: tuple, fsn: list):
+		"""
+		:param folder: tuple of Paths of input folder/files (sorted)
+		:param reading: reading parameters of load (mode, delim, header, wcol, ccol and dec)
+		:param fsn: values for Full Spectrum Normalization
+		"""
+		self.folder = tuple(folder)
+		self.reading = tuple(reading)
+		self.fsn = fsn
+
+	def __len__(self):
+		return len(self.folder)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return load(self.folder[index], *self.reading, self.fsn, SilentSignal())[1]
+		return load((self.folder[index],), *self.reading, self.fsn, SilentSignal())[1][0]
+
+
 def outliers(mode: str, criteria: float, counts: dict, progress: Signal) -> tuple:
 	"""
 	Function to perform outliers removal for spectra.
@@ -255,3 +289,36 @@ def domulticorrel(wsize: int, counts: ndarray, ref: DataFrame, progress: Signal)
 	return_array = array(([None] * 3), dtype=object)
 	return_array[0], return_array[1], return_array[2] = pearson, full_mean, zeros(wsize)
 	return return_array
+
+
+def load_bundle(file: Path) -> dict:
+	"""
+	Loads a PLS model bundle (see export_bundle). Bundles only have plain arrays, so no pickle is allowed.
+
+	:param file: path of the model bundle (npz)
+	:return: dict with bundle values (scalars are converted to Python types)
+	"""
+	with npload(file, allow_pickle=False) as npz:
+		return {k: npz[k].item() if npz[k].ndim == 0 else npz[k] for k in npz.files}
+
+
+def load_tables(file: Path) -> dict:
+	"""
+	Loads tables saved in a columnar binary format (see save_columnar). For Parquet and Feather,
+	tables of a multiple tables export (file_table) are loaded when the file itself does not exist.
+
+	:param file: path of the exported file (npz, parquet or feather)
+	:return: dict with table name -> DataFrame
+	"""
+	suffix = file.suffix.lower()
+	if suffix == '.npz':
+		tables = {}
+		with npload(file, allow_pickle=False) as npz:
+			for key in npz.files:
+				name, column = key.split('/', 1)
+				tables.setdefault(name, {})[column] = npz[key]
+		return {name: DataFrame(columns) for name, columns in tables.items()}
+	reader = read_parquet if suffix == '.parquet' else read_feather
+	if file.exists():
+		return {file.stem: reader(file)}
+	return {f.stem[len(file.stem) + 1 :]: reader(f) for f in sorted(file.parent.glob(f'{file.stem}_*{suffix}'))}
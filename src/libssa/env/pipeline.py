@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+from os import listdir
+from pathlib import Path
+from collections import deque
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+from numpy import nan, array, ndarray, array_equal
+from pandas import Index, Series
+from PySide6.QtCore import Signal
+
+from libssa.env.imports import SilentSignal, load, outliers, load_bundle
+from libssa.env.spectra import Spectra
+from libssa.env.functions import fitpeaks, isopeaks, bundle_predict, attribute_matrix, pls_coefficients
+
+# Bundle arrays used only by the model (not needed to build attributes)
+MODEL_ARRAYS = ('Selection', 'ScalerMean', 'ScalerScale', 'Components', 'Mean', 'Coefficients')
+
+
+def model_bundle(spectra: Spectra) -> dict:
+	"""
+	Creates the PLS model bundle of a calibrated Spectra object. The bundle is a dict of plain
+	arrays (see export_bundle) with the PLS model and all settings needed to build its attributes
+	from new spectra:
+		* Preprocessing: FSN, outliers removal criteria, isolation table and baseline, fitted shapes and fit settings
+		* Attributes: mode, wavelength, interval selection (iPLS), feature scaling and PCA components
+		* Model: element, number of latent variables, coefficients and intercept
+
+	:param spectra: LIBSsa 2.0 Spectra object
+	:return: dict with the model bundle
+	"""
+	if spectra.pls['Model'] is spectra.base:
+		raise AttributeError('Perform PLS Regression before trying to export the model!')
+	pls = spectra.pls['Model']
+	if pls.n_features_in_ != spectra.pls['Attributes'].shape[1]:
+		raise AttributeError('Attributes were changed after PLS Regression. Perform it again before exporting the model!')
+	coefficients, intercept = pls_coefficients(pls, spectra.pls['Attributes'], spectra.pls['Reference'])
+	fsn, (out_type, criteria) = spectra.samples['FSN'], spectra.intensities['Criteria']
+	fitted = spectra.fit['Shape'] is not spectra.base
+	bundle = {
+		'Element': spectra.pls['Element'],
+		'Att': spectra.pls['Att'],
+		'FSN': fsn[0] or '',
+		'FSNRange': array(fsn[1:], dtype=float),
+		'Outliers': out_type or '',
+		'Criteria': nan if criteria is None else criteria,
+		'Isolation': spectra.isolated['Table'].fillna('').to_numpy(dtype=str),
+		'Baseline': array(spectra.isolated['Baseline'], dtype=bool),
+		'Shapes': array(spectra.fit['Shape'] if fitted else [], dtype=str),
+		'Asymmetry': array(spectra.fit['Asymmetry'] if fitted else [], dtype=float),
+		'Mean1st': spectra.fit['Mean1st'],
+		'Starts': spectra.fit['Starts'],
+		'Seed': spectra.fit['Seed'],
+		'Tie': spectra.fit['Tie'] or '',
+		'TieAsymmetry': spectra.fit['TieAsymmetry'],
+		'Criterion': spectra.fit['Criterion'],
+		'Wavelength': array(spectra.wavelength['Raw'], dtype=float),
+		'Selection': array([], dtype=bool),
+		'ScalerMean': array([]),
+		'ScalerScale': array([]),
+		'Components': array([]),
+		'Mean': array([]),
+		'LVs': pls.n_components,
+		'Coefficients': coefficients,
+		'Intercept': intercept,
+	}
+	if spectra.pls['Selection'] is not spectra.base:
+		# iPLS: attributes are the selected wavelengths of mean spectra
+		bundle['Mode'] = 'Raw'
+		bundle['Selection'] = spectra.pls['Selection']
+	else:
+		# PCA: attributes are the scores of the first components
+		bundle['Mode'] = spectra.pca['Mode']
+		bundle['Components'] = spectra.pca['Components'][: pls.n_features_in_]
+		bundle['Mean'] = spectra.pca['Mean']
+		if spectra.pca['Scaler'] is not None:
+			bundle['ScalerMean'] = spectra.pca['Scaler'].mean_
+			bundle['ScalerScale'] = spectra.pca['Scaler'].scale_
+	bundle['NAttributes'] = bundle['Selection'].size or bundle['Components'].shape[1]
+	return bundle
+
+
+# LIBSsa prediction pipeline class
+class Pipeline:
+	"""
+	LIBSsa: Pipeline
+
+	Class for scoring new spectra with a calibrated PLS model, without the GUI. The fitted stages
+	(load/FSN, outliers removal, peak isolation, peak fitting, attributes, PCA and PLS) are captured
+	in a model bundle, and applied to new samples one at a time, so memory is bounded by a single
+	sample per worker regardless of the number of samples.
+
+	Usage:
+		pipeline = Pipeline.from_spectra(spectra)
+		predictions = pipeline.predict(folder, jobs=4)
+	"""
+
+	def __init__(self, bundle: dict, reading: tuple):
+		"""
+		:param bundle: dict with the model bundle (see model_bundle and load_bundle)
+		:param reading: parameters for reading spectra files (mode, delimiter, header, wavelength column, counts column, decimals)
+		"""
+		self.bundle = bundle
+		self.reading = tuple(reading)
+		self.fsn = [bundle['FSN'] or None, *bundle['FSNRange']]
+		# Isolation table: element, lower, upper and center(s) of each row
+		table = bundle['Isolation']
+		self.elements = list(table[:, 0]) if table.size else []
+		self.lower = [float(x) for x in table[:, 1]] if table.size else []
+		self.upper = [float(x) for x in table[:, 2]] if table.size else []
+		self.center = [[float(c) for c in x.split(';')] for x in table[:, 3]] if table.size else []
+
+	@classmethod
+	def from_spectra(cls, spectra: Spectra) -> 'Pipeline':
+		"""
+		Creates a pipeline with the stages of a calibrated Spectra object.
+
+		:param spectra: LIBSsa 2.0 Spectra object (with PLS Regression performed)
+		:return: Pipeline object
+		"""
+		if spectra.samples['Reading'] is None:
+			raise AttributeError('Load spectra before creating a pipeline!')
+		return cls(model_bundle(spectra), spectra.samples['Reading'])
+
+	@classmethod
+	def from_bundle(cls, file: Path, reading: tuple) -> 'Pipeline':
+		"""
+		Creates a pipeline from a model bundle file (see export_bundle).
+
+		:param file: path of the model bundle (npz)
+		:param reading: parameters for reading spectra files (see __init__)
+		:return: Pipeline object
+		"""
+		return cls(load_bundle(file), reading)
+
+	def samples(self, folder: Path) -> list:
+		"""
+		Lists samples of a folder: files in Single mode, or folders in Multiple mode.
+
+		:param folder: folder with the samples
+		:return: sorted list of sample paths
+		"""
+		samples = [folder.joinpath(x) for x in sorted(listdir(folder))]
+		if any(s.is_dir() if self.reading[0] == 'Single' else s.is_file() for s in samples):
+			raise ValueError(f'Wrong file structure for {self.reading[0]} mode')
+		return samples
+
+	def attributes(self, sample: Path) -> ndarray:
+		"""
+		Applies the preprocessing stages to a single sample, and returns its attributes (before PCA
+		projection or interval selection, as built by LIBSSA2.attributematrix).
+
+		:param sample: path of the sample (file or folder, depending on reading mode)
+		:return: attributes of the sample (one row matrix)
+		"""
+		silent, mode = SilentSignal(), self.bundle['Mode']
+		wavelength, counts = load((sample,), *self.reading, self.fsn, silent)
+		if not array_equal(wavelength, self.bundle['Wavelength']):
+			raise ValueError(f'Wavelengths of sample {sample.name} are different from the model ones')
+		if self.bundle['Outliers']:
+			counts = outliers(self.bundle['Outliers'], self.bundle['Criteria'], {'Count': 1, 'Raw': counts}, silent)[0]
+		if mode == 'Raw':
+			return attribute_matrix(mode, counts)
+		iso_wavelengths, iso_counts, elements, lower, upper, center, _ = isopeaks(
+			wavelength, counts, self.elements, self.lower, self.upper, self.center, *self.bundle['Baseline'], silent
+		)
+		if mode == 'Isolated':
+			return attribute_matrix(mode, iso_counts)
+		isolated = {
+			'Count': elements.size,
+			'NSamples': 1,
+			'Element': elements,
+			'Center': center,
+			'Lower': lower,
+			'Upper': upper,
+		}
+		fit = fitpeaks(
+			iso_wavelengths,
+			iso_counts,
+			self.bundle['Shapes'],
+			self.bundle['Asymmetry'],
+			isolated,
+			self.bundle['Mean1st'],
+			silent,
+			starts=self.bundle.get('Starts', 1),
+			seed=self.bundle.get('Seed', 0),
+			criterion=self.bundle.get('Criterion', 'BIC'),
+			tie=self.bundle.get('Tie') or None,
+			tie_asymmetry=self.bundle.get('TieAsymmetry', True),
+		)
+		return attribute_matrix(mode, fit[6] if mode == 'Areas' else fit[4])
+
+	def predict(self, folder: Path, jobs: int = 1, progress: Signal = None) -> Series:
+		"""
+		Predicts values for all samples of a folder. Samples are streamed through the pipeline one
+		at a time by each worker, and at most two samples per worker are in flight.
+
+		:param folder: folder with the samples (or list of sample paths)
+		:param jobs: number of processes used to process samples in parallel
+		:param progress: PySide Signal object (for multithreading)
+		:return: Series with the predicted value of each sample
+		"""
+		samples = self.samples(folder) if isinstance(folder, Path) else list(folder)
+		predictions = []
+
+		def collect(attributes: ndarray):
+			predictions.append(bundle_predict(self.bundle, attributes)[0])
+			if progress is not None:
+				progress.emit(len(predictions))
+
+		if jobs > 1:
+			# Workers only build attributes, so model arrays are not sent with each sample
+			stages = Pipeline({k: v for k, v in self.bundle.items() if k not in MODEL_ARRAYS}, self.reading)
+			with ProcessPoolExecutor(jobs, mp_context=get_context('spawn')) as executor:
+				pending = deque()
+				for sample in samples:
+					pending.append(executor.submit(stages.attributes, sample))
+					if len(pending) >= 2 * jobs:
+						collect(pending.popleft().result())
+				while pending:
+					collect(pending.popleft().result())
+		else:
+			for sample in samples:
+				collect(self.attributes(sample))
+		return Series(predictions, index=Index([s.stem for s in samples], name='Samples'), name=self.bundle['Element'])
@@ -17,10 +17,12 @@
 
 
 # Imports
+from hashlib import blake2b
 from pathlib import Path
 from traceback import print_exc
+from collections import OrderedDict
 
-from numpy import array
+from numpy import prod, array, dtype, stack, memmap, ndarray
 from pandas import DataFrame
 from PySide6.QtCore import Slot, Signal, QObject, QRunnable
 
@@ -67,6 +69,137 @@ class Worker(QRunnable):
 			self.signals.finished.emit()
 
 
+# Memoization of peak fitting results
+class FitCache:
+	"""
+	LIBSsa: FitCache
+
+	Content-addressed cache for peak fitting results.
+
+	Each entry holds the results of one element (isolated region) for all samples and is keyed
+	by a hash of everything that changes the fit (data, wavelength, shape, centers, asymmetry,
+	tolerances and fit mode). The cache is bounded by the size (in bytes) of the stored arrays,
+	evicting the least recently used entries first. Entries are shared (not copied) with the
+	results in Spectra.fit, so their arrays are stored as read-only. The cache lives inside
+	Spectra and is saved with the environment (shared arrays are pickled only once), so
+	elements fitted in a previous session are not fitted again.
+	"""
+
+	# Layout version of the cached results: keys (and checkpoints named after them) change with it
+	VERSION = 2
+
+	def __init__(self, max_bytes: int = 512 * 1024**2):
+		self.max_bytes = max_bytes
+		self.nbytes = 0
+		self.entries = OrderedDict()
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __setstate__(self, state: dict):
+		# Arrays are loaded as writeable, so entries are frozen again (they are still shared with Spectra.fit)
+		self.__dict__.update(state)
+		self.freeze(list(self.entries.values()))
+
+	def __contains__(self, key: str):
+		return key in self.entries
+
+	@staticmethod
+	def key(*values) -> str:
+		"""
+		Creates the hash (key) for the passed values. Arrays (including object arrays of
+		arrays, such as the isolated counts of all samples) are hashed by their content.
+		The layout version is also hashed, so results of older layouts are never reused.
+
+		:param values: values that define a fit
+		:return: hexadecimal digest
+		"""
+
+		def update(h, value):
+			if isinstance(value, ndarray) and value.dtype != object:
+				h.update(f'{value.dtype}{value.shape}'.encode())
+				h.update(value.tobytes())
+			elif isinstance(value, (ndarray, list, tuple)):
+				h.update(f'<{len(value)}>'.encode())
+				for v in value:
+					update(h, v)
+			else:
+				h.update(repr(value).encode())
+
+		hasher = blake2b(digest_size=20)
+		for val in (FitCache.VERSION, *values):
+			update(hasher, val)
+		return hasher.hexdigest()
+
+	@staticmethod
+	def size(value) -> int:
+		"""
+		Returns the size (in bytes) of all arrays inside the value.
+
+		:param value: array or tuple/list of arrays
+		:return: size in bytes
+		"""
+		if isinstance(value, ndarray) and value.dtype != object:
+			return value.nbytes
+		elif isinstance(value, (ndarray, list, tuple)):
+			return sum(FitCache.size(v) for v in value)
+		return 0
+
+	@staticmethod
+	def freeze(value) -> None:
+		"""
+		Sets all arrays inside the value as read-only, so shared results are not changed in place.
+
+		:param value: array or tuple/list of arrays
+		:return: None
+		"""
+		if isinstance(value, ndarray) and value.dtype != object:
+			value.flags.writeable = False
+		elif isinstance(value, (ndarray, list, tuple)):
+			for v in value:
+				FitCache.freeze(v)
+
+	def get(self, key: str):
+		"""
+		Returns the cached value (or None if key is not present) and marks it as recently used.
+		The value is not copied, and its arrays are read-only.
+
+		:param key: key created with FitCache.key
+		:return: cached value
+		"""
+		if key not in self.entries:
+			return None
+		self.entries.move_to_end(key)
+		return self.entries[key]
+
+	def put(self, key: str, value) -> None:
+		"""
+		Stores a value in the cache (setting its arrays as read-only), evicting the least
+		recently used entries if needed.
+
+		:param key: key created with FitCache.key
+		:param value: value to be stored
+		:return: None
+		"""
+		if key in self.entries:
+			self.nbytes -= self.size(self.entries.pop(key))
+		self.freeze(value)
+		self.entries[key] = value
+		self.nbytes += self.size(value)
+		while self.nbytes > self.max_bytes and len(self.entries) > 1:
+			_, evicted = self.entries.popitem(last=False)
+			self.nbytes -= self.size(evicted)
+
+	def clear(self) -> None:
+		"""
+		Removes all entries from cache.
+
+		:return: None
+		"""
+		self.entries.clear()
+		self.nbytes = 0
+
+
 # LIBSsa main spectra class
 class Spectra:
 	"""
@@ -87,10 +220,17 @@ class Spectra:
 
 	def __init__(self):
 		# Sample set and properties
-		self.samples = {'Count': 0, 'Name': tuple([None]), 'Path': tuple([Path()])}
+		self.samples = {'Count': 0, 'Name': tuple([None]), 'Path': tuple([Path()]), 'Reading': None, 'FSN': [None, None, None]}
 		# Base spectra elements: Wavelengths and Counts
 		self.wavelength = {'Raw': self.base, 'Isolated': self.base}
-		self.intensities = {'Count': 0, 'Raw': self.base, 'Outliers': self.base, 'Removed': self.base, 'Isolated': self.base}
+		self.intensities = {
+			'Count': 0,
+			'Raw': self.base,
+			'Outliers': self.base,
+			'Removed': self.base,
+			'Isolated': self.base,
+			'Criteria': (None, None),
+		}
 		# References and correlation
 		self.ref = DataFrame({'Empty': [0]})
 		self.pearson = {'Data': self.base, 'Full-Mean': self.base, 'Zeros': self.base}
@@ -103,6 +243,7 @@ class Spectra:
 			'Upper': self.base,
 			'Lower': self.base,
 			'Noise': self.base,
+			'Baseline': (False, False),
 			'Table': DataFrame(),
 		}
 		self.fit = {
@@ -111,28 +252,46 @@ class Spectra:
 			'Width': self.base,
 			'Height': self.base,
 			'Shape': self.base,
+			'Asymmetry': self.base,
+			'Mean1st': True,
+			'Starts': 1,
+			'Seed': 0,
+			'Tie': None,
+			'TieAsymmetry': True,
+			'Criterion': 'BIC',
 			'NFev': self.base,
 			'Convergence': self.base,
 			'Data': self.base,
 			'Total': self.base,
+			'Stats': self.base,
+			'Cache': FitCache(),
 		}
+		# Attribute matrices of PCA/PLS modes (built on demand, see invalidate)
+		self.attributes = {}
 		# Models
 		self.linear = {
 			'Reference': self.base,
 			'Predict': self.base,
 			'R2': self.base,
 			'RMSE': self.base,
+			'RMSECV': self.base,
+			'Bootstrap': self.base,
 			'Slope': self.base,
 			'Intercept': self.base,
 			'LoD': self.base,
 			'LoQ': self.base,
 			'Element': '',
+			'Explorer': self.base,
 		}
 		self.pca = {
 			'Mode': None,
 			'OptComp': 0,
 			'ExpVar': self.base,
 			'Attributes': self.base,
+			'Components': self.base,
+			'Singular': self.base,
+			'Mean': self.base,
+			'Scaler': None,
 			'Transformed': self.base,
 			'Loadings': self.base,
 		}
@@ -145,12 +304,18 @@ class Spectra:
 			'Predict': self.base,
 			'Residual': self.base,
 			'Att': '',
+			'Attributes': self.base,
+			'Selection': self.base,
+			'Intervals': self.base,
 			'PredictR2': self.base,
 			'PredictRMSE': self.base,
 			'CrossValPredict': self.base,
 			'CrossValR2': self.base,
 			'CrossValRMSE': self.base,
+			'CrossValFolds': self.base,
+			'Sweep': self.base,
 			'BlindPredict': self.base,
+			'Bundle': self.base,
 		}
 		# Plasma properties
 		self.plasma = {
@@ -163,14 +328,91 @@ class Spectra:
 			'Parameter': '',
 		}
 
+	def __getstate__(self) -> dict:
+		"""
+		Pickling state of the object. PCA attributes mapped to a file (incremental PCA) are saved
+		only by their path and shape, and are reopened when used again (see pca_attributes).
+
+		:return: dict of attributes
+		"""
+		state = self.__dict__.copy()
+		mapped = self.pca.get('Attributes')
+		if isinstance(mapped, memmap):
+			state['pca'] = {**self.pca, 'Attributes': {'Path': str(mapped.filename), 'Shape': mapped.shape}}
+		return state
+
+	def __setstate__(self, state: dict) -> None:
+		"""
+		Restores the pickled state of the object (see __getstate__). Environments saved by older
+		versions may lack attributes (or dict keys) added since, so these are set to their defaults.
+
+		:param state: dict of attributes
+		:return: None
+		"""
+		self.__init__()
+		for name, value in state.items():
+			default = getattr(self, name, None)
+			if isinstance(default, dict) and isinstance(value, dict):
+				default.update(value)
+			else:
+				setattr(self, name, value)
+
+	def pca_attributes(self) -> ndarray:
+		"""
+		pca_attributes method. Returns the attributes matrix of the PCA scan. Mapped attributes of
+		a loaded environment are reopened from their file on first use, and only if the file is gone
+		(or was changed) they are re-created from counts (as an in-memory matrix).
+
+		:return: attributes matrix
+		"""
+		mapped = self.pca['Attributes']
+		if not isinstance(mapped, dict) and mapped is not None:
+			return mapped
+		if mapped is not None:
+			path, shape = Path(mapped['Path']), tuple(mapped['Shape'])
+			if path.is_file() and path.stat().st_size == prod(shape) * dtype(float).itemsize:
+				self.pca['Attributes'] = memmap(path, dtype=float, mode='r', shape=shape)
+				return self.pca['Attributes']
+		# Mean spectra of the samples (the same attributes built by incremental PCA)
+		counts = self.intensities['Outliers'] if self.intensities['Outliers'].size > 1 else self.intensities['Raw']
+		attributes = stack([c.mean(1) for c in counts]) if self.intensities['Count'] else self.base
+		if self.pca['Scaler'] is not None and attributes is not self.base:
+			attributes = self.pca['Scaler'].transform(attributes)
+		self.pca['Attributes'] = attributes
+		return attributes
+
+	def invalidate(self, *modes: str) -> None:
+		"""
+		invalidate method. Removes the cached attribute matrices of the given modes (or of all
+		modes, if none is given). Must be called when the data used to build them changes.
+
+		:param modes: attributes modes (Raw, Isolated, Areas or Heights)
+		:return: None
+		"""
+		for mode in modes or list(self.attributes):
+			self.attributes.pop(mode, None)
+
+	def snapshot(self) -> 'Spectra':
+		"""
+		snapshot method. Creates a shallow copy of the object, with copies of each dict (arrays and
+		DataFrames are shared, not copied). Results are replaced (not changed in place) by analysis,
+		so the copy is not affected by later changes and can be used by background jobs (e.g. exports).
+
+		:return: Spectra object
+		"""
+		spectra = object.__new__(type(self))
+		spectra.__dict__ = {k: v.copy() if isinstance(v, dict) else v for k, v in vars(self).items()}
+		return spectra
+
 	def clear(self):
 		"""
-		clear method. Totally clear an object, except pls if previous calculated
-		(for blind predictions)
+		clear method. Totally clear an object, except pls model if previous calculated
+		or loaded from a model bundle (for blind predictions). Attributes of the cleared
+		samples (and results obtained from them) are not kept.
 
 		:return: None
 		"""
 		pls = self.pls.copy()
 		self.__init__()
-		if pls['Model'] != self.base:
-			self.pls = pls
+		if pls['Model'] is not self.base or pls['Bundle'] is not self.base:
+			self.pls.update({k: v for k, v in pls.items() if k not in ('Attributes', 'Sweep', 'Intervals', 'BlindPredict')})
@@ -23,12 +23,14 @@ try:
 	import pickle
 	import tarfile
 	import tempfile
-	from os import listdir
+	from os import close, listdir
 	from time import time
 	from pathlib import Path
 	from datetime import datetime
+	from threading import Event
 	from traceback import print_exc
 
+	from numpy import array_equal
 	from pandas import DataFrame
 	from psutil import virtual_memory
 	from markdown import markdown
@@ -36,19 +38,26 @@ try:
 	from PySide6.QtWidgets import QMainWindow, QMessageBox, QApplication, QTableWidgetItem
 
 	import libssa.env.export as export
-	from libssa.env.imports import load, outliers, refcorrel, domulticorrel
-	from libssa.env.spectra import Worker, Spectra
+	from libssa.env.imports import SampleReader, load, outliers, refcorrel, load_bundle, domulticorrel
+	from libssa.env.spectra import Worker, Spectra, FitCache
 	from libssa.env.functions import (
+		PLS_COMPONENTS,
+		ipls,
 		array,
-		zeros,
 		pca_do,
 		pls_do,
 		tne_do,
 		fitpeaks,
 		isopeaks,
 		pca_scan,
-		column_stack,
+		pls_sweep,
+		linear_best,
 		linear_model,
+		bundle_predict,
+		linear_explorer,
+		pca_incremental,
+		attribute_matrix,
+		checkpoint_prune,
 	)
 	from libssa.env.gui.libssagui import LIBSsaGUI, changestatus
 except (ImportError, ImportWarning) as err:
@@ -93,6 +102,8 @@ class LIBSSA2(QMainWindow):
 			self.spec = Spectra()
 			# Defines global variables
 			self.threadpool = QThreadPool()
+			self.exportpool = QThreadPool()
+			self.exports = {}
 			self.parent = Path()
 			self.mbox = QMessageBox()
 			self.mode, self.delimiter = '', ''
@@ -101,6 +112,9 @@ class LIBSSA2(QMainWindow):
 			self.memory = virtual_memory()
 			self.tempfolder = Path(__file__)
 			self.root = self.tempfolder.parent
+			self.checkpoints = Path.home().joinpath('.libssa', 'checkpoints')
+			self.mapped = Path.home().joinpath('.libssa', 'pca')
+			self.cancel_fit = Event()
 			# Connects
 			self.connects()
 			# Extra variables
@@ -123,6 +137,7 @@ class LIBSSA2(QMainWindow):
 		self.gui.menu_import_ref.triggered.connect(self.loadref)
 		self.gui.menu_import_peaks.triggered.connect(lambda: self.spreadsheet_to_table('Peaks'))
 		self.gui.menu_import_tne.triggered.connect(lambda: self.spreadsheet_to_table('TNe'))
+		self.gui.menu_import_bundle.triggered.connect(self.loadbundle)
 		self.gui.menu_export_fullspectra_raw.triggered.connect(lambda: self.export_mechanism(1))
 		self.gui.menu_export_fullspectra_out.triggered.connect(lambda: self.export_mechanism(2))
 		self.gui.menu_export_peaks_table.triggered.connect(lambda: self.export_mechanism(3))
@@ -131,6 +146,7 @@ class LIBSSA2(QMainWindow):
 		self.gui.menu_export_peaks_areas.triggered.connect(lambda: self.export_mechanism(6))
 		self.gui.menu_export_predictions_linear.triggered.connect(lambda: self.export_mechanism(7))
 		self.gui.menu_export_predictions_pls.triggered.connect(lambda: self.export_mechanism(8))
+		self.gui.menu_export_predictions_bundle.triggered.connect(lambda: self.export_mechanism(12))
 		self.gui.menu_export_other_pca.triggered.connect(lambda: self.export_mechanism(9))
 		self.gui.menu_export_other_tne.triggered.connect(lambda: self.export_mechanism(10))
 		self.gui.menu_export_other_correl.triggered.connect(lambda: self.export_mechanism(11))
@@ -145,11 +161,15 @@ class LIBSSA2(QMainWindow):
 		# Page 3
 		self.gui.p3_isoapply.clicked.connect(self.peakiso)
 		self.gui.p3_fitapply.clicked.connect(self.peakfit)
+		self.gui.p3_tie.currentIndexChanged.connect(lambda index: self.gui.p3_tie_asymmetry.setEnabled(bool(index)))
 		# Page 4
 		self.gui.p4_apply.clicked.connect(self.docalibrationcurve)
+		self.gui.p4_explore.clicked.connect(self.explorecalibration)
 		# Page 5
 		self.gui.p5_pca_cscan.clicked.connect(self.pca_perform_scan)
 		self.gui.p5_pca_do.clicked.connect(self.pca_do)
+		self.gui.p5_pls_ipls.clicked.connect(self.ipls_do)
+		self.gui.p5_pls_sweep.clicked.connect(self.pls_sweep)
 		self.gui.p5_pls_cal_start.clicked.connect(self.pls_do)
 		self.gui.p5_pls_pred_start.clicked.connect(self.pls_predict)
 		# Page 6
@@ -354,6 +374,58 @@ class LIBSSA2(QMainWindow):
 					self.gui.p4_ref.addItems(self.spec.ref.columns)
 					self.gui.p5_pls_cal_ref.addItems(self.spec.ref.columns)
 
+	def loadbundle(self):
+		# gets file from dialog
+		bundle_file = Path(
+			self.gui.guifd(self.parent, 'gof', 'Select PLS model bundle file', 'LIBSsa PLS Model Bundle (*.npz)')[0]
+		)
+		if str(bundle_file) == '.':
+			self.gui.guimsg('Error', 'Cancelled by the user.', 'i')
+		else:
+			try:
+				bundle = load_bundle(bundle_file)
+			except (OSError, ValueError) as ex:
+				self.gui.guimsg(
+					'Error', f'Could not load model bundle.<p>Error message: <b style="color: red">{str(ex)}</b>.</p>', 'c'
+				)
+			else:
+				self.spec.pls['Bundle'] = bundle
+				# Preprocessing settings of the model are applied to the gui (for loading new spectra)
+				self.gui.p1_fsn_check.setChecked(bool(bundle['FSN']))
+				if bundle['FSN']:
+					self.gui.p1_fsn_type.setCurrentText('Internal Standard' if bundle['FSN'] == 'IS' else bundle['FSN'])
+					if bundle['FSN'] == 'IS':
+						self.gui.p1_fsn_lminus.setValue(bundle['FSNRange'][0])
+						self.gui.p1_fsn_lplus.setValue(bundle['FSNRange'][1])
+				if bundle['Outliers']:
+					sam = bundle['Outliers'] == 'SAM'
+					self.gui.p2_dot.setChecked(sam)
+					self.gui.p2_mad.setChecked(not sam)
+					(self.gui.p2_dot_c if sam else self.gui.p2_mad_c).setValue(bundle['Criteria'])
+				rows, cols = bundle['Isolation'].shape
+				if rows:
+					self.gui.p3_isotb.setRowCount(rows)
+					self.gui.p3_isotb.setColumnCount(cols)
+					for r in range(rows):
+						for c in range(cols):
+							self.gui.p3_isotb.setItem(r, c, QTableWidgetItem(bundle['Isolation'][r, c]))
+				# Updates prediction elements
+				self.gui.p5_pls_pred_model.setText(bundle['Element'])
+				self.gui.p5_pls_pred_model.setStyleSheet('color:#000080; font-weight: bold;')
+				self.gui.p5_pls_pred_att.setText(bundle['Att'])
+				self.gui.p5_pls_pred_att.setStyleSheet('color:#000080; font-weight: bold;')
+				self.gui.p5_pls_pred_start.setEnabled(True)
+				self.gui.guimsg(
+					'Done!',
+					f'PLS model bundle <b><u>{bundle_file.name}</u></b> properly loaded into LIBSsa.'
+					f'<p>Element: <b>{bundle["Element"]}</b><br>'
+					f'Attributes: <b>{bundle["Att"]}</b> ({bundle["Mode"]} mode)<br>'
+					f'Latent variables: <b>{bundle["LVs"]}</b></p>'
+					f'Preprocessing settings of the model were applied. Load new spectra and build their '
+					f'{bundle["Mode"].lower()} attributes before the blind prediction.',
+					'i',
+				)
+
 	def spreadsheet_to_table(self, mode: str):
 		if mode == 'TNe':
 			self.gui.guimsg(
@@ -386,119 +458,160 @@ class LIBSSA2(QMainWindow):
 			9: 'PCA Data',
 			10: 'Temperature and Ne Report',
 			11: 'Correlation Spectrum',
+			12: 'PLS Model Bundle',
 		}
+
+		# Inner functions to receive result/errors from worker (messages are shown when it finishes)
+		def result(_):
+			self.exports[file]['Error'] = False
+
+		def errors(runerror):
+			self.exports[file]['Error'] = runerror
+
+		def finished():
+			runerror = self.exports.pop(file)['Error']
+			if runerror:
+				changestatus(self.gui.sb, f'{modes_dict[mode]} data could not be saved', 'r', 0)
+				self.gui.guimsg(
+					'Could not export data!',
+					f'Failed to save <u><b>{modes_dict[mode]}</b></u>.'
+					f'<p>Error message: <b style="color: red">{runerror[1]}</b></p>',
+					'c',
+				)
+			else:
+				changestatus(self.gui.sb, f'{modes_dict[mode]} data saved', 'g', 0)
+				links = '<br>'.join(f'<a href={f.as_uri()}>{f.name}</a>' for f in export.saved_files(file))
+				self.gui.guimsg('Done!', f'<b>{modes_dict[mode]}</b> data properly saved.<p>Save location: {links}</p>', 'i')
+			self.exportstatus()
+
 		# Creates variables to be used in the method
-		dt, suffix = datetime.now().strftime('%Y-%m-%d_%Hh%Mm%Ss'), ''
+		dt, suffix, file = datetime.now().strftime('%Y-%m-%d_%Hh%Mm%Ss'), '', Path()
+		# Exports use a snapshot of the environment, so they are not affected by later analysis
+		spectra = self.spec.snapshot()
+		# Result tables are saved as spreadsheets or columnar binary files (Parquet and Feather need pyarrow)
+		formats = ('.xlsx', *(export.COLUMNAR if export.PYARROW else ('.npz',)))
+		tables_filter = ';;'.join(f'{export.TABLE_FORMATS[f]} (*{f})' for f in formats)
 		# Gets values based on mode
 		if mode == 1:
 			suffix = ''
 			func = export.export_raw
-			func_param = (self.spec, 'Raw')
+			func_param = (spectra, 'Raw')
 			fd_params = (Path.home(), 'getExistingDirectory', f'Choose folder for exporting {modes_dict[mode]} data', '')
 			index = False
 		elif mode == 2:
 			suffix = ''
 			func = export.export_raw
-			func_param = (self.spec, 'Outliers')
+			func_param = (spectra, 'Outliers')
 			fd_params = (Path.home(), 'getExistingDirectory', f'Choose folder for exporting {modes_dict[mode]} data', '')
 			index = False
 		elif mode == 3:
 			suffix = '.xlsx'
 			func = export.export_iso_table
-			func_param = [self.gui.p3_isotb]
+			func_param = [export.iso_table(self.gui.p3_isotb)]
 			fd_params = (
 				Path.home().joinpath(f'Iso_Tables_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} data',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 4:
 			suffix = '.xlsx'
 			func = export.export_iso_peaks
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'Iso_Peaks_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} data',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 5:
 			suffix = '.xlsx'
 			func = export.export_fit_peaks
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'Fit_Peaks_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} data',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 6:
 			func = export.export_fit_areas
 			suffix = '.xlsx'
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'Fit_Areas_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} data',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 7:
 			suffix = '.xlsx'
 			func = export.export_linear
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'Linear_Model_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} report',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 8:
 			suffix = '.xlsx'
 			func = export.export_pls
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'PLS_Model_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} report',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 9:
 			suffix = '.xlsx'
 			func = export.export_pca
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'PCA_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} report',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 10:
 			suffix = '.xlsx'
 			func = export.export_tne
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'T-Ne_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} report',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
 			)
 			index = True
 		elif mode == 11:
 			suffix = '.xlsx'
 			func = export.export_correl
-			func_param = [self.spec]
+			func_param = [spectra]
 			fd_params = (
 				Path.home().joinpath(f'Correl_Report_{dt}.xlsx'),
 				'getSaveFileName',
 				f'Choose filename to export {modes_dict[mode]} report',
-				'Excel 2007+ Spreadsheet (*.xlsx)',
+				tables_filter,
+			)
+			index = True
+		elif mode == 12:
+			suffix = '.npz'
+			func = export.export_bundle
+			func_param = [spectra]
+			fd_params = (
+				Path.home().joinpath(f'PLS_Model_Bundle_{dt}.npz'),
+				'getSaveFileName',
+				f'Choose filename to export {modes_dict[mode]}',
+				'LIBSsa PLS Model Bundle (*.npz)',
 			)
 			index = True
 		else:
@@ -506,7 +619,8 @@ class LIBSSA2(QMainWindow):
 		# Call file dialog
 		try:
 			changestatus(self.gui.sb, f'Please wait, exporting {modes_dict[mode]} data...', 'b', 1)
-			path = self.gui.guifd(*fd_params)[0] if index else self.gui.guifd(*fd_params)
+			selected = self.gui.guifd(*fd_params)
+			path, fd_filter = selected if index else (selected, '')
 		except TypeError:
 			self.gui.guimsg('Error', f'Can not export data for <b>{modes_dict[mode]}</b>.' f'<br>Not implemented yet.', 'c')
 			self.gui.sb.clearMessage()
@@ -516,26 +630,32 @@ class LIBSSA2(QMainWindow):
 				self.gui.guimsg('Error', 'Cancelled by the user.', 'w')
 				self.gui.sb.clearMessage()
 			else:
-				# Run func with parameters
-				try:
-					func(path.with_suffix(suffix) if suffix else path, *func_param)
-				except Exception as ex:
-					print_exc()
-					self.gui.guimsg(
-						'Could not export data!',
-						f'Failed to save <u><b>{modes_dict[mode]}</b></u>.'
-						f'<p>Error message: <b style="color: red">{str(ex)}</b></p>',
-						'c',
-					)
-					changestatus(self.gui.sb, f'{modes_dict[mode]} data could not be saved', 'r', 0)
+				if suffix == '.xlsx':
+					# Typed suffix comes first, then the one of the selected filter
+					typed = path.suffix.lower()
+					suffix = typed if typed in formats else next((f for f in formats if f'*{f}' in fd_filter), suffix)
+				file = path.with_suffix(suffix) if suffix else path
+				if file in self.exports:
+					self.gui.guimsg('Error', f'<b>{file.name}</b> is already being exported.', 'w')
+					self.exportstatus()
 				else:
-					self.gui.guimsg(
-						'Done!',
-						f'<b>{modes_dict[mode]}</b> data properly saved.'
-						f'<p>Save location: <a href={path.as_uri()}>{path.name}</a></p>',
-						'i',
-					)
-					changestatus(self.gui.sb, f'{modes_dict[mode]} data saved', 'g', 0)
+					# Run func with parameters in the export pool (analysis may continue meanwhile)
+					worker = Worker(func, file, *func_param)
+					worker.signals.progress.connect(lambda val: self.exportstatus(file, val))
+					worker.signals.result.connect(result)
+					worker.signals.error.connect(errors)
+					worker.signals.finished.connect(finished)
+					self.exports[file] = {'Name': modes_dict[mode], 'Saved': 0, 'Error': None}
+					self.exportstatus()
+					self.exportpool.start(worker)
+
+	def exportstatus(self, file: Path = None, saved: int = 0):
+		# Updates saved sheets/tables/files of an export, and shows all running exports in the statusbar
+		if file in self.exports:
+			self.exports[file]['Saved'] = saved
+		if self.exports:
+			running = ', '.join(f'{e["Name"]} ({e["Saved"]} saved)' for e in self.exports.values())
+			changestatus(self.gui.sb, f'Exporting: {running}', 'b', 1)
 
 	#
 	# Methods for Graphics
@@ -575,9 +695,10 @@ class LIBSSA2(QMainWindow):
 			self.gui.g_current_sb.setRange(1, 5)
 			self.gui.g_max.setText('5')
 		elif idx == 7:
-			# PLS
-			self.gui.g_current_sb.setRange(1, 2)
-			self.gui.g_max.setText('2')
+			# PLS (sweep is the 3rd plot, if done)
+			plots = 2 if self.spec.pls['Sweep'] is self.spec.base else 3
+			self.gui.g_current_sb.setRange(1, plots)
+			self.gui.g_max.setText(str(plots))
 		elif idx == 8:
 			# Saha-Boltzmann plot
 			self.gui.g_current_sb.setRange(1, self.spec.samples['Count'])
@@ -675,6 +796,12 @@ class LIBSSA2(QMainWindow):
 					f' (<i style="color: #1a75ff">{self.spec.pls["Att"]}</i>)'
 				)
 				self.gui.plsplot(self.spec.pls, mode='Blind')
+			if idx == 2:
+				self.gui.g.setTitle(
+					f'RMSECV as function of <b>latent variables</b> for <b>{self.spec.pls["Sweep"].attrs["Element"]}</b>'
+					f' (<i style="color: #1a75ff">{self.spec.pls["Att"]}</i>)'
+				)
+				self.gui.plsplot(self.spec.pls, mode='Sweep')
 		elif self.gui.g_current == 'Temperature':
 			self.gui.g.setTitle(
 				f'Saha-Boltzmann plot for sample <b>{self.spec.samples["Name"][idx]}</b>'
@@ -726,6 +853,9 @@ class LIBSSA2(QMainWindow):
 			self.spec.wavelength['Raw'] = returned[0]
 			self.spec.intensities['Raw'] = returned[1]
 			self.spec.intensities['Count'] = self.spec.samples['Count']
+			self.spec.invalidate()
+			self.spec.samples['Reading'] = reading
+			self.spec.samples['FSN'] = fsn
 			# Enable gui elements
 			self.gui.graphenable(True)
 			self.gui.p1_ldspectra.setEnabled(True)
@@ -789,17 +919,15 @@ class LIBSSA2(QMainWindow):
 			self.gui.dynamicbox(
 				'Loading data', '<b>Please wait</b>. Loading spectra into LIBSsa...', self.spec.samples['Count']
 			)
-			worker = Worker(
-				load,
-				self.spec.samples['Path'],
+			reading = (
 				self.mode,
 				self.gui.p1_delim.currentText(),
 				self.gui.p1_header.value(),
 				self.gui.p1_wcol.value(),
 				self.gui.p1_ccol.value(),
 				self.gui.p1_dec.value(),
-				fsn,
 			)
+			worker = Worker(load, self.spec.samples['Path'], *reading, fsn)
 			worker.signals.progress.connect(self.gui.updatedynamicbox)
 			worker.signals.finished.connect(
 				lambda: self.gui.updatedynamicbox(val=0, update=False, msg='Spectra loaded into LIBSsa')
@@ -818,6 +946,8 @@ class LIBSSA2(QMainWindow):
 		def result(returned):
 			# Saves result
 			(self.spec.intensities['Outliers'], self.spec.intensities['Removed']) = returned
+			self.spec.intensities['Criteria'] = (out_type, criteria)
+			self.spec.invalidate('Raw')
 			# Enable apply button
 			self.gui.p2_apply_out.setEnabled(True)
 			# Outputs timer
@@ -918,6 +1048,8 @@ class LIBSSA2(QMainWindow):
 			self.spec.isolated['Noise'] = returned[6]
 			self.spec.isolated['Count'] = returned[2].size
 			self.spec.isolated['NSamples'] = self.spec.samples['Count']
+			self.spec.isolated['Baseline'] = baseline
+			self.spec.invalidate('Isolated')
 			# Enable apply button
 			self.gui.p3_isoapply.setEnabled(True)
 			# Outputs timer
@@ -959,18 +1091,9 @@ class LIBSSA2(QMainWindow):
 						center.append(list(map(float, self.gui.p3_isotb.item(tb, 3).text().split(';'))))
 					else:
 						center.append([float(self.gui.p3_isotb.item(tb, 3).text())])
+				baseline = (self.gui.p3_linear.isChecked(), self.gui.p3_norm.isChecked())
 				self.gui.dynamicbox('Isolating peaks', '<b>Please wait</b>. This may take a while...', len(elements))
-				worker = Worker(
-					isopeaks,
-					self.spec.wavelength['Raw'],
-					counts,
-					elements,
-					lower,
-					upper,
-					center,
-					self.gui.p3_linear.isChecked(),
-					self.gui.p3_norm.isChecked(),
-				)
+				worker = Worker(isopeaks, self.spec.wavelength['Raw'], counts, elements, lower, upper, center, *baseline)
 				worker.signals.progress.connect(self.gui.updatedynamicbox)
 				worker.signals.finished.connect(
 					lambda: self.gui.updatedynamicbox(val=0, update=False, msg='Peak isolation finished')
@@ -997,6 +1120,14 @@ class LIBSSA2(QMainWindow):
 			self.spec.fit['Area'] = returned[6]
 			self.spec.fit['AreaSTD'] = returned[7]
 			self.spec.fit['Shape'] = returned[8]
+			self.spec.fit['Stats'] = returned[9]
+			self.spec.fit['Asymmetry'] = asymmetry
+			self.spec.fit['Mean1st'] = mean1st
+			self.spec.fit['Starts'] = starts
+			self.spec.fit['Criterion'] = criterion
+			self.spec.fit['Tie'] = tie
+			self.spec.fit['TieAsymmetry'] = tie_asymmetry
+			self.spec.invalidate('Areas', 'Heights')
 			# Enable apply button
 			self.gui.p3_fitapply.setEnabled(True)
 			# Outputs timer
@@ -1011,6 +1142,30 @@ class LIBSSA2(QMainWindow):
 			# Updates table in page 6
 			self.gui.update_tne_values()
 
+		# Inner function to handle errors (and cancellation)
+		def errors(runerror):
+			# Enable apply button
+			self.gui.p3_fitapply.setEnabled(True)
+			if runerror[0] == 'InterruptedError':
+				print('Timestamp:', time(), 'MSG: Peak fitting cancelled. Timer: %.2f seconds. ' % (time() - self.timer))
+				changestatus(self.gui.sb, 'Peak fitting cancelled', 'r', 0)
+				self.gui.guimsg(
+					'Cancelled',
+					'Peak fitting was <b>cancelled</b>.<p>Finished samples were saved, and applying the fit again '
+					'with the same parameters will continue from where it stopped.</p>',
+					'i',
+				)
+			else:
+				print('Timestamp:', time(), 'ERROR: Could not fit peaks. Timer: %.2f seconds. ' % (time() - self.timer))
+				changestatus(self.gui.sb, 'Could not perform peak fitting. Check parameters and try again.', 'r', 0)
+				runerror_message = (
+					'Could not fit peaks properly! '
+					'Try recheck fit table and try again.'
+					'<p>Error type: <b><i><u>%s</u></i></b></p>'
+					'<p>Error message:<br><b>%s</b></p>' % (runerror[0], runerror[1])
+				)
+				self.gui.guimsg('Error!', runerror_message, 'c')
+
 		if not self.spec.isolated['Count']:
 			self.gui.guimsg('Error', 'Please perform peak isolation <b>before</b> using this feature.', 'w')
 		else:
@@ -1023,8 +1178,25 @@ class LIBSSA2(QMainWindow):
 				x.split(')')[1][1:] for x in [self.gui.p3_fittb.cellWidget(y, 1).currentText() for y in range(fittable_rows)]
 			]
 			asymmetry = [float(z) for z in [self.gui.p3_fittb.item(w, 2).text() for w in range(fittable_rows)]]
+			mean1st = self.gui.p3_mean1st.isChecked()
+			starts = self.gui.p3_starts.value()
+			criterion = self.gui.p3_criterion.currentText()
+			tie = self.gui.p3_tie.currentText() if self.gui.p3_tie.currentIndex() else None
+			tie_asymmetry = self.gui.p3_tie_asymmetry.isChecked()
+			# Environments saved before the cache was introduced do not have it
+			if 'Cache' not in self.spec.fit:
+				self.spec.fit['Cache'] = FitCache()
+			# Checkpoints folder (for resuming, private to the user) and cancel flag
+			self.checkpoints.mkdir(mode=0o700, parents=True, exist_ok=True)
+			self.checkpoints.chmod(0o700)
+			self.cancel_fit.clear()
 			# Run fit function inside pool
-			self.gui.dynamicbox('Fitting peaks', '<b>Please wait</b>. This may take a while...', self.spec.samples['Count'])
+			self.gui.dynamicbox(
+				'Fitting peaks',
+				'<b>Please wait</b>. This may take a while...',
+				self.spec.samples['Count'],
+				cancel=self.cancel_fit.set,
+			)
 			worker = Worker(
 				fitpeaks,
 				self.spec.wavelength['Isolated'],
@@ -1032,11 +1204,21 @@ class LIBSSA2(QMainWindow):
 				shapes,
 				asymmetry,
 				self.spec.isolated,
-				self.gui.p3_mean1st.isChecked(),
+				mean1st,
+				cache=self.spec.fit['Cache'],
+				checkpoint=self.checkpoints,
+				cancel=self.cancel_fit,
+				starts=starts,
+				jobs=self.gui.p3_cores.value(),
+				criterion=criterion,
+				seed=self.spec.fit['Seed'],
+				tie=tie,
+				tie_asymmetry=tie_asymmetry,
 			)
 			worker.signals.progress.connect(self.gui.updatedynamicbox)
 			worker.signals.finished.connect(lambda: self.gui.updatedynamicbox(val=0, update=False, msg='Peak fitting finished'))
 			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
 			self.configthread()
 			self.timer = time()
 			self.threadpool.start(worker)
@@ -1045,6 +1227,26 @@ class LIBSSA2(QMainWindow):
 	# Methods for page 4 == Calibration curve
 	#
 	def docalibrationcurve(self):
+		# Inner function to receive result from worker
+		def result(returned):
+			self.gui.p4_apply.setEnabled(True)
+			print('Timestamp:', time(), 'MSG: Linear model count timer: %.2f seconds. ' % (time() - self.timer))
+			self.savelinear(returned)
+			# Updates gui elements
+			self.gui.g_selector.setCurrentIndex(5)
+			self.setgrange()
+
+		# Inner function to handle errors
+		def errors(runerror):
+			self.gui.p4_apply.setEnabled(True)
+			changestatus(self.gui.sb, 'Could not create linear model', 'r', 0)
+			self.gui.guimsg(
+				'Error',
+				f'Could not create linear model.<p>Error type: <b><i><u>{runerror[0]}</u></i></b></p>'
+				f'<p>Error message: <b style="color: red">{runerror[1]}</b>.</p>',
+				'c',
+			)
+
 		if (not self.spec.isolated['Count'] and (self.spec.fit['Area'] is self.spec.base)) or (
 			self.spec.ref.columns[0] == 'Empty'
 		):
@@ -1071,107 +1273,199 @@ class LIBSSA2(QMainWindow):
 			base, base_peak = (self.gui.p4_peak.currentText(), self.gui.p4_npeak.value() - 1)
 			selected, selected_peak = (self.gui.p4_pnorm_combo.currentText(), self.gui.p4_npeak_norm.value() - 1)
 			elements, reference = (self.spec.isolated['Element'], self.spec.ref[self.gui.p4_ref.currentText()])
-			linear = linear_model(mode, reference, values, base, base_peak, selected, selected_peak, elements, noise, param)
-			self.spec.linear['Reference'] = linear[0]
-			self.spec.linear['Predict'] = linear[1]
-			self.spec.linear['R2'] = linear[2]
-			self.spec.linear['RMSE'] = linear[3]
-			self.spec.linear['Slope'] = linear[4]
-			self.spec.linear['Intercept'] = linear[5]
-			self.spec.linear['LoD'] = linear[6]
-			self.spec.linear['LoQ'] = linear[7]
-			self.spec.linear['Element'] = linear[0][0]
-			# Updates gui elements
+			# Bootstrap may take a while, so the model is created in background
+			changestatus(self.gui.sb, 'Please Wait. Creating linear model...', 'p', 1)
+			self.gui.dynamicbox('Linear model', '<b>Please wait</b>. This may take a while...', self.gui.p4_boots.value())
+			self.gui.p4_apply.setEnabled(False)
+			worker = Worker(
+				linear_model,
+				mode,
+				reference,
+				values,
+				base,
+				base_peak,
+				selected,
+				selected_peak,
+				elements,
+				noise,
+				param,
+				self.gui.p4_cv.value(),
+				self.gui.p4_boots.value(),
+				self.gui.p3_cores.value(),
+			)
+			worker.signals.progress.connect(self.gui.updatedynamicbox)
+			worker.signals.finished.connect(lambda: self.gui.updatedynamicbox(val=0, update=False, msg='Linear model finished'))
+			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
+			self.configthread()
+			self.timer = time()
+			self.threadpool.start(worker)
+
+	def savelinear(self, linear: tuple):
+		# Saves results of linear_model into Spectra object
+		self.spec.linear['Reference'] = linear[0]
+		self.spec.linear['Predict'] = linear[1]
+		self.spec.linear['R2'] = linear[2]
+		self.spec.linear['RMSE'] = linear[3]
+		self.spec.linear['Slope'] = linear[4]
+		self.spec.linear['Intercept'] = linear[5]
+		self.spec.linear['LoD'] = linear[6]
+		self.spec.linear['LoQ'] = linear[7]
+		self.spec.linear['RMSECV'] = linear[8]
+		self.spec.linear['Bootstrap'] = linear[9]
+		self.spec.linear['Element'] = linear[0][0]
+
+	def explorecalibration(self):
+		# Inner function to receive result from worker
+		def result(returned):
+			self.spec.linear['Explorer'] = returned
+			self.gui.p4_explore.setEnabled(True)
+			print('Timestamp:', time(), 'MSG: Calibration explorer count timer: %.2f seconds. ' % (time() - self.timer))
+			# The best model is loaded as the current linear model (from the explorer results, without fitting it again)
+			linear = linear_best(
+				returned, self.spec.ref, self.spec.fit[param], self.spec.isolated['Element'], self.spec.isolated['Noise'], param
+			)
+			self.savelinear(linear)
 			self.gui.g_selector.setCurrentIndex(5)
 			self.setgrange()
+			# Shows the best models
+			rows = ''.join(
+				f'<tr><td>{i + 1}</td><td>{r.Reference}</td><td>{r.Base}</td><td>{r.Mode}</td><td>{r.Normalization}</td>'
+				f'<td>{r.R2:.4f}</td><td>{r.LoD:.3g}</td></tr>'
+				for i, r in enumerate(returned.head(5).itertuples())
+			)
+			self.gui.guimsg(
+				'Calibration explorer',
+				'<b>Best models</b> (all ranked models are saved in the linear model report):'
+				'<table><tr><th>#</th><th>Ref</th><th>Base</th><th>Mode</th><th>Norm</th><th>R2</th><th>LoD</th></tr>'
+				f'{rows}</table>',
+				'i',
+			)
+
+		# Inner function to handle errors
+		def errors(runerror):
+			self.gui.p4_explore.setEnabled(True)
+			changestatus(self.gui.sb, 'Could not explore calibration models', 'r', 0)
+			self.gui.guimsg(
+				'Error',
+				f'Could not explore calibration models.<p>Error type: <b><i><u>{runerror[0]}</u></i></b></p>'
+				f'<p>Error message: <b style="color: red">{runerror[1]}</b>.</p>',
+				'c',
+			)
+
+		if (not self.spec.isolated['Count'] and (self.spec.fit['Area'] is self.spec.base)) or (
+			self.spec.ref.columns[0] == 'Empty'
+		):
+			self.gui.guimsg(
+				'Warning',
+				'You must <i>load references</i> <b>and</b> <i>perform peak fitting</i> <b style="color:red">before</b> using this feature.',
+				'w',
+			)
+		else:
+			param = 'Area' if self.gui.p4_areas.isChecked() else 'Height'
+			changestatus(self.gui.sb, 'Please Wait. Exploring calibration models...', 'p', 1)
+			self.gui.dynamicbox(
+				'Exploring calibration models', '<b>Please wait</b>. This may take a while...', self.spec.ref.columns.__len__()
+			)
+			self.gui.p4_explore.setEnabled(False)
+			worker = Worker(
+				linear_explorer,
+				self.spec.ref,
+				self.spec.fit[param],
+				self.spec.isolated['Element'],
+				self.spec.isolated['Noise'],
+				param,
+				jobs=self.gui.p3_cores.value(),
+				cv=self.gui.p4_cv.value(),
+			)
+			worker.signals.progress.connect(self.gui.updatedynamicbox)
+			worker.signals.finished.connect(
+				lambda: self.gui.updatedynamicbox(val=0, update=False, msg='Calibration explorer finished')
+			)
+			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
+			self.configthread()
+			self.timer = time()
+			self.threadpool.start(worker)
 
 	#
 	# Methods for page 5 == PCA/PLS
 	#
-	def pca_perform_scan(self):
-		# Checks current operation mode
-		ok, mode, attribute_matrix = True, '', zeros(0)
-		for rb in [self.gui.p5_pca_raw, self.gui.p5_pca_iso, self.gui.p5_pca_areas, self.gui.p5_pca_heights]:
-			if rb.isChecked():
-				mode = rb.text()
-				break
-		# Gets correct value for attributes, depending on mode
+	def attributematrix(self, mode: str):
+		# Attribute matrix (rows = samples, columns = attributes) of a PCA/PLS mode. Matrices are cached
+		# in Spectra (and invalidated when their data changes). Returns None (and warns the user) if the
+		# data needed by the mode was not created yet
 		if mode == 'Raw':
 			# Checks if samples are imported
 			if not self.spec.samples['Count']:
-				self.gui.guimsg(
-					'Error', 'You have to import samples <b style="color: red">before</b> performing components scan!', 'w'
-				)
-				ok = False
-			else:
-				# Raw mode: the attribute matrix is the full spectra
-				counts = (
-					self.spec.intensities['Outliers']
-					if self.spec.intensities['Outliers'].size > 1
-					else self.spec.intensities['Raw']
-				)
-				# Now, we need the mean matrix
-				meanmatrix = zeros((self.spec.wavelength['Raw'].size, self.spec.samples['Count']))
-				for i, c in enumerate(counts):
-					meanmatrix[:, i] = c.mean(1)
-				# Finally, the attribute matrix is transposed
-				attribute_matrix = meanmatrix.T
+				self.gui.guimsg('Error', 'You have to import samples <b style="color: red">before</b> using this feature!', 'w')
+				return None
+			# Raw mode: mean spectra (outliers removed, if done)
+			data = (
+				self.spec.intensities['Outliers']
+				if self.spec.intensities['Outliers'].size > 1
+				else self.spec.intensities['Raw']
+			)
 		elif mode == 'Isolated':
 			# Checks if isolation were made
 			if not self.spec.isolated['Count']:
 				self.gui.guimsg(
 					'Error', 'Please perform peak isolation <b style="color: red">before</b> using this feature.', 'w'
 				)
-				ok = False
-			else:
-				# Isolated mode: the attribute matrix is the concatenation of all isolated peaks
-				isolations = [iw.size for iw in self.spec.wavelength['Isolated']]
-				# In isolated mode (different as in raw), the attribute matrix is created in the needed format,
-				# with rows = samples, and columns =  attributes (counts for each isolated and averaged peak)
-				iso_mean, iso_start = (zeros((self.spec.samples['Count'], sum(isolations))), 0)
-				# With iso_mean created, we need now to add values to it
-				for iso in self.spec.intensities['Isolated']:
-					for j, sample in enumerate(iso):
-						sample_mean = sample.mean(1)
-						iso_mean[j, iso_start : iso_start + sample_mean.size] = sample_mean
-					iso_start = sample_mean.shape[0]
-				# Defines matrix as input for next part
-				attribute_matrix = iso_mean
-		elif mode == 'Areas':
-			# Checks if peak fitting was made
-			if self.spec.fit['Shape'] is self.spec.base:
-				self.gui.guimsg(
-					'Error', 'Please perform peak fitting <b style="color: red">before</b> using this feature.', 'w'
-				)
-				ok = False
-			else:
-				# Area mode: the attribute matrix is the column concatenation of all areas
-				area_matrix = zeros((self.spec.samples['Count'], 1))
-				for a in self.spec.fit['Area']:
-					# self.spec.fit['Height']
-					area_matrix = column_stack((area_matrix, a))
-				# Finally, the attribute matrix is the area_matrix except for column 0
-				attribute_matrix = area_matrix[:, 1:]
+				return None
+			# Isolated mode: concatenation of all isolated (and averaged) peaks
+			data = self.spec.intensities['Isolated']
 		else:
-			# Checks if peak fitting was made (same for areas)
+			# Checks if peak fitting was made (for areas and heights)
 			if self.spec.fit['Shape'] is self.spec.base:
 				self.gui.guimsg(
 					'Error', 'Please perform peak fitting <b style="color: red">before</b> using this feature.', 'w'
 				)
-				ok = False
+				return None
+			# Area/Height mode: concatenation of all areas (or heights)
+			data = self.spec.fit['Area' if mode == 'Areas' else 'Height']
+		if mode not in self.spec.attributes:
+			self.spec.attributes[mode] = attribute_matrix(mode, data)
+		return self.spec.attributes[mode]
+
+	def pca_perform_scan(self):
+		# Checks current operation mode
+		mode = ''
+		for rb in [self.gui.p5_pca_raw, self.gui.p5_pca_iso, self.gui.p5_pca_areas, self.gui.p5_pca_heights]:
+			if rb.isChecked():
+				mode = rb.text()
+				break
+		# Gets correct value for attributes, depending on mode
+		if mode == 'Raw' and self.gui.p5_pca_inc.isChecked() and self.spec.samples['Count']:
+			# Incremental mode: mean spectra are streamed by pca_incremental, from the source files if available
+			if self.spec.intensities['Outliers'].size > 1:
+				attributes = self.spec.intensities['Outliers']
+			elif self.spec.samples['Reading'] is not None and all(p.exists() for p in self.spec.samples['Path']):
+				attributes = SampleReader(self.spec.samples['Path'], self.spec.samples['Reading'], self.spec.samples['FSN'])
 			else:
-				# Height mode: the attribute matrix is the column concatenation of all heights
-				height_matrix = zeros((self.spec.samples['Count'], 1))
-				for h in self.spec.fit['Height']:
-					height_matrix = column_stack((height_matrix, h))
-				# Finally, the attribute matrix is the height_matrix except for column 0
-				attribute_matrix = height_matrix[:, 1:]
+				attributes = self.spec.intensities['Raw']
+		else:
+			attributes = self.attributematrix(mode)
 		# With the attribute matrix ready, we are ready for the components scan
-		if ok:
-			f_attributes, explained_variance, optimum_ncomp = pca_scan(attribute_matrix, self.gui.p5_pca_fs.isChecked())
+		if attributes is not None:
+			scan, cache = pca_scan, {}
+			if mode == 'Raw' and self.gui.p5_pca_inc.isChecked():
+				# Mapped attributes are kept in a private folder (saved environments reopen them), old ones are removed
+				self.mapped.mkdir(mode=0o700, parents=True, exist_ok=True)
+				checkpoint_prune(self.mapped, [])
+				handle, file = tempfile.mkstemp(prefix='attributes_', suffix='.dat', dir=self.mapped)
+				close(handle)
+				scan, cache = pca_incremental, {'cache': Path(file)}
+			f_attributes, explained_variance, optimum_ncomp, components, singular, mean, scaler = scan(
+				attributes, self.gui.p5_pca_fs.isChecked(), **cache
+			)
 			self.spec.pca['Attributes'] = f_attributes
 			self.spec.pca['ExpVar'] = explained_variance
 			self.spec.pca['OptComp'] = optimum_ncomp
+			self.spec.pca['Components'] = components
+			self.spec.pca['Singular'] = singular
+			self.spec.pca['Mean'] = mean
+			self.spec.pca['Scaler'] = scaler
 			self.spec.pca['Mode'] = mode
 			# With the results, updates elements in the gui and do the plot
 			self.gui.p5_pca_ncomps.setMaximum(len(explained_variance) - 1)
@@ -1186,7 +1480,9 @@ class LIBSSA2(QMainWindow):
 		if self.spec.pca['Mode'] is None:
 			self.gui.guimsg('Error', 'Please perform PCA scan <b style="color: red">before</b> using this feature.', 'w')
 		else:
-			transformed, loadings = pca_do(self.spec.pca['Attributes'], self.gui.p5_pca_ncomps.value())
+			transformed, loadings = pca_do(
+				self.spec.pca_attributes(), self.gui.p5_pca_ncomps.value(), self.spec.pca['Components'], self.spec.pca['Mean']
+			)
 			self.spec.pca['Transformed'] = transformed
 			self.spec.pca['Loadings'] = loadings
 			# Updates PLS values
@@ -1194,31 +1490,172 @@ class LIBSSA2(QMainWindow):
 			self.spec.pls['Att'] = (
 				f'{self.spec.pca["Mode"][0]}-{self.spec.pls["NComps"]}PC{"-FS" if self.gui.p5_pca_fs.isChecked() else ""}'
 			)
-			self.gui.p5_pls_cal_att.setText(self.spec.pls['Att'])
-			self.gui.p5_pls_cal_att.setStyleSheet('color:#000080; font-weight: bold;')
-			self.gui.p5_pls_cal_start.setEnabled(True)
+			self.spec.pls['Attributes'] = transformed
+			self.spec.pls['Selection'] = self.spec.base
+			self.spec.pls['Intervals'] = self.spec.base
+			self.plsattributes(self.spec.pls['NComps'])
 			self.gui.g_selector.setCurrentIndex(6)
 			self.gui.g_current_sb.setValue(2)
 			self.setgrange()
 
+	def plsattributes(self, lvs: int):
+		# Updates PLS elements in gui for a new attribute matrix (from PCA or iPLS)
+		self.spec.pls['Sweep'] = self.spec.base
+		self.gui.p5_pls_cal_att.setText(self.spec.pls['Att'])
+		self.gui.p5_pls_cal_att.setStyleSheet('color:#000080; font-weight: bold;')
+		self.gui.p5_pls_lvs.setRange(1, self.spec.pls['NComps'])
+		self.gui.p5_pls_lvs.setValue(lvs)
+		self.gui.p5_pls_lvs.setEnabled(True)
+		self.gui.p5_pls_sweep.setEnabled(True)
+		self.gui.p5_pls_cal_start.setEnabled(True)
+
+	def ipls_do(self):
+		# Inner function to receive result from worker
+		def result(returned):
+			table, mask, rmsecv, lvs = returned
+			self.gui.p5_pls_ipls.setEnabled(True)
+			print('Timestamp:', time(), 'MSG: iPLS count timer: %.2f seconds. ' % (time() - self.timer))
+			# Selected wavelengths are cached, and only them are used as attributes for PLS
+			self.spec.pls['Intervals'] = table
+			self.spec.pls['Selection'] = mask
+			self.spec.pls['Attributes'] = attributes[:, mask]
+			self.spec.pls['NComps'] = min(int(mask.sum()), PLS_COMPONENTS)
+			self.spec.pls['Att'] = f'R-iPLS-{mask.sum()}W{"-FS" if self.gui.p5_pca_fs.isChecked() else ""}'
+			self.plsattributes(lvs)
+			rows = ''.join(
+				f'<tr><td>{r.Step}</td><td>{r.Lower:.2f}-{r.Upper:.2f}</td><td>{r.RMSECV:.4g}</td></tr>'
+				for r in table[table['Step'] > 0].sort_values('Step').itertuples()
+			)
+			self.gui.guimsg(
+				'Interval PLS',
+				f'<b>{mask.sum()}</b> wavelengths selected (RMSECV: <b>{rmsecv:.4g}</b> with <b>{lvs}</b> LVs).'
+				'<table><tr><th>Step</th><th>Interval (nm)</th><th>RMSECV</th></tr>'
+				f'{rows}</table>',
+				'i',
+			)
+
+		# Inner function to receive errors from worker
+		def errors(runerror):
+			self.gui.p5_pls_ipls.setEnabled(True)
+			changestatus(self.gui.sb, 'Could not select wavelengths by iPLS.', 'r', 0)
+			print('Timestamp:', time(), 'ERROR: iPLS failed. Timer: %.2f seconds.' % (time() - self.timer))
+			self.gui.guimsg(
+				'Error',
+				f'Could not select wavelengths by iPLS.<p>Error type: <b><i><u>{runerror[0]}</u></i></b></p>'
+				f'<p>Error message: <b style="color: red">{runerror[1]}</b>.</p>',
+				'c',
+			)
+
+		if not self.spec.samples['Count'] or self.spec.ref.columns[0] == 'Empty':
+			self.gui.guimsg(
+				'Warning',
+				'You must <i>load samples</i> <b>and</b> <i>references</i> <b style="color:red">before</b> using this feature.',
+				'w',
+			)
+		else:
+			attributes = self.attributematrix('Raw')
+			intervals = min(self.gui.p5_pls_intervals.value(), attributes.shape[1])
+			changestatus(self.gui.sb, 'Please Wait. Selecting wavelengths by iPLS...', 'p', 1)
+			self.gui.dynamicbox('Interval PLS', '<b>Please wait</b>. This may take a while...', intervals)
+			self.gui.p5_pls_ipls.setEnabled(False)
+			worker = Worker(
+				ipls,
+				attributes,
+				self.spec.ref[self.gui.p5_pls_cal_ref.currentText()],
+				self.spec.wavelength['Raw'],
+				intervals=intervals,
+				n_comp=PLS_COMPONENTS,
+				scale=self.gui.p5_pca_fs.isChecked(),
+				vip=self.gui.p5_pls_vip.value(),
+				jobs=self.gui.p3_cores.value(),
+			)
+			worker.signals.progress.connect(self.gui.updatedynamicbox)
+			worker.signals.finished.connect(lambda: self.gui.updatedynamicbox(val=0, update=False, msg='iPLS finished'))
+			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
+			self.configthread()
+			self.timer = time()
+			self.threadpool.start(worker)
+
+	def pls_sweep(self):
+		# Inner function to receive result from worker
+		def result(sweep):
+			self.gui.p5_pls_sweep.setEnabled(True)
+			print('Timestamp:', time(), 'MSG: PLS sweep count timer: %.2f seconds. ' % (time() - self.timer))
+			sweep.attrs['Element'] = element
+			self.spec.pls['Sweep'] = sweep
+			# Selects the number of latent variables with lowest RMSECV
+			self.gui.p5_pls_lvs.setValue(int(sweep['RMSECV'].idxmin()))
+			# Goes straight to the sweep plot (calibration may not be done yet)
+			self.gui.g_selector.setCurrentIndex(7)
+			self.gui.g_current_sb.blockSignals(True)
+			self.gui.g_current_sb.setMaximum(3)
+			self.gui.g_current_sb.setValue(3)
+			self.gui.g_current_sb.blockSignals(False)
+			self.setgrange()
+
+		# Inner function to receive errors from worker
+		def errors(runerror):
+			self.gui.p5_pls_sweep.setEnabled(True)
+			changestatus(self.gui.sb, 'Could not cross validate PLS models.', 'r', 0)
+			print('Timestamp:', time(), 'ERROR: PLS sweep failed. Timer: %.2f seconds.' % (time() - self.timer))
+			self.gui.guimsg(
+				'Error',
+				f'Could not cross validate PLS models.<p>Error type: <b><i><u>{runerror[0]}</u></i></b></p>'
+				f'<p>Error message: <b style="color: red">{runerror[1]}</b>.</p>',
+				'c',
+			)
+
+		if self.spec.pls['Attributes'] is self.spec.base or self.spec.ref.columns[0] == 'Empty':
+			self.gui.guimsg(
+				'Warning',
+				'You must <i>load references</i> <b>and</b> <i>create attributes from PCA or iPLS</i> <b style="color:red">before</b> using this feature.',
+				'w',
+			)
+		else:
+			# Every number of latent variables (up to the number of attributes) is cross-validated
+			element = self.gui.p5_pls_cal_ref.currentText()
+			folds = 5 * self.gui.p5_pls_repeats.value()
+			changestatus(self.gui.sb, 'Please Wait. Cross validating PLS models...', 'p', 1)
+			self.gui.dynamicbox('PLS sweep', '<b>Please wait</b>. This may take a while...', folds)
+			self.gui.p5_pls_sweep.setEnabled(False)
+			worker = Worker(
+				pls_sweep,
+				self.spec.pls['Attributes'],
+				self.spec.ref[element],
+				self.spec.pls['NComps'],
+				self.gui.p5_pca_fs.isChecked(),
+				repeats=self.gui.p5_pls_repeats.value(),
+				jobs=self.gui.p3_cores.value(),
+			)
+			worker.signals.progress.connect(self.gui.updatedynamicbox)
+			worker.signals.finished.connect(lambda: self.gui.updatedynamicbox(val=0, update=False, msg='PLS sweep finished'))
+			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
+			self.configthread()
+			self.timer = time()
+			self.threadpool.start(worker)
+
 	def pls_do(self):
-		if self.spec.pca['Transformed'] is self.spec.base or self.spec.ref.columns[0] == 'Empty':
+		if self.spec.pls['Attributes'] is self.spec.base or self.spec.ref.columns[0] == 'Empty':
 			self.gui.guimsg(
 				'Warning',
-				'You must <i>load references</i> <b>and</b> <i>create attributes from PCA</i> <b style="color:red">before</b> using this feature.',
+				'You must <i>load references</i> <b>and</b> <i>create attributes from PCA or iPLS</i> <b style="color:red">before</b> using this feature.',
 				'w',
 			)
 		else:
 			# This means all attributes are fine.
 			# Now, we must send to PLSR algorithm the reference,
-			# number of components and attribute matrix (created in PCA part)
+			# number of components and attribute matrix (created in PCA or iPLS parts)
 			returned = pls_do(
-				self.spec.pca['Transformed'],
+				self.spec.pls['Attributes'],
 				self.spec.ref[self.gui.p5_pls_cal_ref.currentText()],
-				self.spec.pls['NComps'],
+				self.gui.p5_pls_lvs.value(),
 				self.gui.p5_pca_fs.isChecked(),
+				repeats=self.gui.p5_pls_repeats.value(),
+				jobs=self.gui.p3_cores.value(),
 			)
-			# pls, reference, predicted, residual, predict_r2, predict_rmse, cv_pred, cv_r2, cv_rmse
+			# pls, reference, predicted, residual, predict_r2, predict_rmse, cv_pred, cv_r2, cv_rmse, cv_folds
 			self.spec.pls['Element'] = self.gui.p5_pls_cal_ref.currentText()
 			self.spec.pls['Samples'] = self.spec.samples['Name']
 			self.spec.pls['Model'] = returned[0]
@@ -1230,6 +1667,8 @@ class LIBSSA2(QMainWindow):
 			self.spec.pls['CrossValPredict'] = returned[6]
 			self.spec.pls['CrossValR2'] = returned[7]
 			self.spec.pls['CrossValRMSE'] = returned[8]
+			self.spec.pls['CrossValFolds'] = returned[9]
+			self.spec.pls['Bundle'] = self.spec.base
 			# Update graph elements
 			self.gui.p5_pls_pred_model.setText(self.gui.p5_pls_cal_ref.currentText())
 			self.gui.p5_pls_pred_model.setStyleSheet('color:#000080; font-weight: bold;')
@@ -1241,24 +1680,86 @@ class LIBSSA2(QMainWindow):
 			self.setgrange()
 
 	def pls_predict(self):
-		if self.spec.pca['Transformed'] is self.spec.base:
-			self.gui.guimsg(
-				'Warning', 'You must <i>create attributes from PCA</i> <b style="color:red">before</b> using this feature.', 'w'
-			)
+		blind_predict = None
+		if self.spec.pls['Bundle'] is not self.spec.base:
+			# Model bundle: attributes are built from the loaded spectra, in the mode of the model
+			bundle = self.spec.pls['Bundle']
+			attributes = self.attributematrix(bundle['Mode'])
+			if attributes is None:
+				pass
+			elif bundle['Mode'] == 'Raw' and not array_equal(self.spec.wavelength['Raw'], bundle['Wavelength']):
+				self.gui.guimsg('Error', 'Wavelengths of loaded spectra are different from the model bundle ones.', 'w')
+			else:
+				try:
+					blind_predict = bundle_predict(bundle, attributes)
+				except ValueError as ex:
+					self.gui.guimsg(
+						'Error', f'Could not predict values.<p>Error message: <b style="color: red">{str(ex)}</b>.</p>', 'c'
+					)
 		else:
-			# This means all attributes are fine.
-			# Now, we just need to predict values usind attributes
-			blind_predict = self.spec.pls['Model'].predict(self.spec.pca['Transformed'])
+			# Calibrated model: attributes are built from the loaded spectra, as the calibration ones
+			# (wavelengths selected by iPLS, or the PCA scores of the loaded spectra)
+			if self.spec.pls['Selection'] is not self.spec.base:
+				attributes = self.attributematrix('Raw')
+				if attributes is not None and attributes.shape[1] != self.spec.pls['Selection'].size:
+					self.gui.guimsg('Error', 'Wavelengths of loaded spectra are different from the model ones.', 'w')
+					attributes = None
+				elif attributes is not None:
+					attributes = attributes[:, self.spec.pls['Selection']]
+			elif self.spec.pca['Transformed'] is not self.spec.base:
+				attributes = self.spec.pca['Transformed']
+			else:
+				attributes = None
+				self.gui.guimsg(
+					'Warning',
+					'You must <i>create attributes from PCA or iPLS</i> <b style="color:red">before</b> using this feature.',
+					'w',
+				)
+			if attributes is not None:
+				try:
+					blind_predict = self.spec.pls['Model'].predict(attributes)
+				except ValueError as ex:
+					self.gui.guimsg(
+						'Error', f'Could not predict values.<p>Error message: <b style="color: red">{str(ex)}</b>.</p>', 'c'
+					)
+		if blind_predict is not None:
 			self.spec.pls['BlindPredict'] = blind_predict
-			# Update graph elements
+			# Update graph elements (goes straight to the blind plot, model may come from a bundle)
 			self.gui.g_selector.setCurrentIndex(7)
+			self.gui.g_current_sb.blockSignals(True)
+			self.gui.g_current_sb.setMaximum(2)
 			self.gui.g_current_sb.setValue(2)
+			self.gui.g_current_sb.blockSignals(False)
 			self.setgrange()
 
 	#
 	# Methods for page 6 == Temperature/Electron Density
 	#
 	def calc_t_ne(self):
+		# Inner function to receive result from worker
+		def result(returned):
+			self.gui.p6_start.setEnabled(True)
+			print('Timestamp:', time(), 'MSG: T/Ne count timer: %.2f seconds. ' % (time() - self.timer))
+			# Saves result
+			self.spec.plasma['En'] = returned[0]
+			self.spec.plasma['Ln'] = returned[1]
+			self.spec.plasma['Fit'] = returned[2]
+			self.spec.plasma['Report'] = returned[3]
+			# Update elements and call plot
+			self.gui.g_selector.setCurrentIndex(8)
+			self.setgrange()
+
+		# Inner function to handle errors
+		def errors(runerror):
+			self.gui.p6_start.setEnabled(True)
+			changestatus(self.gui.sb, 'Could not calculate T/Ne', 'r', 0)
+			self.gui.guimsg(
+				'Error',
+				f'Could not calculate T/Ne.<p>Error type: <b><i><u>{runerror[0]}</u></i></b></p>'
+				f'<p>Error message: <b style="color: red">{runerror[1]}</b>.</p>',
+				'c',
+			)
+
 		try:
 			# Saves table data into Spectra object (for load/save)
 			element = self.gui.p6_element.currentText()
@@ -1284,23 +1785,36 @@ class LIBSSA2(QMainWindow):
 				if (df_element[col] == '0').any():
 					raise AttributeError(f'Illegal value (zero) found in {col} column')
 			# If all passed, now we can actually perform the calculations
-			result = tne_do(
-				self.spec.samples['Name'], array(self.spec.fit[parameter]).T.squeeze(), df_element, self.gui.p6_ion.text()
-			)
+			# Only areas have deviations (from area 1st fits) for Monte Carlo
+			param_std = array(self.spec.fit['AreaSTD']).T.squeeze() if parameter == 'Area' else None
 		except Exception as ex:
 			self.gui.guimsg(
 				'Error', f'Could not calculate T/Ne.<p>' f'Error message: <b style="color: red">{str(ex)}</b>.</p>', 'c'
 			)
 			print_exc()
 		else:
-			# Saves result
-			self.spec.plasma['En'] = result[0]
-			self.spec.plasma['Ln'] = result[1]
-			self.spec.plasma['Fit'] = result[2]
-			self.spec.plasma['Report'] = result[3]
-			# Update elements and call plot
-			self.gui.g_selector.setCurrentIndex(8)
-			self.setgrange()
+			# Monte Carlo may take a while, so calculations are done in background
+			changestatus(self.gui.sb, 'Please Wait. Calculating T/Ne...', 'p', 1)
+			self.gui.dynamicbox('Plasma T/Ne', '<b>Please wait</b>. This may take a while...', self.spec.samples['Count'])
+			self.gui.p6_start.setEnabled(False)
+			worker = Worker(
+				tne_do,
+				self.spec.samples['Name'],
+				array(self.spec.fit[parameter]).T.squeeze(),
+				df_element,
+				self.gui.p6_ion.text(),
+				param_std=param_std,
+				draws=self.gui.p6_draws.value(),
+				gak_unc=self.gui.p6_gak_unc.value() / 100,
+				jobs=self.gui.p3_cores.value(),
+			)
+			worker.signals.progress.connect(self.gui.updatedynamicbox)
+			worker.signals.finished.connect(lambda: self.gui.updatedynamicbox(val=0, update=False, msg='T/Ne finished'))
+			worker.signals.result.connect(result)
+			worker.signals.error.connect(errors)
+			self.configthread()
+			self.timer = time()
+			self.threadpool.start(worker)
 
 
 def spawn_gui():
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from libssa.env.export import (
+	PYARROW,
+	save_sheets,
+	saved_files,
+	save_columnar,
+	export_fit_areas,
+	export_fit_peaks,
+	export_iso_peaks,
+)
+from libssa.env.imports import load_tables
+from libssa.env.spectra import Worker, Spectra
+from libssa.env.functions import fitpeaks
+
+# Global test variables
+SAMPLES = ('A', 'B', 'C')
+SHOOTS = 4
+POINTS = 60
+
+
+# Qt Signal mock class
+class SignalMock:
+	def emit(self, value: int): ...
+
+
+# Basic mock functions
+def spectra_mock() -> Spectra:
+	rng = np.random.default_rng(7)
+	spectra = Spectra()
+	wavelength = np.linspace(400, 402, POINTS)
+	counts = np.array([np.array([None] * len(SAMPLES))], dtype=object)
+	for j in range(len(SAMPLES)):
+		peak = 100 * (j + 1) / (1 + 4 * ((wavelength - 401) / 0.2) ** 2)
+		counts[0][j] = peak.reshape(-1, 1) + rng.normal(0, 1, (POINTS, SHOOTS))
+	iso_wavelengths = np.array([None], dtype=object)
+	iso_wavelengths[0] = wavelength
+	isolated = {
+		'Count': 1,
+		'NSamples': len(SAMPLES),
+		'Element': np.array(['Mock'], dtype=object),
+		'Center': np.array([[401.0]], dtype=object),
+		'Lower': np.array([400.0]),
+		'Upper': np.array([402.0]),
+	}
+	fit = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock())
+	spectra.samples.update({'Count': len(SAMPLES), 'Name': list(SAMPLES)})
+	spectra.isolated.update(isolated)
+	spectra.wavelength['Isolated'] = iso_wavelengths
+	spectra.intensities['Isolated'] = counts
+	for key, value in zip(('NFev', 'Convergence', 'Data', 'Total', 'Height', 'Width', 'Area', 'AreaSTD'), fit):
+		spectra.fit[key] = value
+	spectra.fit['Shape'] = fit[8]
+	return spectra
+
+
+# Main tests
+def test_export_tables_npz():
+	spectra = spectra_mock()
+	with TemporaryDirectory() as temp:
+		folder = Path(temp)
+		# Isolated peaks: a single tidy table, with one row per sample, wavelength and shoot
+		export_iso_peaks(folder / 'iso.npz', spectra)
+		isolated = load_tables(folder / 'iso.npz')['Isolated']
+		assert list(isolated.columns) == ['Element', 'Sample', 'Wavelength', 'Shoot', 'Counts']
+		assert len(isolated) == len(SAMPLES) * POINTS * SHOOTS
+		sample = isolated[isolated['Sample'] == 'B'].pivot(index='Wavelength', columns='Shoot', values='Counts')
+		assert np.allclose(sample.to_numpy(), spectra.intensities['Isolated'][0][1])
+		# Fitted peaks: observed and fitted curves, with same values of the spreadsheet
+		export_fit_peaks(folder / 'fit.npz', spectra)
+		export_fit_peaks(folder / 'fit.xlsx', spectra)
+		tables = load_tables(folder / 'fit.npz')
+		sheets = pd.read_excel(folder / 'fit.xlsx', sheet_name=None, index_col=0)
+		observed = tables['Observed'].pivot(index='Wavelength', columns='Sample', values='Data')
+		assert np.allclose(observed.to_numpy(), sheets['Mock_Observed'].to_numpy())
+		fitted = tables['Fit'][tables['Fit']['Curve'] == 1].pivot(index='Wavelength', columns='Sample', values='Fit')
+		assert np.allclose(fitted.to_numpy(), sheets['Mock_Peak-Fitting'].filter(like='_Fit_1').to_numpy())
+		# Report tables keep their index as the first column
+		export_fit_areas(folder / 'areas.npz', spectra)
+		report = load_tables(folder / 'areas.npz')['Mock_Lorentzian']
+		assert report['Samples'].tolist() == list(SAMPLES)
+		assert np.allclose(report['Area_Peak_1'], spectra.fit['Area'][0][:, 0])
+
+
+def test_save_sheets():
+	df = pd.DataFrame({'Name': ['x', None], 'Value': [1.0, None]}, index=pd.Index(['a', 'b'], name='Key'))
+	with TemporaryDirectory() as temp:
+		file = Path(temp) / 'tables.npz'
+		save_sheets(file, {'Table': (df, True)})
+		table = load_tables(file)['Table']
+		assert table['Key'].tolist() == ['a', 'b'] and table['Name'].tolist() == ['x', '']
+		assert np.isnan(table['Value'][1]) and saved_files(file) == [file]
+		# Missing values (NaN, None and NA) are saved as empty cells in spreadsheets
+		df['Count'] = pd.array([1, None], dtype='Int64')
+		save_sheets(file.with_suffix('.xlsx'), {'Table': (df, True)})
+		rows = list(load_workbook(file.with_suffix('.xlsx')).worksheets[0].values)
+		assert rows[1] == ('a', 'x', 1.0, 1) and rows[2] == ('b', None, None, None)
+		# Parquet/Feather are only available with pyarrow
+		if not PYARROW:
+			with pytest.raises(ValueError):
+				save_sheets(file.with_suffix('.parquet'), {'Table': (df, True)})
+
+
+def test_save_columnar_pyarrow():
+	pytest.importorskip('pyarrow')
+	df = pd.DataFrame({'Name': ['x', None], 'Value': [1.0, None]})
+	with TemporaryDirectory() as temp:
+		for suffix in ('.parquet', '.feather'):
+			# A single table is saved into the file itself, and many tables into one file each
+			single, many = Path(temp) / f'single{suffix}', Path(temp) / f'many{suffix}'
+			save_columnar(single, {'Table': df})
+			save_columnar(many, {'A': df, 'B': df.iloc[:1]})
+			assert saved_files(single) == [single]
+			assert [f.name for f in saved_files(many)] == [f'many_A{suffix}', f'many_B{suffix}']
+			tables = load_tables(many)
+			assert tables['A']['Name'].tolist() == ['x', None] and tables['B']['Value'].tolist() == [1.0]
+
+
+def test_export_tables_xlsx():
+	spectra = spectra_mock()
+	with TemporaryDirectory() as temp:
+		file = Path(temp) / 'iso.xlsx'
+		export_iso_peaks(file, spectra)
+		# One worksheet per element and sample, with columns resized from the header
+		sheets = pd.read_excel(file, sheet_name=None, index_col=0)
+		assert list(sheets) == [f'Mock_{s}' for s in SAMPLES]
+		assert np.allclose(sheets['Mock_C'].to_numpy(), spectra.intensities['Isolated'][0][2])
+		assert load_workbook(file).worksheets[0].column_dimensions['B'].width == 10
+		# Long labels are truncated to the Excel limit, and names that become equal get a numeric suffix
+		spectra.samples['Name'] = ['Sample_recorded_at_high_energy_01', 'Sample_recorded_at_high_energy_02', 'B:1']
+		export_iso_peaks(file, spectra)
+		sheets = pd.read_excel(file, sheet_name=None, index_col=0)
+		assert list(sheets) == ['Mock_Sample_recorded_at_high_en', 'Mock_Sample_recorded_at_high__2', 'Mock_B+1']
+		assert np.allclose(sheets['Mock_Sample_recorded_at_high__2'].to_numpy(), spectra.intensities['Isolated'][0][1])
+
+
+def test_export_worker():
+	spectra = spectra_mock()
+	snapshot = spectra.snapshot()
+	spectra.fit['Area'] = spectra.base
+	with TemporaryDirectory() as temp:
+		# Exports run as workers, with progress for each saved sheet (snapshot is not affected by changes)
+		saved, errors = [], []
+		worker = Worker(export_fit_peaks, Path(temp) / 'fit.xlsx', snapshot)
+		worker.signals.progress.connect(saved.append)
+		worker.signals.error.connect(errors.append)
+		worker.run()
+		assert saved == [1, 2, 3] and not errors
+		worker = Worker(export_fit_peaks, Path(temp) / 'fit.xlsx', spectra)
+		worker.signals.error.connect(errors.append)
+		worker.run()
+		assert errors[0][0] == 'AttributeError'
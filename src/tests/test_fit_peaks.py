@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+import os
+import pickle
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event
+
+import numpy as np
+import pytest
+
+from libssa.env.spectra import Spectra, FitCache
+from libssa.env.functions import (
+	AUTO_SHAPES,
+	STATS_COLUMNS,
+	fitpeaks,
+	fit_guess,
+	fit_bounds,
+	fit_select,
+	fit_starts,
+	fit_summary,
+	checkpoint_prune,
+)
+
+# Global test variables
+SAMPLES = 4
+SHOOTS = 3
+POINTS = 80
+LOWER = 400.0
+UPPER = 402.0
+CENTERS = [400.8, 401.3]
+HEIGHTS = [1000.0, 500.0]
+WIDTHS = [0.2, 0.3]
+
+
+# Qt Signal mock class
+class Signal: ...
+
+
+class SignalMock(Signal):
+	def __init__(self):
+		super().__init__()
+		self.signal = 0
+
+	def emit(self, value: int):
+		self.signal += value
+
+
+class CancelSignalMock(SignalMock):
+	def __init__(self, cancel: Event):
+		super().__init__()
+		self.cancel = cancel
+
+	def emit(self, value: int):
+		super().emit(value)
+		self.cancel.set()
+
+
+# Basic mock functions
+def lorentz_mock(x: np.ndarray, scale: float = 1.0):
+	y = np.zeros_like(x)
+	for h, w, c in zip(HEIGHTS, WIDTHS, CENTERS):
+		y += scale * h / (1 + 4 * ((x - c) / w) ** 2)
+	return y
+
+
+def isolated_mock():
+	rng = np.random.default_rng(42)
+	wavelength = np.linspace(LOWER, UPPER, POINTS)
+	counts = np.array([np.array([None] * SAMPLES)], dtype=object)
+	for j in range(SAMPLES):
+		counts[0][j] = lorentz_mock(wavelength, j + 1).reshape(-1, 1) + rng.normal(0, 1, (POINTS, SHOOTS))
+	iso_wavelengths = np.array([None], dtype=object)
+	iso_wavelengths[0] = wavelength
+	isolated = {
+		'Count': 1,
+		'NSamples': SAMPLES,
+		'Element': np.array(['Mock'], dtype=object),
+		'Center': np.array([[400.75, 401.35]], dtype=object),
+		'Lower': np.array([LOWER]),
+		'Upper': np.array([UPPER]),
+	}
+	return iso_wavelengths, counts, isolated
+
+
+# Main tests
+def test_fit_bounds():
+	x = np.linspace(LOWER, UPPER, POINTS)
+	for shape in ('Lorentzian', 'Asymmetric Lorentzian', 'Asym. Lorentzian [center fixed]', 'Voigt Profile [center fixed]'):
+		guess = fit_guess(x, lorentz_mock(x), 2, CENTERS, shape, 0.5)
+		lb, ub = fit_bounds(x, 2, LOWER, UPPER, shape)
+		assert len(lb) == len(ub) == len(guess)
+		assert np.all(np.array(lb) <= np.array(guess)) and np.all(np.array(guess) <= np.array(ub))
+
+
+def test_fitpeaks_bounded():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	for shape in ('Lorentzian', 'Asymmetric Lorentzian', 'Voigt Profile'):
+		result = fitpeaks(iso_wavelengths, counts, [shape], [0.5], isolated, True, SignalMock())
+		nfevs, convergences, heights, widths = result[0], result[1], result[4][0], result[5][0]
+		assert convergences.all()
+		assert (nfevs < 1000).all()
+		assert (heights >= 0).all() and (widths > 0).all()
+		if shape == 'Lorentzian':
+			expected = np.array([[(h * w * np.pi * (j + 1)) / 2 for h, w in zip(HEIGHTS, WIDTHS)] for j in range(SAMPLES)])
+			assert np.allclose(result[6][0], expected, rtol=0.02)
+
+
+def test_fitpeaks_cache():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	cache = FitCache()
+	first = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), cache=cache)
+	# Same inputs: results come from cache (no new fit is performed)
+	second = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), cache=cache)
+	assert len(cache) == 1
+	assert second[6][0] is first[6][0]
+	# Cached results are shared, so they can not be changed in place
+	assert not first[6][0].flags.writeable
+	# Changed shape: element is fitted again and stored as a new entry
+	third = fitpeaks(iso_wavelengths, counts, ['Gaussian'], [0.5], isolated, True, SignalMock(), cache=cache)
+	assert len(cache) == 2
+	assert third[6][0] is not first[6][0]
+	# Cache is bounded by size, evicting least recently used entries
+	small = FitCache(max_bytes=cache.nbytes // 2)
+	for key in list(cache.entries):
+		small.put(key, cache.get(key))
+	assert len(small) == 1 and small.nbytes <= cache.nbytes
+	# Keys change with the layout version of the results
+	key = FitCache.key(iso_wavelengths[0], counts[0])
+	FitCache.VERSION += 1
+	try:
+		assert FitCache.key(iso_wavelengths[0], counts[0]) != key
+	finally:
+		FitCache.VERSION -= 1
+	# Cache is saved with the environment (arrays shared with the fit results are saved once), so
+	# elements fitted before the environment was saved are not fitted again after it is loaded
+	spectra = Spectra()
+	spectra.fit.update({'Cache': cache, 'Area': third[6]})
+	loaded = pickle.loads(pickle.dumps(spectra))
+	assert len(loaded.fit['Cache']) == 2 and loaded.fit['Cache'].nbytes == cache.nbytes
+	refit = fitpeaks(iso_wavelengths, counts, ['Gaussian'], [0.5], isolated, True, SignalMock(), cache=loaded.fit['Cache'])
+	assert refit[6][0] is loaded.fit['Area'][0] and not refit[6][0].flags.writeable
+	assert len(loaded.fit['Cache']) == 2
+	# Environments saved by older versions (without newer attributes and keys) are loaded with defaults
+	spectra.samples['Count'] = 3
+	del spectra.attributes, spectra.samples['FSN'], spectra.fit['Cache'], spectra.pls['Bundle'], spectra.pca['Scaler']
+	loaded = pickle.loads(pickle.dumps(spectra))
+	assert loaded.attributes == {} and isinstance(loaded.fit['Cache'], FitCache) and loaded.pca['Scaler'] is None
+	assert loaded.samples['Count'] == 3 and loaded.samples['FSN'] == [None, None, None]
+	loaded.clear()
+	assert loaded.pls['Bundle'] is loaded.base and loaded.samples['Count'] == 0
+
+
+def test_fitpeaks_checkpoint():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	full = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock())
+	with TemporaryDirectory() as temp:
+		checkpoint, cancel = Path(temp), Event()
+		# Cancels right after the first chunk is fitted
+		with pytest.raises(InterruptedError):
+			fitpeaks(
+				iso_wavelengths,
+				counts,
+				['Lorentzian'],
+				[0.5],
+				isolated,
+				True,
+				CancelSignalMock(cancel),
+				checkpoint=checkpoint,
+				cancel=cancel,
+				chunk=2,
+			)
+		assert len(list(checkpoint.glob('*.npz'))) == 1
+		# Restarted job continues from checkpoint, and checkpoints are removed in the end
+		cancel.clear()
+		resumed = fitpeaks(
+			iso_wavelengths,
+			counts,
+			['Lorentzian'],
+			[0.5],
+			isolated,
+			True,
+			SignalMock(),
+			checkpoint=checkpoint,
+			cancel=cancel,
+			chunk=2,
+		)
+		assert not list(checkpoint.glob('*.npz'))
+		# Checkpoints left by other (unfinished) jobs are removed once they are old
+		stale, recent = checkpoint.joinpath('stale_0-2.npz'), checkpoint.joinpath('recent_0-2.npz')
+		stale.touch()
+		recent.touch()
+		os.utime(stale, (0, 0))
+		checkpoint_prune(checkpoint, [])
+		assert not stale.exists() and recent.exists()
+	assert np.allclose(full[6][0], resumed[6][0])
+
+
+def test_fitpeaks_multistart():
+	x = np.linspace(LOWER, UPPER, POINTS)
+	guess = fit_guess(x, lorentz_mock(x), 2, CENTERS, 'Lorentzian', 0.5)
+	bounds = fit_bounds(x, 2, LOWER, UPPER, 'Lorentzian')
+	starts = fit_starts(guess, bounds, 5)
+	assert len(starts) == 5 and np.allclose(starts[0], guess)
+	assert all(np.all(bounds[0] <= start) and np.all(start <= bounds[1]) for start in starts)
+	# Guesses clipped at the lower bound of unbounded parameters are still spread
+	lb, ub = np.array(bounds[0], dtype=float), np.array(bounds[1], dtype=float)
+	clipped = fit_starts(np.where(np.isinf(ub), lb, guess), bounds, 5)
+	assert all((start[np.isinf(ub)] > lb[np.isinf(ub)]).all() for start in clipped[1:])
+	# Starts are reproducible for the same seed (and change with it)
+	assert np.allclose(fit_starts(guess, bounds, 5, seed=7), fit_starts(guess, bounds, 5, seed=7))
+	assert not np.allclose(fit_starts(guess, bounds, 5, seed=7)[1:], starts[1:])
+	# Best of many starts is never worse than the single (heuristic) start
+	iso_wavelengths, counts, isolated = isolated_mock()
+	single = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock())
+	multi = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), starts=4)
+	parallel = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), starts=4, jobs=2)
+	assert (multi[0] > single[0]).all()
+	assert np.allclose(multi[6][0], single[6][0], rtol=1e-3)
+	assert np.allclose(multi[6][0], parallel[6][0])
+	# Area 1st sends every shoot to the pool (with all of its starts)
+	shoots = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, False, SignalMock(), starts=2, seed=3)
+	pooled = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, False, SignalMock(), starts=2, jobs=2, seed=3)
+	assert np.allclose(shoots[6][0], pooled[6][0]) and np.allclose(shoots[7][0], pooled[7][0])
+
+
+def test_fitpeaks_auto():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	cache = FitCache()
+	result = fitpeaks(iso_wavelengths, counts, ['Auto'], [0.5], isolated, True, SignalMock(), cache=cache)
+	# Mock peaks are Lorentzians, so the simplest shape that describes them must be selected
+	assert result[8][0] == 'Lorentzian'
+	assert len(cache) == 2
+	lorentzian = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), cache=cache)
+	assert lorentzian[6][0] is result[6][0]
+	# Criteria penalize the number of parameters
+	_, scores = fit_select(iso_wavelengths[0], counts[0], 0.5, [400.75, 401.35], LOWER, UPPER, [1e-7, 1e-7, 1e-7, 1000], 'AIC')
+	assert set(scores) == set(AUTO_SHAPES) and min(scores, key=scores.get) == 'Lorentzian'
+
+
+def test_fitpeaks_global():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	individual = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock())
+	for tie in ('Centers', 'Centers and widths'):
+		tied = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), tie=tie)
+		assert tied[1][0].all()
+		assert np.allclose(tied[6][0], individual[6][0], rtol=1e-3)
+	# Shared widths are the same for every sample
+	assert np.allclose(tied[5][0], tied[5][0][0])
+	# Area 1st fits every shoot, so areas also have a standard deviation
+	shoots = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, False, SignalMock(), tie='Centers')
+	assert shoots[6][0].shape == (SAMPLES, 2) and (shoots[7][0] > 0).all()
+	# A tie group of one sample follows the same area 1st policy of individual fits
+	one = {**isolated, 'NSamples': 1}
+	alone = fitpeaks(iso_wavelengths, counts[:, :1], ['Lorentzian'], [0.5], one, False, SignalMock(), tie='Centers')
+	untied = fitpeaks(iso_wavelengths, counts[:, :1], ['Lorentzian'], [0.5], one, False, SignalMock())
+	assert np.allclose(alone[6][0], untied[6][0], rtol=1e-3) and (untied[7][0] > 0).all()
+	# (its shoots still share the tied centers, so they deviate a bit less)
+	assert np.allclose(alone[7][0], untied[7][0], rtol=0.3)
+	assert np.allclose(untied[2][0][0][:, 0], counts[0][0].mean(axis=1))
+	# Asymmetry is shared only if asked
+	for tie_asymmetry in (True, False):
+		asym = fitpeaks(
+			iso_wavelengths,
+			counts,
+			['Asymmetric Lorentzian'],
+			[0.5],
+			isolated,
+			True,
+			SignalMock(),
+			tie='Centers',
+			tie_asymmetry=tie_asymmetry,
+		)
+		assert asym[1][0].all()
+	with TemporaryDirectory() as temp:
+		checkpoint, cancel = Path(temp), Event()
+		# Global solution is saved apart, and results of its samples are created in chunks (cancelled after the 1st)
+		with pytest.raises(InterruptedError):
+			fitpeaks(
+				iso_wavelengths,
+				counts,
+				['Lorentzian'],
+				[0.5],
+				isolated,
+				False,
+				CancelSignalMock(cancel),
+				checkpoint=checkpoint,
+				cancel=cancel,
+				chunk=3,
+				tie='Centers',
+			)
+		assert len(list(checkpoint.glob('*_global.npz'))) == 1 and len(list(checkpoint.glob('*-*.npz'))) == 1
+		cancel.clear()
+		resumed = fitpeaks(
+			iso_wavelengths,
+			counts,
+			['Lorentzian'],
+			[0.5],
+			isolated,
+			False,
+			SignalMock(),
+			checkpoint=checkpoint,
+			cancel=cancel,
+			chunk=3,
+			tie='Centers',
+		)
+		assert np.allclose(resumed[6][0], shoots[6][0]) and np.allclose(resumed[7][0], shoots[7][0])
+		assert not list(checkpoint.iterdir())
+		# Global fit is also cancelled while it is solved
+		cancel.set()
+		with pytest.raises(InterruptedError):
+			fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), cancel=cancel, tie='Centers')
+	with pytest.raises(ValueError):
+		fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, True, SignalMock(), tie='Heights')
+
+
+def test_fitpeaks_stats():
+	iso_wavelengths, counts, isolated = isolated_mock()
+	for mean1st in (True, False):
+		stats = fitpeaks(iso_wavelengths, counts, ['Lorentzian'], [0.5], isolated, mean1st, SignalMock())[9]
+		assert len(stats) == SAMPLES and set(STATS_COLUMNS).issubset(stats.columns)
+		assert (stats['Element'] == 'Mock').all() and (stats['Time'] > 0).all() and (stats['Status'] > 0).all()
+	stats.loc[0, ['Convergence', 'Status']] = False, 0
+	summary = fit_summary(stats, bins=3)
+	assert summary['Slowest'].loc[('Mock', 'Lorentzian'), 'Non_Converged'] == 1
+	assert len(summary['Failures']) == 1 and summary['NFev']['Fits'].sum() == SAMPLES
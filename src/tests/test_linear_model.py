@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold, LeaveOneOut, cross_val_predict
+
+from libssa.env.functions import linear_cv, linear_best, linear_model, linear_explorer, linear_bootstrap
+
+# Global test variables
+SAMPLES = 12
+ELEMENTS = np.array(['A', 'B', 'C'], dtype=object)
+
+
+# Qt Signal mock class
+class SignalMock:
+	def emit(self, value: int): ...
+
+
+# Basic mock functions
+def calibration_mock():
+	rng = np.random.default_rng(1)
+	reference = pd.Series(np.linspace(1, 10, SAMPLES), name='Cu')
+	values = (
+		rng.uniform(1, 2, (SAMPLES, 2)) + reference.to_numpy()[:, None],
+		rng.uniform(1, 3, (SAMPLES, 1)),
+		rng.uniform(1, 2, (SAMPLES, 3)),
+	)
+	noise = np.array([rng.uniform(0.1, 0.2, SAMPLES) for _ in ELEMENTS])
+	return reference, values, noise
+
+
+# Main tests
+def test_linear_model():
+	reference, values, noise = calibration_mock()
+	sigma = noise[0][reference == reference.min()].min()
+	for mode, columns in (('No Norm', 1), ('Peak Norm', 1), ('All Norm', 4), ('Equivalent Peak', 4)):
+		ref, predict, r2, rmse, slope, intercept, lod, loq, rmsecv, bootstrap = linear_model(
+			mode, reference, values, 'A', 1, 'C', 2, ELEMENTS, noise, 'Area'
+		)
+		assert ref[0] == 'Cu' and len(predict) == r2.size == lod.size == columns
+		# Every column is the same as a single (sklearn) linear regression
+		for k, (name, prediction) in enumerate(predict):
+			if mode == 'No Norm':
+				parameter = values[0][:, 1]
+			elif mode == 'Peak Norm':
+				parameter = values[0][:, 1] / values[2][:, 2]
+			else:
+				others = np.hstack(values[1:])[:, k]
+				parameter = (
+					values[0][:, 1] / others if mode == 'All Norm' else values[0][:, 1] * others / (values[0][:, 1] + others)
+				)
+			model = LinearRegression().fit(parameter.reshape(-1, 1), reference)
+			assert np.isclose(slope[k], model.coef_[0]) and np.isclose(intercept[k], model.intercept_)
+			assert np.isclose(r2[k], model.score(parameter.reshape(-1, 1), reference))
+			assert np.allclose(prediction, model.predict(parameter.reshape(-1, 1)))
+			assert np.isclose(rmse[k], np.sqrt(np.mean((reference - prediction) ** 2)))
+			# Analytical leave-one-out is the same as refitting without each sample
+			loo = cross_val_predict(LinearRegression(), parameter.reshape(-1, 1), reference, cv=LeaveOneOut())
+			assert np.isclose(rmsecv[k], np.sqrt(np.mean((reference - loo) ** 2)))
+			if mode == 'No Norm':
+				assert np.isclose(lod[k], 3.3 * sigma / np.polyfit(reference, parameter, 1)[0])
+		assert np.allclose(loq / lod, 10 / 3.3)
+
+
+def test_linear_explorer():
+	reference, values, noise = calibration_mock()
+	references = pd.DataFrame({'Cu': reference, 'Fe': 2 * reference.to_numpy()[::-1]})
+	explorer = linear_explorer(references, values, ELEMENTS, noise, 'Area', SignalMock(), top=10)
+	assert len(explorer) == 10 and explorer['Score'].is_monotonic_increasing
+	# A (with both peaks) follows Cu, so its models without normalization must be the best ones
+	assert set(explorer.loc[:1, 'Base']) == {'A_1', 'A_2'} and (explorer.loc[:1, 'Mode'] == 'No Norm').all()
+	# All models: 6 peaks x (1 + 4 or 5 normalization peaks x 2 modes) x 2 references
+	everything = linear_explorer(references, values, ELEMENTS, noise, 'Area', SignalMock(), top=1000, jobs=2)
+	assert len(everything) == 2 * (6 + 2 * (2 * 4 + 1 * 5 + 3 * 3))
+	assert everything.head(10).equals(explorer)
+	# Ranked models are loaded without fitting them again (same results of linear_model for the model column)
+	for rank in (0, 20):
+		model = everything.iloc[rank]
+		base, base_peak = model['Base'].rsplit('_', 1)
+		best = linear_best(everything, references, values, ELEMENTS, noise, 'Area', rank)
+		full = linear_model(
+			model['Mode'], references[model['Reference']], values, base, int(base_peak) - 1, '', 0, ELEMENTS, noise, 'Area'
+		)
+		column = [name for name, _ in full[1]].index(best[1][0][0])
+		assert np.allclose(best[1][0][1], full[1][column][1]) and np.isclose(best[2][0], full[2][column])
+		assert np.isclose(best[8][0], full[8][column]) and best[9].empty
+
+
+def test_linear_cv():
+	_, values, _ = calibration_mock()
+	parameters = np.hstack(values)
+	reference = np.linspace(1, 10, SAMPLES)
+	# k-fold of every column at once is the same as sklearn cross-validation column by column
+	rmsecv = linear_cv(parameters, reference, 4)
+	for k in range(parameters.shape[1]):
+		predict = cross_val_predict(
+			LinearRegression(), parameters[:, k : k + 1], reference, cv=KFold(4, shuffle=True, random_state=0)
+		)
+		assert np.isclose(rmsecv[k], np.sqrt(np.mean((reference - predict) ** 2)))
+	# As many folds as samples is leave-one-out
+	assert np.allclose(linear_cv(parameters, reference, SAMPLES), linear_cv(parameters, reference))
+	with pytest.raises(ValueError):
+		linear_cv(parameters, reference, -1)
+
+
+def test_linear_bootstrap(monkeypatch):
+	reference, values, noise = calibration_mock()
+	for mode in ('No Norm', 'All Norm', 'Equivalent Peak'):
+		linear = linear_model(mode, reference, values, 'A', 1, 'C', 2, ELEMENTS, noise, 'Area', boots=2000)
+		bootstrap = linear[9]
+		assert len(bootstrap) == len(linear[1]) and not bootstrap.isna().any().any()
+		# Intervals contain the point estimates
+		for k, key in enumerate(('Slope', 'Intercept', 'LoD', 'LoQ')):
+			point = linear[4 + k]
+			assert (bootstrap[f'{key}_P2.5'] <= point).all() and (point <= bootstrap[f'{key}_P97.5']).all()
+	# Batched (and parallel) resampling agrees with a single batch
+	parameters, y = values[0], reference.to_numpy()
+	pool = noise[0][:1].ravel()
+	single = linear_bootstrap(parameters, y, pool, None, 'No Norm', 1000)
+	monkeypatch.setattr('libssa.env.functions.MC_BATCH', parameters.size * 300)
+	done = []
+	progress = SignalMock()
+	progress.emit = done.append
+	batched = linear_bootstrap(parameters, y, pool, None, 'No Norm', 1000, jobs=2, progress=progress)
+	assert single.shape == batched.shape == (2, 8)
+	# Progress is emitted with the last draw of each batch
+	assert done == [299, 599, 899, 999]
+	assert np.allclose(single, batched, rtol=0.1)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+import pickle
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA
+from sklearn.model_selection import KFold, cross_val_score, cross_val_predict
+from sklearn.cross_decomposition import PLSRegression
+
+from libssa.env.export import export_bundle
+from libssa.env.imports import SampleReader, load_bundle
+from libssa.env.spectra import Spectra
+from libssa.env.functions import (
+	PCA_COMPONENTS,
+	ipls,
+	pca_do,
+	pls_do,
+	pls_vip,
+	pca_scan,
+	pls_sweep,
+	bundle_predict,
+	pca_incremental,
+	attribute_matrix,
+)
+
+# Global test variables
+SAMPLES = 15
+ATTRIBUTES = 200
+
+
+# Qt Signal mock class
+class SignalMock:
+	def __init__(self):
+		self.values = []
+
+	def emit(self, value: int):
+		self.values.append(value)
+
+
+# Basic mock functions
+def attributes_mock(samples: int = SAMPLES, attributes: int = ATTRIBUTES):
+	rng = np.random.default_rng(7)
+	latent = rng.normal(0, 1, (samples, 3)) * [10, 5, 2]
+	return latent @ rng.normal(0, 1, (3, attributes)) + rng.normal(0, 0.1, (samples, attributes)) + 50
+
+
+# Main tests
+def test_pca_scan_do():
+	attributes = attributes_mock()
+	for norm in (False, True):
+		f_attributes, explained_variance, optimum_ncomp, components, singular, mean, scaler = pca_scan(attributes, norm)
+		assert explained_variance.size == SAMPLES and optimum_ncomp <= 3
+		assert (scaler is not None) == norm
+		# Slicing the full decomposition is the same as fitting a PCA with fewer components
+		for n_comp in (1, 3, 5):
+			transformed, loadings = pca_do(f_attributes, n_comp, components, mean)
+			pca = PCA(n_comp, svd_solver='full').fit(f_attributes)
+			signs = np.sign((loadings * pca.components_.T).sum(axis=0))
+			assert np.allclose(loadings * signs, pca.components_.T)
+			assert np.allclose(transformed * signs, pca.transform(f_attributes))
+			assert np.allclose(np.linalg.norm(transformed, axis=0), singular[:n_comp])
+
+
+def test_pca_truncated():
+	attributes = attributes_mock(3 * PCA_COMPONENTS, 8 * PCA_COMPONENTS)
+	f_attributes, explained_variance, optimum_ncomp, components, singular, mean, _ = pca_scan(attributes)
+	# Only leading components are computed, but explained variance is relative to the total variance
+	full = PCA(svd_solver='full').fit(attributes)
+	assert components.shape == (PCA_COMPONENTS, attributes.shape[1]) and explained_variance.size == PCA_COMPONENTS
+	assert np.allclose(explained_variance[:3], np.cumsum(full.explained_variance_ratio_)[:3])
+	assert optimum_ncomp == np.sum(np.cumsum(full.explained_variance_ratio_) < 0.96)
+	transformed, loadings = pca_do(f_attributes, 3, components, mean)
+	signs = np.sign((loadings * full.components_[:3].T).sum(axis=0))
+	assert np.allclose(transformed * signs, full.transform(attributes)[:, :3], atol=1e-6 * singular[0])
+
+
+def test_pca_components():
+	# The 95% variance point needs more than PCA_COMPONENTS (80 latent variables of similar variance)
+	rng = np.random.default_rng(11)
+	samples, rank = 6 * PCA_COMPONENTS, int(1.6 * PCA_COMPONENTS)
+	latent = rng.normal(0, 1, (samples, rank)) * np.linspace(2, 1, rank)
+	attributes = latent @ rng.normal(0, 1, (rank, 8 * PCA_COMPONENTS)) + rng.normal(0, 0.01, (samples, 8 * PCA_COMPONENTS))
+	expected = np.sum(np.cumsum(PCA(svd_solver='full').fit(attributes).explained_variance_ratio_) < 0.96)
+	assert expected > PCA_COMPONENTS
+	f_attributes, explained_variance, optimum_ncomp, components, _, mean, _ = pca_scan(attributes)
+	assert PCA_COMPONENTS < components.shape[0] < samples and optimum_ncomp == expected
+	assert pca_do(f_attributes, optimum_ncomp, components, mean)[0].shape == (samples, optimum_ncomp)
+	# Incremental scans are also extended (from the mapped attributes)
+	counts = np.array([None] * samples, dtype=object)
+	for i, row in enumerate(attributes):
+		counts[i] = row[:, None].repeat(2, axis=1)
+	result = pca_incremental(counts, batch=60)
+	assert PCA_COMPONENTS < result[3].shape[0] < samples and abs(result[2] - expected) <= 1
+
+
+def test_pca_incremental():
+	attributes = attributes_mock(3 * PCA_COMPONENTS, 4 * PCA_COMPONENTS)
+	# Samples are stored as count matrices (one column per shoot), whose mean is the attribute row
+	rng = np.random.default_rng(3)
+	counts = np.array([None] * attributes.shape[0], dtype=object)
+	for i, row in enumerate(attributes):
+		shoots = rng.normal(0, 1, (row.size, 4))
+		counts[i] = row[:, None] + shoots - shoots.mean(1, keepdims=True)
+	for norm in (False, True):
+		full = pca_scan(attributes, norm)
+		with TemporaryDirectory() as temp:
+			cache = Path(temp) / 'attributes.dat'
+			result = pca_incremental(counts, norm, batch=60, cache=cache)
+			f_attributes, explained_variance, optimum_ncomp, components, singular, mean, scaler = result
+			assert isinstance(f_attributes, np.memmap) and cache.stat().st_size == attributes.nbytes
+			assert np.allclose(f_attributes, full[0])
+			if norm:
+				assert np.allclose(scaler.mean_, full[6].mean_) and np.allclose(scaler.scale_, full[6].scale_)
+			# Leading components are the same as the ones of the in-memory scan
+			assert np.allclose(explained_variance[:3], full[1][:3], rtol=1e-3) and optimum_ncomp == full[2]
+			transformed, loadings = pca_do(f_attributes, 3, components, mean)
+			expected = pca_do(full[0], 3, full[3], full[5])[0]
+			signs = np.sign((transformed * expected).sum(axis=0))
+			assert np.allclose(transformed * signs, expected, rtol=1e-3, atol=1e-3 * singular[0])
+			del f_attributes, result
+	# Counts can also be streamed from the source files, one batch at a time
+	with TemporaryDirectory() as temp:
+		paths = [Path(temp) / f'sample_{i:02d}.csv' for i in range(len(counts))]
+		for path, count in zip(paths, counts):
+			np.savetxt(path, np.column_stack((np.arange(len(count)), count)), delimiter=',', header='w,1,2,3,4', comments='')
+		reader = SampleReader(tuple(paths), ('Single', ',', 0, 1, 2, 12), [None, None, None])
+		assert len(reader) == len(counts) and np.allclose(reader[1], counts[1]) and len(reader[2:5]) == 3
+		result = pca_incremental(reader, True, batch=60)
+		assert np.allclose(result[0], pca_scan(attributes, True)[0])
+	# Mapped attributes are pickled with the environment by their file, and reopened when used
+	with TemporaryDirectory() as temp:
+		cache = Path(temp) / 'attributes.dat'
+		result = pca_incremental(counts, True, batch=60, cache=cache)
+		spectra = Spectra()
+		spectra.intensities.update({'Count': len(counts), 'Raw': counts})
+		spectra.pca.update({'Attributes': result[0], 'Scaler': result[6]})
+		assert spectra.__getstate__()['pca']['Attributes'] == {'Path': str(cache), 'Shape': attributes.shape}
+		assert isinstance(spectra.snapshot().pca['Attributes'], np.memmap)
+		saved = pickle.dumps(spectra)
+		loaded = pickle.loads(saved)
+		assert (
+			isinstance(loaded.pca['Attributes'], dict)
+			and pickle.loads(pickle.dumps(loaded)).pca['Attributes'] == loaded.pca['Attributes']
+		)
+		reopened = loaded.pca_attributes()
+		assert isinstance(reopened, np.memmap) and Path(reopened.filename) == cache and np.allclose(reopened, result[0])
+		del reopened, result, loaded
+	# If the file is gone, attributes are re-created from counts
+	loaded = pickle.loads(saved)
+	assert not isinstance(loaded.pca_attributes(), np.memmap)
+	assert np.allclose(loaded.pca['Attributes'], pca_scan(attributes, True)[0])
+
+
+def test_pls_do():
+	attributes = attributes_mock()
+	_, _, _, components, _, mean, _ = pca_scan(attributes)
+	scores = pca_do(attributes, 3, components, mean)[0]
+	reference = attributes[:, 0] + np.random.default_rng(2).normal(0, 0.5, SAMPLES)
+	result = pls_do(scores, reference, 2, False)
+	# Single pass cross validation is the same as the (two pass) sklearn functions (with shuffled folds)
+	pls, folds = PLSRegression(2, scale=False), KFold(5, shuffle=True, random_state=0)
+	assert np.allclose(result[6], cross_val_predict(pls, scores, reference.reshape(-1, 1), cv=folds))
+	assert np.isclose(result[7], cross_val_score(pls, scores, reference, scoring='r2', cv=folds).max())
+	assert np.isclose(result[8], np.std(reference.reshape(-1, 1) - result[6]))
+	assert len(result[9]) == 5 and (result[9]['R2'] == cross_val_score(pls, scores, reference, scoring='r2', cv=folds)).all()
+	# Repeated folds: every sample is predicted once for each repeat
+	repeated = pls_do(scores, reference, 2, False, repeats=3, jobs=2)
+	assert len(repeated[9]) == 15 and set(repeated[9]['Repeat']) == {1, 2, 3}
+	assert np.isclose(repeated[8], result[8], rtol=0.5)
+
+
+def test_pls_sweep():
+	attributes = attributes_mock()
+	reference = attributes[:, 0] + np.random.default_rng(2).normal(0, 0.5, SAMPLES)
+	for scale, repeats in ((False, 1), (True, 1), (True, 2)):
+		progress = SignalMock()
+		sweep = pls_sweep(attributes[:, :20], reference, 6, scale, repeats=repeats, progress=progress)
+		assert sweep.index.tolist() == list(range(1, 7)) and progress.values == list(range(5 * repeats))
+		# Each row is the same as the cross validation of a model with that number of components
+		for n_comp in (1, 3, 6):
+			expected = pls_do(attributes[:, :20], reference, n_comp, scale, repeats=repeats)
+			assert np.isclose(sweep.loc[n_comp, 'RMSECV'], expected[8])
+
+
+def test_ipls():
+	# Only wavelengths 120 to 129 follow the reference (a single peak over noise)
+	rng = np.random.default_rng(5)
+	reference = np.linspace(1, 10, 40)
+	wavelength = np.linspace(300, 320, 200)
+	attributes = rng.normal(0, 1, (40, 200))
+	attributes[:, 120:130] += reference[:, None] * np.hanning(10)
+	table, mask, rmsecv, lvs = ipls(attributes, reference, wavelength, SignalMock(), intervals=20, n_comp=4)
+	assert len(table) == 20 and table.loc[13, 'Step'] == 1
+	assert table.loc[13, 'Lower'] == wavelength[120] and table.loc[13, 'Upper'] == wavelength[129]
+	assert mask[120:130].all() and rmsecv <= table['RMSECV'].min()
+	# VIP scores are normalized (mean square is 1), and pruning keeps only important wavelengths
+	pls = PLSRegression(2).fit(attributes, reference)
+	assert np.isclose((pls_vip(pls) ** 2).mean(), 1)
+	pruned = ipls(attributes, reference, wavelength, SignalMock(), intervals=20, n_comp=4, vip=1.0, jobs=2)
+	assert pruned[0].equals(table) and pruned[1].sum() <= mask.sum() and pruned[2] <= rmsecv
+
+
+def test_bundle():
+	attributes = attributes_mock()
+	reference = attributes[:, 0] + np.random.default_rng(2).normal(0, 0.5, SAMPLES)
+	spectra = Spectra()
+	spectra.wavelength['Raw'] = np.linspace(200, 400, ATTRIBUTES)
+	spectra.samples['FSN'] = ['IS', 250.0, 251.0]
+	spectra.intensities['Criteria'] = ('SAM', 0.95)
+	# PCA attributes (with feature scaling)
+	f_attributes, _, _, components, _, mean, scaler = pca_scan(attributes, True)
+	scores = pca_do(f_attributes, 3, components, mean)[0]
+	spectra.pca.update({'Mode': 'Raw', 'Components': components, 'Mean': mean, 'Scaler': scaler})
+	# iPLS attributes (selected wavelengths)
+	selection = np.zeros(ATTRIBUTES, dtype=bool)
+	selection[20:60] = True
+	for pls_attributes, pls_selection in ((scores, spectra.base), (attributes[:, selection], selection)):
+		result = pls_do(pls_attributes, reference, 2, True)
+		spectra.pls.update({
+			'Element': 'Mock',
+			'Model': result[0],
+			'Reference': result[1],
+			'Attributes': pls_attributes,
+			'Selection': pls_selection,
+		})
+		with TemporaryDirectory() as temp:
+			file = Path(temp) / 'bundle.npz'
+			export_bundle(file, spectra)
+			bundle = load_bundle(file)
+		assert bundle['Mode'] == 'Raw' and bundle['FSN'] == 'IS' and bundle['Criteria'] == 0.95
+		# Bundle predictions (from attributes before any preprocessing) are the same as the model ones
+		assert np.allclose(bundle_predict(bundle, attributes), result[0].predict(pls_attributes).reshape(-1))
+	with pytest.raises(ValueError):
+		bundle_predict(bundle, attributes[:, :10])
+	# Clearing the samples keeps the model (and its selection), but not the calibration attributes
+	spectra.pls.update({'Sweep': pd.DataFrame({'RMSECV': [1.0]}), 'BlindPredict': result[2]})
+	spectra.clear()
+	assert spectra.pls['Model'] is result[0] and spectra.pls['Selection'] is selection
+	assert all(spectra.pls[k] is spectra.base for k in ('Attributes', 'Sweep', 'Intervals', 'BlindPredict', 'Bundle'))
+	spectra.pls['Model'] = spectra.base
+	spectra.clear()
+	assert spectra.pls['Selection'] is spectra.base
+
+
+def test_attribute_matrix():
+	rng = np.random.default_rng(9)
+	# Samples with different number of shoots (as after outliers removal)
+	counts = np.array([None] * SAMPLES, dtype=object)
+	for i in range(SAMPLES):
+		counts[i] = rng.normal(0, 1, (30, 2 + i % 3))
+	assert np.allclose(attribute_matrix('Raw', counts), np.stack([c.mean(1) for c in counts]))
+	# Isolated elements of different widths are placed side by side, at accumulated offsets
+	iso_counts = np.array([[c[i : i + w] for c in counts] for i, w in ((0, 5), (10, 8), (20, 3))], dtype=object)
+	expected = np.hstack([np.stack([s.mean(1) for s in iso]) for iso in iso_counts])
+	assert np.allclose(attribute_matrix('Isolated', iso_counts), expected)
+	areas = (rng.uniform(size=(SAMPLES, 2)), rng.uniform(size=(SAMPLES, 1)), rng.uniform(size=SAMPLES))
+	assert np.allclose(attribute_matrix('Areas', areas), np.column_stack(areas))
+	with pytest.raises(ValueError):
+		attribute_matrix('Pixels', areas)
+	# Cached matrices are removed when their data changes
+	spectra = Spectra()
+	spectra.attributes.update({'Raw': 1, 'Areas': 2, 'Heights': 3})
+	spectra.invalidate('Areas', 'Heights')
+	assert list(spectra.attributes) == ['Raw']
+	spectra.invalidate()
+	assert not spectra.attributes
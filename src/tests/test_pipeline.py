@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+from pandas import DataFrame
+
+import libssa.env.pipeline as pipeline_module
+from libssa.env.imports import load, outliers
+from libssa.env.spectra import Spectra
+from libssa.env.pipeline import Pipeline
+from libssa.env.functions import pca_do, pls_do, fitpeaks, isopeaks, pca_scan
+
+# Global test variables
+SAMPLES = 10
+SHOOTS = 3
+READING = ('Single', 'SPACE', 0, 1, 2, 4)
+TABLE = [['A400', '400.5', '401.5', '401.0'], ['B402', '402.0', '404.0', '402.8;403.2']]
+
+
+# Qt Signal mock class
+class SignalMock:
+	def emit(self, value: int): ...
+
+
+# Basic mock functions
+def spectra_mock(folder: Path) -> np.ndarray:
+	rng = np.random.default_rng(11)
+	wavelength = np.linspace(400, 405, 250)
+	reference = np.linspace(1, 10, SAMPLES)
+	for i, r in enumerate(reference):
+		lines = 100 * r / (1 + ((wavelength - 401) / 0.1) ** 2) + 50 * (11 - r) / (1 + ((wavelength - 402.8) / 0.1) ** 2)
+		lines += 40 * r / (1 + ((wavelength - 403.2) / 0.1) ** 2)
+		counts = lines[:, None] * rng.uniform(0.95, 1.05, SHOOTS) + rng.normal(0, 1, (wavelength.size, SHOOTS))
+		data = np.column_stack((wavelength, counts))
+		np.savetxt(folder / f'sample_{i:02d}.txt', data, header='Wavelength S1 S2 S3', comments='')
+	return reference
+
+
+def calibrated_mock(folder: Path, mode: str) -> tuple:
+	spectra = Spectra()
+	reference = spectra_mock(folder)
+	samples = tuple(sorted(folder.iterdir()))
+	fsn = ['Norm', None, None]
+	wavelength, counts = load(samples, *READING, fsn, SignalMock())
+	counts = outliers('SAM', 0.9, {'Count': SAMPLES, 'Raw': counts}, SignalMock())[0]
+	spectra.samples.update({'Count': SAMPLES, 'Reading': READING, 'FSN': fsn})
+	spectra.wavelength['Raw'] = wavelength
+	spectra.intensities['Criteria'] = ('SAM', 0.9)
+	if mode == 'Raw':
+		attributes = np.stack([c.mean(1) for c in counts])
+	else:
+		elements = [t[0] for t in TABLE]
+		lower, upper = [float(t[1]) for t in TABLE], [float(t[2]) for t in TABLE]
+		center = [[float(c) for c in t[3].split(';')] for t in TABLE]
+		iso_w, iso_c, elements, lower, upper, center, _ = isopeaks(
+			wavelength, counts, elements, lower, upper, center, True, False, SignalMock()
+		)
+		isolated = {'Count': 2, 'NSamples': SAMPLES, 'Element': elements, 'Center': center, 'Lower': lower, 'Upper': upper}
+		fit = fitpeaks(iso_w, iso_c, ['Lorentzian'] * 2, [0.5] * 2, isolated, True, SignalMock(), starts=3)
+		attributes = np.hstack(fit[6])
+		spectra.isolated.update({'Baseline': (True, False), 'Table': DataFrame(TABLE)})
+		spectra.fit.update({'Shape': fit[8], 'Asymmetry': [0.5] * 2, 'Mean1st': True, 'Starts': 3})
+	f_attributes, _, _, components, _, mean, scaler = pca_scan(attributes, True)
+	scores = pca_do(f_attributes, 3, components, mean)[0]
+	spectra.pca.update({'Mode': mode, 'Components': components, 'Mean': mean, 'Scaler': scaler})
+	result = pls_do(scores, reference, 2, False)
+	spectra.pls.update({'Element': 'Mock', 'Model': result[0], 'Reference': result[1], 'Attributes': scores})
+	return spectra, result[2].reshape(-1)
+
+
+# Main tests
+def test_pipeline(monkeypatch):
+	for mode in ('Raw', 'Areas'):
+		with TemporaryDirectory() as temp:
+			folder = Path(temp)
+			spectra, predicted = calibrated_mock(folder, mode)
+			pipeline = Pipeline.from_spectra(spectra)
+			# Scoring the calibration folder again gives the same predictions of the model
+			predictions = pipeline.predict(folder, jobs=2 if mode == 'Raw' else 1)
+			assert predictions.name == 'Mock' and predictions.index[0] == 'sample_00'
+			assert np.allclose(predictions.to_numpy(), predicted, rtol=1e-6)
+			with pytest.raises(ValueError):
+				Pipeline(pipeline.bundle, ('Multiple', *READING[1:])).samples(folder)
+			if mode == 'Areas':
+				# Fit settings of the calibration are used for new samples
+				calls = []
+				monkeypatch.setattr(pipeline_module, 'fitpeaks', lambda *a, **kw: calls.append(kw) or fitpeaks(*a, **kw))
+				pipeline.attributes(folder / 'sample_00.txt')
+				assert calls == [{'starts': 3, 'seed': 0, 'criterion': 'BIC', 'tie': None, 'tie_asymmetry': True}]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Kleydson Stenio (9257942+kstenio@users.noreply.github.com).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see <https://www.gnu.org/licenses/agpl-3.0.html>.
+
+
+# Imports
+import numpy as np
+from pandas import DataFrame
+from scipy.stats import linregress
+
+import libssa.env.functions as functions
+from libssa.env.functions import tne_do, tne_mc, linregress_rows
+
+# Global test variables
+SAMPLES = 50
+KB = 0.000086173303
+
+
+# Qt Signal mock class
+class SignalMock:
+	def __init__(self):
+		self.values = []
+
+	def emit(self, value: int):
+		self.values.append(value)
+
+
+# Basic mock functions
+def lines_mock():
+	return DataFrame({
+		'Element': ['Ti1', 'Ti1', 'Ti1', 'Ti2', 'Ti2'],
+		'Ionization': ['1', '1', '1', '2', '2'],
+		'gAk': ['3.1e8', '1.2e8', '5.5e7', '2.2e8', '9.8e7'],
+		'Ek': ['3.2', '4.1', '2.4', '4.3', '5.9'],
+	})
+
+
+def areas_mock(temperature: np.ndarray):
+	# Areas follow Boltzmann distribution (plus some noise)
+	rng = np.random.default_rng(7)
+	lines = lines_mock()
+	gak, ek = lines['gAk'].astype(float).to_numpy(), lines['Ek'].astype(float).to_numpy()
+	areas = gak * np.exp(-ek[None, :] / (KB * temperature[:, None]))
+	return areas * rng.normal(1, 0.02, areas.shape)
+
+
+# Main tests
+def test_linregress_rows():
+	rng = np.random.default_rng(3)
+	x, y = rng.normal(size=6), rng.normal(size=(SAMPLES, 6))
+	slope, intercept, r, sslope, sintercept = linregress_rows(x, y)
+	for i in range(SAMPLES):
+		reg = linregress(x, y[i])
+		assert np.allclose(
+			(slope[i], intercept[i], r[i], sslope[i], sintercept[i]),
+			(reg.slope, reg.intercept, reg.rvalue, reg.stderr, reg.intercept_stderr),
+		)
+	# Constant rows have no correlation (same as linregress)
+	assert linregress_rows(x, np.ones((1, 6)))[2][0] == 0
+
+
+def test_tne_do():
+	temperature = np.linspace(8000, 12000, SAMPLES)
+	samples = tuple(f'Sample_{i}' for i in range(SAMPLES))
+	x, y, fit, report = tne_do(samples, areas_mock(temperature), lines_mock(), '6.83 eV')
+	# 3 atomic x 2 ionic lines
+	assert x.shape == y.shape == fit.shape == (SAMPLES, 6)
+	assert list(report.index) == list(samples)
+	assert np.allclose(report['T'], temperature, rtol=0.1)
+	reg = linregress(x[0], y[0])
+	assert np.isclose(report['R'].iloc[0], reg.rvalue) and np.isclose(report['T'].iloc[0], -1 / (KB * reg.slope))
+
+
+def test_tne_monte_carlo(monkeypatch):
+	temperature = np.linspace(8000, 12000, SAMPLES)
+	samples = tuple(f'Sample_{i}' for i in range(SAMPLES))
+	areas = areas_mock(temperature)
+	report = tne_do(samples, areas, lines_mock(), '6.83 eV', param_std=0.05 * areas, draws=500, gak_unc=0.1)[3]
+	assert {'T_P2.5', 'T_P97.5', 'Ne_P2.5', 'Ne_P97.5'}.issubset(report.columns)
+	assert (report['T_P2.5'] < report['T']).all() and (report['T'] < report['T_P97.5']).all()
+	# Processes do not change the results, since each batch has its own seed
+	monkeypatch.setattr(functions, 'MC_BATCH', 500 * 6 * 10)
+	progress = SignalMock()
+	batched = tne_mc(samples, areas, 0.05 * areas, lines_mock(), '6.83 eV', draws=500)
+	parallel = tne_mc(samples, areas, 0.05 * areas, lines_mock(), '6.83 eV', draws=500, jobs=2, progress=progress)
+	assert np.allclose(batched, parallel) and np.allclose(batched['T_P2.5'], report['T_P2.5'], rtol=0.1)
+	# Progress is emitted with the last sample of each batch
+	assert progress.values == [9, 19, 29, 39, 49]
+	# No uncertainty at all means no interval
+	exact = tne_mc(samples, areas, None, lines_mock(), '6.83 eV', draws=10, gak_unc=0.0)
+	assert np.allclose(exact['T_P2.5'], exact['T_P97.5'])